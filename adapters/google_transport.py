@@ -0,0 +1,163 @@
+"""
+Google API transport - Infrastructure Layer
+
+Một AuthorizedSession dùng chung cho mọi call Sheets / Drive của process
+(gspread nhận session này thay vì tự tạo session mặc định):
+- keep-alive pool có kích thước cố định (không mở TLS mới mỗi call)
+- retry ở tầng urllib3 cho lỗi kết nối và 429/5xx, chỉ với GET (write không
+  idempotent nên không retry ở đây), backoff ngắn + tôn trọng Retry-After
+- response gzip (Google yêu cầu cả Accept-Encoding lẫn "gzip" trong User-Agent)
+- timeout (connect, read) do caller đặt qua gspread `set_timeout`
+- access token được refresh trong background thread trước khi hết hạn, nên
+  không request nào phải chờ refresh token inline
+Số liệu (requests, retries, connections, refresh) có trên /metrics và /health.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_REQUESTS = counter(
+    "zalobot_google_api_requests_total",
+    "HTTP requests sent to Google APIs by the shared transport, by status code",
+    ["status"],
+)
+GOOGLE_RETRIES = counter(
+    "zalobot_google_api_retries_total",
+    "Transport-level retries of Google API requests",
+)
+GOOGLE_TOKEN_REFRESH = counter(
+    "zalobot_google_token_refresh_total",
+    "Background OAuth token refreshes",
+    ["outcome"],
+)
+GOOGLE_CONNECTIONS = gauge(
+    "zalobot_google_api_connections_opened",
+    "Connections opened by the Google API pool since start (low vs requests = keep-alive reuse)",
+)
+
+USER_AGENT = "zalobot-sheets (gzip)"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class GoogleTransport:
+    """Pooled, retrying, gzip-enabled AuthorizedSession with background token refresh"""
+
+    def __init__(self, credentials, pool_size: int = 4, retries: int = 2, backoff: float = 0.5,
+                 backoff_max: float = 4.0, refresh_margin: float = 600.0):
+        from google.auth.transport.requests import AuthorizedSession, Request
+
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self.stats: Counter = Counter()
+
+        self._adapter = HTTPAdapter(
+            pool_connections=4,  # sheets.googleapis.com, www.googleapis.com (Drive), docs.google.com (CSV export) + its redirect
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                read=0,  # a read timeout already spent the caller's budget
+                status=retries,
+                backoff_factor=backoff,
+                backoff_max=backoff_max,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        # Token endpoint calls go through their own session on the same pool settings
+        token_session = requests.Session()
+        token_session.mount("https://", self._adapter)
+        self._token_request = Request(token_session)
+
+        self.session = AuthorizedSession(credentials, auth_request=self._token_request)
+        self.session.mount("https://", self._adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip", "User-Agent": USER_AGENT})
+        self.session.hooks["response"].append(self._on_response)
+
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        GOOGLE_CONNECTIONS.set_function(self.connections_opened)
+
+    # --- stats -----------------------------------------------------------------
+
+    def _on_response(self, response: requests.Response, *args, **kwargs) -> None:
+        GOOGLE_REQUESTS.inc(str(response.status_code))
+        self.stats["requests"] += 1
+        if response.headers.get("Content-Encoding") == "gzip":
+            self.stats["gzip_responses"] += 1
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            GOOGLE_RETRIES.inc(amount=len(retries.history))
+            self.stats["retries"] += len(retries.history)
+
+    def connections_opened(self) -> int:
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def as_dict(self) -> Dict[str, object]:
+        expiry = self.credentials.expiry
+        return {
+            "requests": self.stats["requests"],
+            "retries": self.stats["retries"],
+            "gzip_responses": self.stats["gzip_responses"],
+            "connections_opened": self.connections_opened(),
+            "token_refreshes": self.stats["token_refreshes"],
+            "token_refresh_errors": self.stats["token_refresh_errors"],
+            "token_expires_in_s": round(self._seconds_to_expiry(), 1) if expiry else None,
+        }
+
+    # --- background token refresh ------------------------------------------------
+
+    def _seconds_to_expiry(self) -> float:
+        expiry = self.credentials.expiry  # naive UTC (google-auth convention)
+        if expiry is None:
+            return 0.0
+        return (expiry - datetime.datetime.utcnow()).total_seconds()
+
+    def refresh_credentials(self) -> None:
+        """Fetch a new access token now (blocking)"""
+        try:
+            self.credentials.refresh(self._token_request)
+            self.stats["token_refreshes"] += 1
+            GOOGLE_TOKEN_REFRESH.inc("ok")
+        except Exception as e:
+            self.stats["token_refresh_errors"] += 1
+            GOOGLE_TOKEN_REFRESH.inc("error")
+            logger.warning("Google token refresh failed: %s", e)
+
+    def _next_refresh_in(self) -> float:
+        if not self.credentials.token:
+            return 0.0
+        return max(5.0, self._seconds_to_expiry() - self.refresh_margin)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self._next_refresh_in()):
+            self.refresh_credentials()
+            if not self.credentials.token:
+                self._stop.wait(30)  # token endpoint unreachable - back off before retrying
+
+    def start(self) -> None:
+        """Start the refresh thread (fetches the first token right away)"""
+        if self._refresher is None:
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=2)
+            self._refresher = None
+        self.session.close()
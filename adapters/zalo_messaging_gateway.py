@@ -2,9 +2,12 @@
 Zalo Messaging Gateway - Infrastructure Layer
 Concrete implementation cho Zalo platform
 """
+import asyncio
 import os
 import requests
 import json
+from core.deadline import call_timeout
+from core.instrumentation import ZALO_SEND, track_call
 from core.interfaces.messaging_gateway import MessagingGateway
 from services.bot_service import BotResponse
 
@@ -15,9 +18,20 @@ class ZaloMessagingGateway(MessagingGateway):
     Infrastructure layer - biết specifics của Zalo API
     """
 
-    def __init__(self, access_token: str = None):
+    def __init__(self, access_token: str = None, api_url: str = None, timeout: float = None):
         self.access_token = access_token or os.getenv("ZALO_OA_ACCESS_TOKEN")
-        self.api_url = "https://openapi.zalo.me/v3.0/"
+        self.api_url = api_url or os.getenv("ZALO_API_URL", "https://openapi.zalo.me/v3.0/")
+        self.timeout = timeout or float(os.getenv("ZALO_TIMEOUT", "10"))
+        # Keep-alive connection pool, reused across sends (no TLS handshake per message)
+        self.session = requests.Session()
+
+    def close(self) -> None:
+        """Close the pooled connections (process shutdown)"""
+        self.session.close()
+
+    def warm_up(self) -> None:
+        """Open a pooled TLS connection to the Zalo API ahead of the first send"""
+        self.session.head(self.api_url, timeout=5)
 
     def _send_text_message(self, user_id: str, message_text: str = None, message_file: str = None) -> dict:
         """Private method - Send text message via Zalo API"""
@@ -43,7 +57,9 @@ class ZaloMessagingGateway(MessagingGateway):
         else:
             raise ValueError("Either message_text or message_file must be provided")
 
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        timeout = call_timeout(self.timeout, "Zalo send")
+        with track_call(ZALO_SEND):
+            response = self.session.post(url, headers=headers, data=json.dumps(data), timeout=timeout)
         
         try:
             if response.status_code == 200:
@@ -60,7 +76,9 @@ class ZaloMessagingGateway(MessagingGateway):
         if not response or not response.text or not user_id:
             return
 
-        result = self._send_text_message(
+        # Blocking HTTP call runs in a worker thread (inherits the request deadline)
+        result = await asyncio.to_thread(
+            self._send_text_message,
             user_id=user_id,
             message_text=response.text
         )
@@ -1,18 +1,29 @@
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
+from pydantic import ValidationError
 from core.usecases.message_usecase import MessageUseCase, ProcessMessageRequest, MessageRequestDTO
 from core.deps import (
     MessageUseCaseDep,
-    get_background_manager,
+    BackgroundManagerDep,
     FormSyncUseCaseDep,
+    GoogleSheetsServiceDep,
+    SheetSyncUseCaseDep,
     StatusChangeUseCaseDep,
 )
 from core.usecases.status_change_usecase import StatusChangedDTO
 from core.usecases.form_sync_usecase import FormSubmittedDTO
+from core.usecases.sheet_sync_usecase import SheetChangedDTO
 from core.config import settings
+from core.capture import capture_webhook
+from core.logging import log_payload
+from core.memory import get_allocation_tracer, memory_report
+from core.metrics import CONTENT_TYPE, FOLLOW_UPS_SENT, WEBHOOK_OUTCOME, render_metrics
+import hmac
 import os
+import time
 import logging
 import asyncio
+from dataclasses import asdict
 from utils.rate_limit import is_rate_limited
 from workers.tasks import process_message_background
 
@@ -20,17 +31,84 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/health")
-async def health_ping():
+async def health_ping(request: Request):
     """
     Simple health endpoint for keep-alive pings
     Optimized for external monitoring services and cron jobs
+    `ready` turns true once the startup warm-up has finished
     """
+    warmup = getattr(request.app.state, "warmup", None)
+    loop_monitor = getattr(request.app.state, "loop_monitor", None)
+    container = getattr(request.app.state, "container", None)
+    transport = container.sheets_service.transport if container else None
+    memory_budget = getattr(request.app.state, "memory_budget", None)
     return {
         "status": "healthy",
         "timestamp": "ok",
-        "uptime": "running"
+        "uptime": "running",
+        "ready": warmup.ready if warmup else True,
+        "warmup": warmup.as_dict() if warmup else None,
+        "event_loop": loop_monitor.as_dict() if loop_monitor else None,
+        "sheets_transport": transport.as_dict() if transport else None,
+        "memory": memory_budget.as_dict() if memory_budget else None,
     }
 
+@router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (latency histograms, stage / webhook counters, queue depth)"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+@router.get("/stats")
+async def funnel_stats(request: Request, sheets: GoogleSheetsServiceDep):
+    """
+    Funnel dashboard: users per stage / form status, form submissions per day,
+    users with a follow-up timestamp. Counters are kept up to date on every write,
+    so this never scans the sheet (only the first call - or, in row mode, a call
+    after cache_ttl - loads the snapshot). `snapshot_age_s` says how current it is.
+    `follow_ups_sent` counts messages (not users) sent by the follow-up scheduler
+    since this process started - null when the scheduler runs in the worker.
+    """
+    try:
+        stats = await asyncio.to_thread(sheets.funnel_stats)
+        scheduler = getattr(request.app.state, "follow_up_scheduler", None)
+        stats['follow_ups_sent'] = int(FOLLOW_UPS_SENT.value()) if scheduler is not None else None
+        return stats
+    except Exception as e:
+        logger.error("Stats error: %s", e, extra={"endpoint": "/stats"})
+        return {"status": "error", "message": str(e)}
+
+def _token_matches(request: Request, header: str, expected) -> bool:
+    """Shared-secret check; always False when no secret is configured"""
+    token = request.headers.get(header, "")
+    return bool(expected) and hmac.compare_digest(token, expected)
+
+def _debug_allowed(request: Request) -> bool:
+    return _token_matches(request, "x-debug-token", settings.debug_token)
+
+@router.get("/debug/memory")
+async def debug_memory(request: Request, action: str = "report", limit: int = 20, group_by: str = "lineno"):
+    """
+    Memory accounting: RSS vs budget, per-cache entries / estimated bytes, and -
+    while tracemalloc is on - top allocation sites plus the diff since the previous call.
+    action=start bật tracemalloc (tốn CPU + RAM, chỉ bật khi đang điều tra),
+    action=stop tắt và bỏ snapshot đã lưu. Needs the X-Debug-Token header (404 otherwise).
+    """
+    if not _debug_allowed(request):
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    if group_by not in ("lineno", "filename", "traceback"):
+        return JSONResponse({"detail": "group_by must be lineno, filename or traceback"}, status_code=400)
+    tracer = get_allocation_tracer()
+    if action == "start":
+        tracer.start(settings.tracemalloc_frames)
+    elif action == "stop":
+        tracer.stop()
+    elif action != "report":
+        return JSONResponse({"detail": "action must be report, start or stop"}, status_code=400)
+    # Snapshots of a large heap take a while - keep them off the event loop
+    report = await asyncio.to_thread(memory_report)
+    report["tracemalloc"] = await asyncio.to_thread(tracer.report, max(1, min(limit, 200)), group_by)
+    return report
+
 @router.get("/zalo_verifierUERWBlpADnKQr-8ntgHQC2EaYHVFqbvBDp4q.html")
 async def zalo_verification():
     """Serve Zalo verification file"""
@@ -43,7 +121,7 @@ async def zalo_verification():
 async def zalo_oauth_callback(request: Request):
     """Handle Zalo OAuth callback"""
     params = dict(request.query_params)
-    logger.info(f"Zalo OAuth callback received. Query params: {params}")
+    logger.info("Zalo OAuth callback received", extra={"oa_id": params.get("oa_id")})
     oa_id = params.get("oa_id")
     code = params.get("code")
 
@@ -52,7 +130,8 @@ async def zalo_oauth_callback(request: Request):
 @router.post("/webhook")
 async def zalo_webhook(
     request: Request,
-    message_usecase: MessageUseCaseDep
+    message_usecase: MessageUseCaseDep,
+    background: BackgroundManagerDep,
 ):
     """
     Fast Response Zalo Webhook - Return 200 OK immediately to prevent retries
@@ -60,21 +139,30 @@ async def zalo_webhook(
     """
     try:
         # 1. Parse HTTP request
+        arrived_at = time.time()
         data = await request.json()
-        logger.info(f"Webhook payload: {data}")
+        capture_webhook("/webhook", data, arrived_at)
+        log_payload(logger, "Webhook payload", data)
         
         # 2. Filter chỉ xử lý event từ user gửi tin nhắn
         event_name = data.get("event_name", "")
         if event_name != "user_send_text":
-            logger.info(f"Ignored event: {event_name}")
+            logger.info("Ignored event %s", event_name, extra={"event_name": event_name})
+            WEBHOOK_OUTCOME.inc("webhook", "ignored")
             return {"status": "ignored", "message": f"Event {event_name} ignored"}
         
         # 3. Extract user data and check rate limiting
         user_id = str(data.get("sender", {}).get("id", ""))
         if is_rate_limited(user_id):
-            logger.info(f"Rate limited message from user {user_id}")
+            logger.info("Rate limited message from user %s", user_id, extra={"user_id": user_id})
+            WEBHOOK_OUTCOME.inc("webhook", "rate_limited")
             return {"status": "rate_limited", "message": "Please wait before sending another message"}
         
+        # Admission control: under heavy backlog only first-time users are processed
+        if not message_usecase.admit(user_id):
+            WEBHOOK_OUTCOME.inc("webhook", "shed")
+            return {"status": "shed", "message": "Server busy, message not processed"}
+        
         # 4. Extract remaining data
         user_name = data.get("user_name", "Bạn") 
         message_text = data.get("message", {}).get("text", "")
@@ -82,60 +170,121 @@ async def zalo_webhook(
         # 5. Create request DTO (framework-agnostic)
         dto = MessageRequestDTO.from_webhook(data)
 
-        # 6. START BACKGROUND PROCESSING via background manager
-        background = get_background_manager()
-        background.run(process_message_background, message_usecase, ProcessMessageRequest(
+        # 6. START BACKGROUND PROCESSING via background manager (or hand off to worker queue)
+        process_request = ProcessMessageRequest(
             user_id=dto.user_id,
             user_name=dto.user_name,
             message_text=dto.message_text,
             platform_data=dto.raw_data,
-        ))
+            deadline=time.time() + settings.message_deadline_seconds,
+        )
+        if background.queued:
+            await background.enqueue("process_message", asdict(process_request))
+        else:
+            background.run(process_message_background, message_usecase, process_request)
         
         # 7. Fast response to prevent retries (< 100ms response time)
+        WEBHOOK_OUTCOME.inc("webhook", "received")
         return {"status": "received", "message": "Processing message"}
         
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
+        logger.error("Webhook error: %s", e, extra={"endpoint": "/webhook"})
+        WEBHOOK_OUTCOME.inc("webhook", "error")
         return {"status": "error", "message": "Failed to process webhook"}
 
 @router.post("/form-submitted")
 async def form_submitted_webhook(
     request: Request,
     form_sync: FormSyncUseCaseDep,
+    background: BackgroundManagerDep,
 ):
     """
     Google Apps Script webhook - đơn giản xử lý khi có form response mới
     Chỉ cần có email thì chạy sync
     """
     try:
+        arrived_at = time.time()
         data = await request.json()
+        capture_webhook("/form-submitted", data, arrived_at)
         dto = FormSubmittedDTO(**data)
+        if background.queued:
+            await background.enqueue("form_submitted", dto.model_dump())
+            WEBHOOK_OUTCOME.inc("form_submitted", "queued")
+            return {"status": "queued", "message": "Form sync queued"}
         result = await form_sync.run_sync(dto)
+        WEBHOOK_OUTCOME.inc("form_submitted", result.get("status", "unknown"))
+        return result
+            
+    except Exception as e:
+        logger.error("Form webhook error: %s", e, extra={"endpoint": "/form-submitted"})
+        WEBHOOK_OUTCOME.inc("form_submitted", "error")
+        return {"status": "error", "message": str(e)}
+
+@router.post("/sheet-changed")
+async def sheet_changed_webhook(
+    request: Request,
+    sheet_sync: SheetSyncUseCaseDep,
+    background: BackgroundManagerDep,
+):
+    """
+    Apps Script webhook (onEdit) - nhận batch row delta {version, deltas: [{row, columns, values}]}
+    và áp thẳng vào user cache, hot path không cần poll Sheets.
+    Queue mode: worker giữ cache riêng nên delta cũng được đưa vào queue.
+    Needs the X-Sheet-Token header = SHEET_WEBHOOK_TOKEN (404 otherwise): deltas rewrite
+    the cached stage / form_status that drive bot replies.
+    """
+    if not _token_matches(request, "x-sheet-token", settings.sheet_webhook_token):
+        WEBHOOK_OUTCOME.inc("sheet_changed", "unauthorized")
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    try:
+        data = await request.json()
+        try:
+            dto = SheetChangedDTO(**data)
+        except ValidationError as e:
+            # The batch version is not recorded: the next batch sees a gap and resyncs
+            WEBHOOK_OUTCOME.inc("sheet_changed", "invalid")
+            return JSONResponse(sheet_sync.reject(e), status_code=422)
+        result = await sheet_sync.apply(dto)
+        if background.queued and result.get("status") != "duplicate":
+            await background.enqueue("sheet_changed", dto.model_dump())
+        WEBHOOK_OUTCOME.inc("sheet_changed", result.get("status", "unknown"))
         return result
             
     except Exception as e:
-        logger.error(f"Form webhook error: {e}")
+        logger.error("Sheet change webhook error: %s", e, extra={"endpoint": "/sheet-changed"})
+        WEBHOOK_OUTCOME.inc("sheet_changed", "error")
         return {"status": "error", "message": str(e)}
 
 @router.post("/status-changed")
 async def status_change_webhook(
     request: Request,
     status_usecase: StatusChangeUseCaseDep,
+    background: BackgroundManagerDep,
 ):
     """
     Apps Script webhook - nhận thông báo khi status thay đổi từ pending → submitted
     Gửi tin nhắn cảm ơn trực tiếp qua Zalo OA
     """
     try:
+        arrived_at = time.time()
         data = await request.json()
+        capture_webhook("/status-changed", data, arrived_at)
         
         dto = StatusChangedDTO(**data)
         logger.info(
-            f"Status change webhook - User: {dto.username} (ID: {dto.id}), Email: {dto.email}, Status: {dto.old_status} → {dto.new_status}"
+            "Status change webhook - User: %s (ID: %s), Status: %s → %s",
+            dto.username, dto.id, dto.old_status, dto.new_status,
+            extra={"user_id": dto.id, "old_status": dto.old_status, "new_status": dto.new_status},
         )
+        if background.queued:
+            await background.enqueue("status_changed", dto.model_dump())
+            WEBHOOK_OUTCOME.inc("status_changed", "queued")
+            return {"status": "queued", "message": "Status change queued"}
         result = await status_usecase.handle(dto)
+        WEBHOOK_OUTCOME.inc("status_changed", result.get("status", "unknown"))
         return result
             
     except Exception as e:
-        logger.error(f"Status change webhook error: {e}")
+        logger.error("Status change webhook error: %s", e, extra={"endpoint": "/status-changed"})
+        WEBHOOK_OUTCOME.inc("status_changed", "error")
         return {"status": "error", "message": str(e)}
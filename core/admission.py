@@ -0,0 +1,179 @@
+"""
+Admission control / degraded mode
+
+Mỗi `interval` giây controller đọc backlog (message chưa qua bot handling,
+không tính task đang chờ delay 2.5s trước reply) và event-loop lag, rồi chọn
+degradation level:
+
+    0 NORMAL        pipeline đầy đủ
+    1 NO_LLM        trích email bằng regex thay vì LLM, bỏ delay 2.5s trước khi reply
+    2 DEFER_WRITES  + hoãn write không thiết yếu (mark_follow_up_sent), flush khi hồi phục
+    3 SHED          + /webhook ack nhanh và bỏ qua tin của user đã biết (user mới vẫn được xử lý)
+
+Tăng level ngay khi vượt ngưỡng; giảm từng bậc sau `cooldown` giây liên tục
+dưới ngưỡng (tránh dao động). Mọi chuyển level được log và đếm trên /metrics.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Sequence
+
+from core.memory import track_cache
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+NORMAL = 0
+NO_LLM = 1
+DEFER_WRITES = 2
+SHED = 3
+
+LEVEL_NAMES = {NORMAL: "normal", NO_LLM: "no_llm", DEFER_WRITES: "defer_writes", SHED: "shed"}
+
+DEGRADATION_LEVEL = gauge("zalobot_degradation_level", "Current admission degradation level (0-3)")
+DEGRADATION_TRANSITIONS = counter(
+    "zalobot_degradation_transitions_total",
+    "Admission level changes",
+    ["from_level", "to_level"],
+)
+DEFERRED_WRITES = counter(
+    "zalobot_deferred_writes_total",
+    "Non-essential writes deferred while degraded, and later flushed",
+    ["action"],
+)
+
+
+def _level_for(value: float, thresholds: Sequence[float]) -> int:
+    """Number of thresholds reached (thresholds are ascending, one per level)"""
+    level = NORMAL
+    for threshold in thresholds:
+        if value >= threshold:
+            level += 1
+    return min(level, SHED)
+
+
+class AdmissionController:
+    """Pick a degradation level from live backlog and event-loop lag"""
+
+    def __init__(self, depth_fn: Callable[[], int], lag_fn: Callable[[], float] = lambda: 0.0,
+                 depth_thresholds: Sequence[float] = (20, 50, 100),
+                 lag_thresholds: Sequence[float] = (0.1, 0.25, 0.5),
+                 cooldown: float = 15.0, interval: float = 1.0):
+        self.depth_fn = depth_fn
+        self.lag_fn = lag_fn
+        self.depth_thresholds = tuple(depth_thresholds)
+        self.lag_thresholds = tuple(lag_thresholds)
+        self.cooldown = cooldown
+        self.interval = interval
+
+        self.level = NORMAL
+        self._below_since: Optional[float] = None
+        self._deferred: Dict[Hashable, Callable[[], object]] = {}
+        self._deferred_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        DEGRADATION_LEVEL.set_function(lambda: self.level)
+        track_cache("deferred_writes", lambda: self._deferred)  # never evicted: they are pending writes
+
+    # --- level -------------------------------------------------------------
+
+    def evaluate(self, now: Optional[float] = None) -> int:
+        """Recompute the level from current signals; returns the (possibly new) level"""
+        now = time.monotonic() if now is None else now
+        target = max(
+            _level_for(self.depth_fn(), self.depth_thresholds),
+            _level_for(self.lag_fn(), self.lag_thresholds),
+        )
+        if target > self.level:
+            self._set_level(target)
+            self._below_since = None
+        elif target < self.level:
+            if self._below_since is None:
+                self._below_since = now
+            elif now - self._below_since >= self.cooldown:
+                self._set_level(self.level - 1)
+                self._below_since = now
+        else:
+            self._below_since = None
+        return self.level
+
+    def _set_level(self, level: int) -> None:
+        previous, self.level = self.level, level
+        DEGRADATION_TRANSITIONS.inc(LEVEL_NAMES[previous], LEVEL_NAMES[level])
+        log = logger.warning if level > previous else logger.info
+        log("Admission level %s → %s", LEVEL_NAMES[previous], LEVEL_NAMES[level],
+            extra={"from_level": previous, "to_level": level})
+
+    def should_shed(self) -> bool:
+        return self.level >= SHED
+
+    def use_llm(self) -> bool:
+        return self.level < NO_LLM
+
+    def reply_delay_enabled(self) -> bool:
+        return self.level < NO_LLM
+
+    # --- deferred writes -----------------------------------------------------
+
+    def defer_writes(self) -> bool:
+        return self.level >= DEFER_WRITES
+
+    def defer(self, key: Hashable, write: Callable[[], object]) -> None:
+        """Queue a non-essential write; a later write with the same key replaces it"""
+        with self._deferred_lock:
+            self._deferred[key] = write
+        DEFERRED_WRITES.inc("deferred")
+
+    def pending_writes(self) -> int:
+        return len(self._deferred)
+
+    def flush_deferred(self) -> int:
+        """Run deferred writes (blocking - call from a worker thread)"""
+        with self._deferred_lock:
+            writes, self._deferred = self._deferred, {}
+        for key, write in writes.items():
+            try:
+                write()
+                DEFERRED_WRITES.inc("flushed")
+            except Exception as e:
+                logger.error("Deferred write %s failed: %s", key, e)
+        return len(writes)
+
+    # --- background loop -----------------------------------------------------
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._deferred:
+            await asyncio.to_thread(self.flush_deferred)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.evaluate()
+                if self._deferred and not self.defer_writes():
+                    await asyncio.to_thread(self.flush_deferred)
+            except Exception as e:
+                logger.error("Admission controller error: %s", e)
+
+
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Controller of the web process (None when admission control is disabled / in workers)"""
+    return _admission_controller
+
+
+def set_admission_controller(controller: Optional[AdmissionController]) -> None:
+    global _admission_controller
+    _admission_controller = controller
@@ -1,10 +1,18 @@
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from api.main import router as mainrouter
+from core.config import settings
+from core.container import get_container
 from core.logging import setup_logging
+from core.metrics import QUEUE_DEPTH
+from core.warmup import WarmupState, run_warmup
+
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -13,11 +21,120 @@ async def lifespan(app: FastAPI):
     # NOTE: Cron workers removed to prevent event loop blocking on weak servers (512MB + 0.1 CPU)
     # - Keep-alive ping was blocking webhook processing with sync urllib calls
     # - External traffic (webhooks) naturally prevents Render from sleeping
-    # - Daily tasks can be handled by external schedulers if needed (Apps Script, GitHub Actions, etc.)
+    # - Follow-ups use a due-time scheduler instead of a daily scan: it sleeps until
+    #   the next follow-up is due and runs Sheets calls in worker threads
+    # One container per process: services are wired once here, handlers only read app.state
+    container = get_container()
+    app.state.container = container
+    QUEUE_DEPTH.set_function(container.background.depth, settings.worker_mode)
+    
+    # Opt-in traffic capture for replay (tools/loadtest/replay.py)
+    if settings.webhook_capture_path:
+        from core.capture import start_webhook_capture
+        
+        start_webhook_capture(settings.webhook_capture_path)
+    
+    # Warm restart: serve lookups from the user snapshot saved by the previous run;
+    # the warm-up "sheets" step reconciles it with the live sheet in the background
+    sheets = container.sheets_service
+    snapshot_saver = None
+    if sheets.snapshot_store is not None:
+        from services.snapshot_store import save_periodically
+        
+        await asyncio.to_thread(sheets.restore_snapshot)
+        snapshot_saver = asyncio.create_task(save_periodically(sheets, sheets.snapshot_save_interval))
+    
+    # In "queue" mode the standalone worker owns follow-ups (it also applies the writes)
+    scheduler = None
+    if settings.follow_up_scheduler_enabled and settings.worker_mode != "queue":
+        from workers.follow_up_scheduler import FollowUpScheduler
+        
+        scheduler = FollowUpScheduler(
+            bot_service=container.bot_service,
+            gateway=container.zalo_gateway,
+        )
+        scheduler.start()
+    app.state.follow_up_scheduler = scheduler
+    
+    # Event-loop lag monitor (and opt-in blocking-call detector)
+    loop_monitor = None
+    if settings.loop_monitor_enabled:
+        from core.loop_monitor import LoopMonitor
+        
+        loop_monitor = LoopMonitor(
+            interval=settings.loop_monitor_interval,
+            detect_blocking=settings.loop_blocking_detector,
+            threshold=settings.loop_blocking_threshold_ms / 1000,
+        )
+        loop_monitor.start()
+    app.state.loop_monitor = loop_monitor
+    
+    # Admission controller: degradation level from backlog (excluding the reply delay) + loop lag
+    admission = None
+    if settings.admission_enabled:
+        from core.admission import AdmissionController, set_admission_controller
+        
+        admission = AdmissionController(
+            depth_fn=container.backlog,
+            lag_fn=(lambda: loop_monitor.last_lag) if loop_monitor else (lambda: 0.0),
+            depth_thresholds=[float(v) for v in settings.admission_depth_thresholds.split(",")],
+            lag_thresholds=[float(v) / 1000 for v in settings.admission_lag_thresholds_ms.split(",")],
+            cooldown=settings.admission_cooldown,
+        )
+        admission.start()
+        set_admission_controller(admission)
+    app.state.admission = admission
+    
+    # Memory budget: per-cache accounting is always on; the monitor makes caches evict early
+    memory_budget = None
+    if settings.memory_budget_mb > 0:
+        from core.memory import MemoryBudget, set_memory_budget
+        
+        memory_budget = MemoryBudget(
+            budget_mb=settings.memory_budget_mb,
+            soft_limit=settings.memory_soft_limit,
+            hard_limit=settings.memory_hard_limit,
+            interval=settings.memory_check_interval,
+        )
+        memory_budget.start()
+        set_memory_budget(memory_budget)
+    app.state.memory_budget = memory_budget
+    
+    # Warm-up runs alongside serving; traffic is admitted immediately, /health reports `ready`
+    app.state.warmup = WarmupState(ready=not settings.warmup_enabled)
+    warmup_task = None
+    if settings.warmup_enabled:
+        steps = [step.strip() for step in settings.warmup_steps.split(",") if step.strip()]
+        warmup_task = asyncio.create_task(
+            run_warmup(app.state.warmup, steps, timeout=settings.warmup_step_timeout)
+        )
     
     yield  # App is running
     
-    # No background tasks to cleanup
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if scheduler is not None:
+        await scheduler.stop()
+    if admission is not None:
+        await admission.stop()
+        set_admission_controller(None)
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    if memory_budget is not None:
+        await memory_budget.stop()
+        set_memory_budget(None)
+    if settings.webhook_capture_path:
+        from core.capture import stop_webhook_capture
+        
+        await asyncio.to_thread(stop_webhook_capture)  # flushes the queued records
+    if snapshot_saver is not None:
+        snapshot_saver.cancel()
+        try:
+            await asyncio.to_thread(sheets.save_snapshot)
+        except Exception as e:
+            logger.warning("Saving user snapshot at shutdown failed: %s", e)
+    # Last: everything above may still call Sheets / Zalo
+    container.close()
 
 
 def create_app() -> FastAPI:
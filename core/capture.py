@@ -0,0 +1,100 @@
+"""
+Webhook capture (opt-in) for replay
+
+Khi WEBHOOK_CAPTURE_PATH được đặt, payload của /webhook, /form-submitted và
+/status-changed được ghi thành NDJSON gọn, mỗi request một dòng:
+    {"t": <epoch lúc request tới>, "path": "/webhook", "body": {...}}
+Handler chỉ put_nowait vào queue, thread riêng ghi file (giống logging), queue
+đầy thì bỏ record và đếm `dropped` - capture không bao giờ làm chậm webhook.
+File chứa tin nhắn / email thật của user: chỉ bật khi cần thu traffic.
+
+Replay: python -m tools.loadtest.replay <file> --speed 1|N|max
+"""
+import json
+import logging
+import queue
+import threading
+from typing import Any, Optional
+
+from core.memory import track_cache
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WebhookCapture:
+    """Append webhook payloads to an NDJSON file from a writer thread"""
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self.captured = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        track_cache("webhook_capture", lambda: self._queue.queue)
+
+    def record(self, path: str, body: Any, arrived_at: float) -> None:
+        try:
+            self._queue.put_nowait((arrived_at, path, body))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="webhook-capture", daemon=True)
+            self._thread.start()
+            logger.info("Capturing webhooks to %s", self.path)
+
+    def stop(self) -> None:
+        """Write everything queued so far and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                # Drain whatever else is queued before flushing: one write per burst
+                while item is not _STOP:
+                    arrived_at, path, body = item
+                    line = {"t": round(arrived_at, 6), "path": path, "body": body}
+                    try:
+                        f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+                        self.captured += 1
+                    except (TypeError, ValueError) as e:
+                        self.dropped += 1
+                        logger.warning("Could not capture %s payload: %s", path, e)
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+                if item is _STOP:
+                    return
+
+
+_capture: Optional[WebhookCapture] = None
+
+
+def start_webhook_capture(path: str) -> WebhookCapture:
+    global _capture
+    if _capture is None:
+        _capture = WebhookCapture(path)
+        _capture.start()
+    return _capture
+
+
+def stop_webhook_capture() -> None:
+    global _capture
+    if _capture is not None:
+        capture, _capture = _capture, None
+        capture.stop()
+
+
+def capture_webhook(path: str, body: Any, arrived_at: float) -> None:
+    """Record one webhook payload when capture is on (no-op otherwise)"""
+    if _capture is not None:
+        _capture.record(path, body, arrived_at)
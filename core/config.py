@@ -1,9 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from typing import Optional
-import os
-from pathlib import Path
-from openai import OpenAI
 
 class Settings(BaseSettings):
     """Application settings with validation"""
@@ -18,12 +15,16 @@ class Settings(BaseSettings):
     zalo_oa_refresh_token: Optional[str] = None
     zalo_app_id: Optional[str] = None
     zalo_secret_key: Optional[str] = None  
+    zalo_api_url: str = "https://openapi.zalo.me/v3.0/"
     
     # Google Sheets
     google_sheet_id: Optional[str] = None
     google_sheet_name: str = "ZaloOA Users"
     worksheet_name: str = "UserStatus"
     credentials_file: str = "credentials.json"
+    # /sheet-changed (Apps Script row deltas) answers 404 unless this is set and sent as X-Sheet-Token
+    sheet_webhook_token: Optional[str] = None
+    sheet_resync_min_interval: float = 60  # at most one full reload per interval on delta gaps
     
     # AWS Configuration
     aws_access_key_id: Optional[str] = None
@@ -38,6 +39,58 @@ class Settings(BaseSettings):
     openai_temperature: float = 0.1
     openai_max_tokens: int = 150
     openai_timeout: int = 30
+    openai_base_url: Optional[str] = None  # OpenAI-compatible endpoint (defaults to api.openai.com)
+    
+    # Time budgets: a message not answered within the deadline is dropped;
+    # per-call timeouts are capped by the remaining budget
+    message_deadline_seconds: float = 60
+    zalo_timeout: float = 10
+    sheets_timeout: float = 30
+    
+    # Follow-up scheduler
+    follow_up_scheduler_enabled: bool = True
+    
+    # Background jobs: "inprocess" (asyncio tasks in web process) or "queue" (standalone worker)
+    worker_mode: str = "inprocess"
+    job_queue_path: str = "data/jobs.sqlite3"
+    job_max_attempts: int = 3
+    worker_concurrency: int = 4
+    worker_poll_interval: float = 0.5
+    
+    # Startup warm-up (runs in background, /health reports readiness)
+    warmup_enabled: bool = True
+    warmup_steps: str = "sheets,templates,zalo,openai"
+    warmup_step_timeout: float = 30
+    
+    # Event-loop monitoring (lag histogram on /metrics; detector logs stacks of blocking calls)
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.5
+    loop_blocking_detector: bool = False  # debug only: watchdog thread + stack capture
+    loop_blocking_threshold_ms: float = 100
+    
+    # Admission control: degrade (no LLM → defer writes → shed) as backlog / loop lag grow
+    admission_enabled: bool = True
+    admission_depth_thresholds: str = "20,50,100"  # messages not yet through bot handling, per level 1,2,3
+    admission_lag_thresholds_ms: str = "100,250,500"  # event-loop lag per level 1,2,3
+    admission_cooldown: float = 15  # seconds below threshold before stepping down a level
+    
+    # Memory budget (512MB instances): above the soft / hard fraction of the budget
+    # bounded caches evict early (see core/memory.py); 0 = no budget monitor
+    memory_budget_mb: float = 512
+    memory_soft_limit: float = 0.75
+    memory_hard_limit: float = 0.9
+    memory_check_interval: float = 10
+    # /debug/* endpoints answer 404 unless a token is set and sent as the X-Debug-Token header
+    debug_token: Optional[str] = None
+    tracemalloc_frames: int = 1  # frames per trace once tracing is started via /debug/memory
+    
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"  # json | text
+    log_queue_size: int = 10000
+    webhook_log_sample_rate: float = 1.0  # 0.0 - 1.0, lower it during high-volume periods
+    webhook_log_max_chars: int = 2000  # 0 = no truncation
+    webhook_capture_path: str = ""  # NDJSON capture of webhook payloads for tools/loadtest/replay ('' = off)
     
     # Server Configuration
     host: str = "0.0.0.0"
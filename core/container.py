@@ -0,0 +1,104 @@
+"""
+Application-scoped service container
+
+Build một lần trong lifespan (hoặc worker) và lưu trên `app.state.container`.
+Mọi service/use case dùng chung một instance, request handler chỉ đọc
+thuộc tính từ container thay vì resolve lại dependency graph.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from adapters.zalo_messaging_gateway import ZaloMessagingGateway
+from core.config import settings
+from core.usecases.form_sync_usecase import FormSyncUseCase
+from core.usecases.message_usecase import MessageUseCase
+from core.usecases.sheet_sync_usecase import SheetSyncUseCase
+from core.usecases.status_change_usecase import StatusChangeUseCase
+from services.bot_service import BotService
+from services.form_service import FormService, get_form_service
+from services.google_sheets_service import GoogleSheetsService, get_sheets_service
+from services.template_service import TemplateService, get_template_service
+from workers.background import BackgroundTaskManager, QueueTaskManager
+
+
+@dataclass
+class ServiceContainer:
+    """All long-lived services and use cases of one process"""
+    sheets_service: GoogleSheetsService
+    template_service: TemplateService
+    form_service: FormService
+    bot_service: BotService
+    zalo_gateway: ZaloMessagingGateway
+    message_usecase: MessageUseCase
+    form_sync_usecase: FormSyncUseCase
+    sheet_sync_usecase: SheetSyncUseCase
+    status_change_usecase: StatusChangeUseCase
+    background: BackgroundTaskManager
+
+    def backlog(self) -> int:
+        """
+        Work not yet through bot handling - the admission controller's depth signal.
+        Replies sleeping through the 2.5s reply delay are not backlog (at 8 msg/s they
+        alone keep ~20 tasks alive); in queue mode, jobs still waiting for a worker.
+        """
+        if self.background.queued:
+            return self.background.job_queue.waiting()
+        return max(0, self.background.depth() - self.message_usecase.replies_waiting())
+
+    def close(self) -> None:
+        """Release pooled connections and the token refresh thread (process shutdown)"""
+        if self.sheets_service.transport is not None:
+            self.sheets_service.transport.close()
+        self.zalo_gateway.close()
+
+    @classmethod
+    def build(cls) -> "ServiceContainer":
+        """Wire services from the module-level singletons (no network calls here)"""
+        sheets_service = get_sheets_service()
+        template_service = get_template_service()
+        form_service = get_form_service()
+        bot_service = BotService(form_service=form_service)
+        zalo_gateway = ZaloMessagingGateway(
+            access_token=settings.zalo_oa_access_token,
+            api_url=settings.zalo_api_url,
+            timeout=settings.zalo_timeout,
+        )
+
+        if settings.worker_mode == "queue":
+            from workers.job_queue import get_job_queue
+            background = QueueTaskManager(get_job_queue())
+        else:
+            background = BackgroundTaskManager()
+
+        return cls(
+            sheets_service=sheets_service,
+            template_service=template_service,
+            form_service=form_service,
+            bot_service=bot_service,
+            zalo_gateway=zalo_gateway,
+            message_usecase=MessageUseCase(bot_service=bot_service, message_gateway=zalo_gateway),
+            form_sync_usecase=FormSyncUseCase(),
+            sheet_sync_usecase=SheetSyncUseCase(
+                sheets_service=sheets_service,
+                resync_min_interval=settings.sheet_resync_min_interval,
+            ),
+            status_change_usecase=StatusChangeUseCase(bot_service=bot_service, gateway=zalo_gateway),
+            background=background,
+        )
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def get_container() -> ServiceContainer:
+    """Process-wide container, built on first use"""
+    global _container
+    if _container is None:
+        _container = ServiceContainer.build()
+    return _container
+
+
+def set_container(container: Optional[ServiceContainer]) -> None:
+    """Replace the process-wide container (tests, load-test harness)"""
+    global _container
+    _container = container
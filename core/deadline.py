@@ -0,0 +1,87 @@
+"""
+Request deadlines
+
+Deadline (epoch seconds, để còn ý nghĩa khi job đi qua queue sang worker)
+được gắn vào context bằng `deadline_scope()`. ContextVar được copy sang
+asyncio task và asyncio.to_thread, nên mọi call ra ngoài phía dưới đều thấy:
+- `check_deadline()` raise DeadlineExceeded khi đã hết hạn
+- `call_timeout(default)` trả về timeout cho một call = min(default, thời gian còn lại)
+Ngoài scope (scheduler, script) không có deadline và các hàm trên là no-op.
+
+Commit point: `mark_committed()` (gọi trước write đầu tiên, xem track_call) đánh
+dấu request đã thay đổi state bên ngoài. Từ đó deadline không còn cắt request
+nữa - phần còn lại (các write tiếp theo và reply) phải chạy xong, nếu không
+stage của user đã đổi mà reply tương ứng lại bị bỏ.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Below this, starting a network call is pointless - treat as expired
+MIN_CALL_TIMEOUT = 0.05
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# Shared (mutable) across the copies of the context made for tasks / threads of one scope
+_commit: ContextVar[Optional[Dict[str, bool]]] = ContextVar("request_commit", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before the work finished"""
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Run the block under `deadline` (epoch seconds); None keeps any outer deadline"""
+    if deadline is None:
+        yield
+        return
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    commit_token = _commit.set(_commit.get() or {"committed": False})
+    try:
+        yield
+    finally:
+        _commit.reset(commit_token)
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def mark_committed() -> None:
+    """The request is about to change external state: finish it even past the deadline"""
+    state = _commit.get()
+    if state is not None:
+        state["committed"] = True
+
+
+def committed() -> bool:
+    state = _commit.get()
+    return state is not None and state["committed"]
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current scope, None when there is no deadline (or once committed)"""
+    deadline = _deadline.get()
+    if deadline is None or committed():
+        return None
+    return deadline - time.time()
+
+
+def check_deadline(what: str = "request") -> None:
+    """Raise DeadlineExceeded when the current deadline has (almost) passed"""
+    left = remaining()
+    if left is not None and left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+
+
+def call_timeout(default: float, what: str = "call") -> float:
+    """Timeout for one outbound call: the default, capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+    return min(default, left)
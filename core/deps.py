@@ -1,87 +1,87 @@
-from functools import lru_cache
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
 
 from services.bot_service import BotService
 from services.form_service import FormService
 from services.template_service import TemplateService
 from services.google_sheets_service import GoogleSheetsService
-from core.config import settings
+from core.container import ServiceContainer, get_container as get_process_container
 from core.usecases.message_usecase import MessageUseCase
 from core.usecases.form_sync_usecase import FormSyncUseCase
+from core.usecases.sheet_sync_usecase import SheetSyncUseCase
 from core.usecases.status_change_usecase import StatusChangeUseCase
 from workers.background import BackgroundTaskManager
 from adapters.zalo_messaging_gateway import ZaloMessagingGateway
-import os
 
 
-@lru_cache()
-def get_google_sheets_service() -> GoogleSheetsService:
-    """Get GoogleSheetsService singleton instance"""
-    return GoogleSheetsService()
+# Thin accessors: the container is built once in lifespan and stored on app.state,
+# so resolving a dependency is a single attribute read (no sub-dependencies, no construction).
+# Accessors are `async def` so FastAPI calls them inline instead of hopping to the threadpool.
 
+def _container(request: Request) -> ServiceContainer:
+    container = getattr(request.app.state, "container", None)
+    if container is None:
+        # App used without lifespan (e.g. mounted elsewhere) - fall back to process container
+        container = get_process_container()
+        request.app.state.container = container
+    return container
 
-@lru_cache() 
-def get_template_service() -> TemplateService:
-    """Get TemplateService singleton instance"""
-    return TemplateService()
 
+async def get_container(request: Request) -> ServiceContainer:
+    """Get the app-scoped ServiceContainer"""
+    return _container(request)
 
-@lru_cache()
-def get_form_service(
-    sheets_service: GoogleSheetsService = Depends(get_google_sheets_service),
-    template_service: TemplateService = Depends(get_template_service)
-) -> FormService:
-    """Get FormService with injected dependencies"""
-    return FormService(sheets_service=sheets_service, template_service=template_service)
 
+async def get_google_sheets_service(request: Request) -> GoogleSheetsService:
+    return _container(request).sheets_service
 
-@lru_cache()
-def get_bot_service(
-    form_service: FormService = Depends(get_form_service)
-) -> BotService:
-    """Get BotService with injected dependencies"""
-    return BotService(form_service=form_service)
 
+async def get_template_service(request: Request) -> TemplateService:
+    return _container(request).template_service
 
-@lru_cache()
-def get_zalo_gateway() -> ZaloMessagingGateway:
-    """Get ZaloMessagingGateway with access token"""
-    access_token = os.getenv("ZALO_OA_ACCESS_TOKEN")
-    return ZaloMessagingGateway(access_token=access_token)
 
+async def get_form_service(request: Request) -> FormService:
+    return _container(request).form_service
 
-@lru_cache()
-def get_message_usecase(
-    bot_service: BotService = Depends(get_bot_service),
-    zalo_gateway: ZaloMessagingGateway = Depends(get_zalo_gateway)
-) -> MessageUseCase:
-    """Get MessageUseCase with injected dependencies"""
-    return MessageUseCase(bot_service=bot_service, message_gateway=zalo_gateway)
 
+async def get_bot_service(request: Request) -> BotService:
+    return _container(request).bot_service
 
-def get_form_sync_usecase() -> FormSyncUseCase:
-    return FormSyncUseCase()
 
+async def get_zalo_gateway(request: Request) -> ZaloMessagingGateway:
+    return _container(request).zalo_gateway
 
-def get_status_change_usecase(
-    bot_service: BotService = Depends(get_bot_service),
-    zalo_gateway: ZaloMessagingGateway = Depends(get_zalo_gateway)
-) -> StatusChangeUseCase:
-    return StatusChangeUseCase(bot_service=bot_service, gateway=zalo_gateway)
 
+async def get_message_usecase(request: Request) -> MessageUseCase:
+    return _container(request).message_usecase
 
-def get_background_manager() -> BackgroundTaskManager:
-    return BackgroundTaskManager()
+
+async def get_form_sync_usecase(request: Request) -> FormSyncUseCase:
+    return _container(request).form_sync_usecase
+
+
+async def get_sheet_sync_usecase(request: Request) -> SheetSyncUseCase:
+    return _container(request).sheet_sync_usecase
+
+
+async def get_status_change_usecase(request: Request) -> StatusChangeUseCase:
+    return _container(request).status_change_usecase
+
+
+async def get_background_manager(request: Request) -> BackgroundTaskManager:
+    return _container(request).background
 
 
 
 # Type annotations for easier usage
+ContainerDep = Annotated[ServiceContainer, Depends(get_container)]
 GoogleSheetsServiceDep = Annotated[GoogleSheetsService, Depends(get_google_sheets_service)]
 TemplateServiceDep = Annotated[TemplateService, Depends(get_template_service)]
 FormServiceDep = Annotated[FormService, Depends(get_form_service)]
 BotServiceDep = Annotated[BotService, Depends(get_bot_service)]
 MessageUseCaseDep = Annotated[MessageUseCase, Depends(get_message_usecase)]
 FormSyncUseCaseDep = Annotated[FormSyncUseCase, Depends(get_form_sync_usecase)]
+SheetSyncUseCaseDep = Annotated[SheetSyncUseCase, Depends(get_sheet_sync_usecase)]
 StatusChangeUseCaseDep = Annotated[StatusChangeUseCase, Depends(get_status_change_usecase)]
+BackgroundManagerDep = Annotated[BackgroundTaskManager, Depends(get_background_manager)]
@@ -0,0 +1,77 @@
+"""
+Backend call instrumentation
+
+Mỗi call ra ngoài (Sheets read/write, LLM, Zalo send) được bọc trong
+`track_call()` ngay tại call site: đếm call và ghi latency vào histogram
+/metrics. Tổng số đếm theo process, và `count_calls()` gom riêng các call
+của một đoạn code (một inbound message, một job...) để kiểm tra call
+budget - xem tests/test_call_budget.py.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Tuple
+
+from core.deadline import check_deadline, mark_committed
+from core.metrics import BACKEND_ERRORS, BACKEND_LATENCY
+
+SHEETS_READ = "sheets_read"
+SHEETS_WRITE = "sheets_write"
+LLM_CALL = "llm"
+ZALO_SEND = "zalo_send"
+
+BACKEND_CALLS = (SHEETS_READ, SHEETS_WRITE, LLM_CALL, ZALO_SEND)
+
+_totals: Counter = Counter()
+_totals_lock = threading.Lock()
+# Counters of every count_calls() scope active in this context (nested scopes all count).
+# Context is copied into asyncio tasks and asyncio.to_thread, so scopes follow the request.
+_scopes: ContextVar[Tuple[Counter, ...]] = ContextVar("backend_call_scopes", default=())
+
+
+def record_call(kind: str, count: int = 1) -> None:
+    """Count `count` calls of one backend kind (see BACKEND_CALLS)"""
+    with _totals_lock:
+        _totals[kind] += count
+        for scope in _scopes.get():
+            scope[kind] += count
+
+
+@contextmanager
+def track_call(kind: str) -> Iterator[None]:
+    """
+    Count one call and record its latency (and failure) in the backend metrics.
+    Raises DeadlineExceeded instead of starting the call when the request's budget is spent.
+    A Sheets write commits the request (see core.deadline): later calls are no longer cut off.
+    """
+    check_deadline(kind)
+    if kind == SHEETS_WRITE:
+        mark_committed()
+    record_call(kind)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        BACKEND_ERRORS.inc(kind)
+        raise
+    finally:
+        BACKEND_LATENCY.observe(time.perf_counter() - start, kind)
+
+
+@contextmanager
+def count_calls() -> Iterator[Counter]:
+    """Collect the backend calls made inside the `with` block"""
+    scope: Counter = Counter()
+    token = _scopes.set(_scopes.get() + (scope,))
+    try:
+        yield scope
+    finally:
+        _scopes.reset(token)
+
+
+def call_totals() -> Dict[str, int]:
+    """Process-wide call counts since start"""
+    with _totals_lock:
+        return {kind: _totals[kind] for kind in BACKEND_CALLS}
@@ -1,47 +1,171 @@
+import atexit
+import copy
+import json
 import logging
-import sys
+import logging.handlers
 import os
-import watchtower
-import boto3
-from typing import Optional
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from core.memory import track_cache
+
+# Attributes every LogRecord has - anything else came from `extra=` and is emitted as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg + structured `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: drops records when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve message/traceback on the caller thread, keep `extra` fields intact
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers(log_format: str) -> list:
+    """Real (possibly slow) handlers - run on the listener thread only"""
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+    handlers = [stream_handler]
 
-def setup_logging() -> logging.Logger:
-    """Configure application logging with CloudWatch integration"""
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)]
-    )
-    
     # Setup CloudWatch logging if credentials are available
     try:
         aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
         aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        
+
         if aws_access_key_id and aws_secret_access_key:
+            # boto3/watchtower are slow to import - only pay for them when CloudWatch is configured
+            import boto3
+            import watchtower
+
             session = boto3.Session(
                 aws_access_key_id=aws_access_key_id,
                 aws_secret_access_key=aws_secret_access_key,
-                region_name=os.getenv("AWS_REGION", "ap-southeast-1"),  
+                region_name=os.getenv("AWS_REGION", "ap-southeast-1"),
             )
-            
+
             log_group = os.getenv("CLOUDWATCH_LOG_GROUP", "MyFastAPIAppLogs")
-            
+
             cloudwatch_handler = watchtower.CloudWatchLogHandler(
                 log_group=log_group,
                 stream_name=os.getenv("RENDER_SERVICE_ID", "fastapi-service"),
                 create_log_group=True,
+                boto3_client=session.client("logs"),
             )
-            
-            logging.getLogger().addHandler(cloudwatch_handler)
-            
-        logger = logging.getLogger(__name__)
-        logger.info("Logging setup completed")
-        return logger
-        
+            cloudwatch_handler.setFormatter(JsonFormatter())
+            handlers.append(cloudwatch_handler)
     except Exception as e:
-        logger = logging.getLogger(__name__)
-        logger.warning(f"Failed to setup CloudWatch logging: {e}")
-        return logger
\ No newline at end of file
+        print(f"Failed to setup CloudWatch logging: {e}", file=sys.stderr)
+
+    return handlers
+
+
+def setup_logging() -> logging.Logger:
+    """
+    Configure application logging.
+    Root logger only has a non-blocking QueueHandler; stdout / CloudWatch
+    handlers run on a dedicated QueueListener thread.
+    """
+    global _listener, _queue_handler
+    from core.config import settings
+
+    logger = logging.getLogger(__name__)
+    if _listener is not None:
+        return logger
+
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    track_cache("log_queue", lambda: log_queue.queue)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    handlers = _build_handlers(settings.log_format)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.log_level.upper())
+
+    logger.info("Logging setup completed", extra={"handlers": [type(h).__name__ for h in handlers]})
+    return logger
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+
+
+def dropped_log_records() -> int:
+    """Records dropped because the log queue was full"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any) -> None:
+    """
+    Log a webhook payload with sampling and truncation.
+    Nothing is serialized unless INFO is enabled and the record is sampled.
+    """
+    from core.config import settings
+
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    sample_rate = settings.webhook_log_sample_rate
+    if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+        return
+
+    text = json.dumps(payload, ensure_ascii=False, default=str)
+    max_chars = settings.webhook_log_max_chars
+    truncated = max_chars > 0 and len(text) > max_chars
+    if truncated:
+        text = text[:max_chars]
+    logger.info(message, extra={"payload": text, "payload_truncated": truncated, "sample_rate": sample_rate})
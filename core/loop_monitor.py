@@ -0,0 +1,135 @@
+"""
+Event-loop lag monitor + blocking-call detector
+
+- LoopMonitor: task ngủ `interval` giây rồi đo độ trễ thực tế so với lịch
+  (scheduling delay) → histogram `zalobot_event_loop_lag_seconds`.
+- Blocking detector (opt-in, LOOP_BLOCKING_DETECTOR=true): watchdog thread
+  kiểm tra heartbeat của loop; khi loop bị chặn lâu hơn ngưỡng thì chụp stack
+  của thread chạy loop (sys._current_frames), log call site trong code của
+  app và đếm vào `zalobot_event_loop_blocked_total{site}`.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+from core.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = histogram(
+    "zalobot_event_loop_lag_seconds",
+    "Event-loop scheduling delay measured by the lag monitor",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKED = counter(
+    "zalobot_event_loop_blocked_total",
+    "Times the event loop was blocked longer than the detector threshold, by app call site",
+    ["site"],
+)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _is_app_frame(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return path.startswith(_PROJECT_ROOT) and "site-packages" not in path and os.sep + "." not in path
+
+
+def blocking_site(stack: List[traceback.FrameSummary]) -> str:
+    """Innermost frame in app code (the call that blocked), else the innermost frame"""
+    for frame in reversed(stack):
+        if _is_app_frame(frame.filename):
+            return f"{os.path.relpath(frame.filename, _PROJECT_ROOT)}:{frame.lineno} {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    """Measure event-loop lag; optionally report callbacks that block the loop"""
+
+    def __init__(self, interval: float = 0.5, detect_blocking: bool = False, threshold: float = 0.1):
+        self.interval = interval
+        self.detect_blocking = detect_blocking
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.blocked_sites: Counter = Counter()
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        if self.detect_blocking:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-blocking-detector", daemon=True)
+            self._watchdog.start()
+            logger.info("Blocking-call detector enabled", extra={"threshold_ms": self.threshold * 1000})
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=2)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        # The detector needs a heartbeat finer than its threshold
+        interval = min(self.interval, self.threshold / 2) if self.detect_blocking else self.interval
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self._heartbeat = time.monotonic()
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop thread's stack once per stall"""
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            stack = traceback.extract_stack(frame)
+            site = blocking_site(stack)
+            self.blocked_sites[site] += 1
+            LOOP_BLOCKED.inc(site)
+            logger.warning(
+                "Event loop blocked for %.0f ms at %s\n%s",
+                stalled * 1000, site, "".join(traceback.format_list(stack[-12:])),
+                extra={"blocked_ms": round(stalled * 1000), "site": site},
+            )
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "blocking_sites": dict(self.blocked_sites.most_common(10)) if self.detect_blocking else None,
+        }
@@ -0,0 +1,341 @@
+"""
+Memory accounting and budget for the 512MB instances
+
+- Mỗi cache / buffer trong process tự đăng ký qua `track_cache()` (số entry,
+  kích thước ước lượng bằng cách lấy mẫu) → /metrics và /debug/memory.
+- MemoryBudget đọc RSS định kỳ: vượt ngưỡng soft / hard (tỉ lệ của
+  MEMORY_BUDGET_MB) thì các cache có `evict` được thu gọn sớm, thay vì chờ
+  chu kỳ dọn dẹp bình thường hoặc bị OOM kill.
+- tracemalloc chỉ chạy khi được bật qua /debug/memory (tốn CPU + RAM):
+  top allocation site và diff giữa hai lần chụp liên tiếp.
+"""
+import asyncio
+import gc
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENTRIES = gauge("zalobot_cache_entries", "Entries held by in-process caches and buffers", ["cache"])
+CACHE_BYTES = gauge("zalobot_cache_bytes", "Estimated memory of in-process caches and buffers (sampled)", ["cache"])
+CACHE_EVICTIONS = counter(
+    "zalobot_cache_evictions_total",
+    "Entries evicted early because the process neared its memory budget",
+    ["cache"],
+)
+MEMORY_RSS = gauge("zalobot_memory_rss_bytes", "Resident set size of the process")
+MEMORY_PRESSURE = gauge("zalobot_memory_pressure", "Memory budget level (0 ok, 1 soft limit, 2 hard limit)")
+
+OK, SOFT, HARD = 0, 1, 2
+LEVEL_NAMES = ("ok", "soft", "hard")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """Current RSS (falls back to the peak where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# A value referenced from more places than this is shared (interned status, '', None...)
+# and not charged to each entry holding it
+_SHARED_REFCOUNT = 4
+
+
+def _own_size(value) -> int:
+    return sys.getsizeof(value) if sys.getrefcount(value) <= _SHARED_REFCOUNT else 0
+
+
+def _item_size(item) -> int:
+    """Object plus the contents it owns (one level deep)"""
+    size = sys.getsizeof(item)
+    if isinstance(item, (tuple, list)):
+        size += sum(_own_size(value) for value in item)
+    elif isinstance(item, dict):
+        size += sum(_own_size(key) + _own_size(value) for key, value in item.items())
+    elif hasattr(item, "__slots__"):
+        size += sum(_own_size(getattr(item, slot, None)) for slot in item.__slots__)
+    elif hasattr(item, "__dict__"):
+        size += sys.getsizeof(item.__dict__) + sum(_own_size(value) for value in vars(item).values())
+    return size
+
+
+def approx_size(container, sample: int = 32) -> int:
+    """Container size + average of `sample` sampled entries times the entry count"""
+    size = sys.getsizeof(container)
+    count = len(container)
+    if not count:
+        return size
+    try:
+        if isinstance(container, dict):
+            items = [sys.getsizeof(key) + _item_size(value)
+                     for key, value in itertools.islice(container.items(), sample)]
+        else:
+            items = [_item_size(item) for item in itertools.islice(container, sample)]
+    except RuntimeError:  # mutated by another thread while sampling - shallow size only
+        return size
+    return size + int(sum(items) / len(items) * count) if items else size
+
+
+@dataclass
+class TrackedCache:
+    name: str
+    source: Callable[[], object]  # returns the container (or an object with __len__)
+    size: Optional[Callable[[], int]] = None  # custom byte estimate
+    evict: Optional[Callable[[int], int]] = None  # evict(level) -> entries removed
+
+    def usage(self) -> Dict[str, int]:
+        container = self.source()
+        if container is None:
+            return {"entries": 0, "approx_bytes": 0}
+        return {
+            "entries": len(container),
+            "approx_bytes": self.size() if self.size else approx_size(container),
+        }
+
+
+_caches: Dict[str, TrackedCache] = {}
+_caches_lock = threading.Lock()
+
+
+def track_cache(name: str, source: Callable[[], object], size: Callable[[], int] = None,
+                evict: Callable[[int], int] = None) -> None:
+    """
+    Register a cache / buffer for accounting (re-registering a name replaces it).
+    `evict(level)` is called under memory pressure (SOFT / HARD) and returns the
+    number of entries it dropped; only caches that can rebuild or lose entries
+    safely should pass it.
+    """
+    cache = TrackedCache(name, source, size, evict)
+    with _caches_lock:
+        _caches[name] = cache
+    CACHE_ENTRIES.set_function(lambda: cache.usage()["entries"], name)
+    CACHE_BYTES.set_function(lambda: cache.usage()["approx_bytes"], name)
+
+
+def cache_usage() -> Dict[str, Dict[str, int]]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    usage = {}
+    for cache in caches:
+        try:
+            usage[cache.name] = cache.usage()
+        except Exception as e:
+            usage[cache.name] = {"error": str(e)}
+    return usage
+
+
+class MemoryBudget:
+    """Watch RSS against the budget and make evictable caches shrink early"""
+
+    def __init__(self, budget_mb: float = 512, soft_limit: float = 0.75, hard_limit: float = 0.9,
+                 interval: float = 10.0):
+        self.budget = budget_mb * 1024 * 1024
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.interval = interval
+        self.level = OK
+        self.evicted: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        MEMORY_RSS.set_function(rss_bytes)
+        MEMORY_PRESSURE.set_function(lambda: self.level)
+
+    def level_for(self, rss: int) -> int:
+        if rss >= self.budget * self.hard_limit:
+            return HARD
+        if rss >= self.budget * self.soft_limit:
+            return SOFT
+        return OK
+
+    def check(self) -> int:
+        """Read RSS, update the level and evict while above the soft limit"""
+        rss = rss_bytes()
+        level = self.level_for(rss)
+        if level != self.level:
+            log = logger.warning if level > self.level else logger.info
+            log("Memory pressure %s -> %s (RSS %.0f MB of %.0f MB budget)",
+                LEVEL_NAMES[self.level], LEVEL_NAMES[level], rss / 2**20, self.budget / 2**20,
+                extra={"rss_mb": round(rss / 2**20, 1), "memory_level": LEVEL_NAMES[level]})
+            if level == HARD:
+                gc.collect()  # once per escalation: cyclic garbage first
+        self.level = level
+        if level > OK:
+            self.evict(level)
+        return level
+
+    def evict(self, level: int) -> int:
+        with _caches_lock:
+            caches = [cache for cache in _caches.values() if cache.evict is not None]
+        total = 0
+        for cache in caches:
+            try:
+                removed = cache.evict(level)
+            except Exception as e:
+                logger.error("Evicting %s failed: %s", cache.name, e)
+                continue
+            if removed:
+                CACHE_EVICTIONS.inc(cache.name, amount=removed)
+                self.evicted[cache.name] = self.evicted.get(cache.name, 0) + removed
+                total += removed
+        return total
+
+    def as_dict(self) -> Dict[str, object]:
+        rss = rss_bytes()
+        return {
+            "rss_mb": round(rss / 2**20, 1),
+            "budget_mb": round(self.budget / 2**20),
+            "used_pct": round(rss / self.budget * 100, 1),
+            "level": LEVEL_NAMES[self.level],
+            "evicted": dict(self.evicted),
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Memory budget check failed: %s", e)
+
+
+_memory_budget: Optional[MemoryBudget] = None
+
+
+def get_memory_budget() -> Optional[MemoryBudget]:
+    return _memory_budget
+
+
+def set_memory_budget(budget: Optional[MemoryBudget]) -> None:
+    global _memory_budget
+    _memory_budget = budget
+
+
+# --- tracemalloc (debug) --------------------------------------------------------
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+PREVIOUS_MAX_AGE = 600  # seconds: a diff against an older snapshot is not worth its memory at SOFT
+
+
+class AllocationTracer:
+    """tracemalloc wrapper: top sites of the current snapshot + diff against the previous one"""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_at = 0.0
+        self._lock = threading.Lock()
+        # entries: traces kept for the next diff; bytes: tracemalloc's own bookkeeping
+        track_cache("tracemalloc", lambda: self._previous.traces if self._previous else None,
+                    size=tracemalloc.get_tracemalloc_memory, evict=self._evict)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._previous = None
+        tracemalloc.stop()
+
+    def _evict(self, level: int) -> int:
+        # The stored snapshot can be tens of MB, but under pressure its diff is what explains
+        # the growth: keep it at SOFT unless stale. At HARD drop it and stop tracing (costs more)
+        dropped = 0
+        with self._lock:
+            stale = time.monotonic() - self._previous_at >= PREVIOUS_MAX_AGE
+            if self._previous is not None and (level >= HARD or stale):
+                dropped = len(self._previous.traces)
+                self._previous = None
+        if level >= HARD and tracemalloc.is_tracing():
+            logger.warning("Stopping tracemalloc: process is at its hard memory limit")
+            tracemalloc.stop()
+        return dropped
+
+    def report(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, object]:
+        """Snapshot now (blocking, run it in a thread); diff covers allocations since the last report"""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        now = time.monotonic()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            previous, previous_at = self._previous, self._previous_at
+            self._previous, self._previous_at = snapshot, now
+        result: Dict[str, object] = {
+            "tracing": True,
+            "traced_mb": round(current / 2**20, 2),
+            "peak_mb": round(peak / 2**20, 2),
+            "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 2**20, 2),
+            "top": [_stat(stat) for stat in snapshot.statistics(group_by)[:limit]],
+        }
+        if previous is not None:
+            result["diff_seconds"] = round(now - previous_at, 1)
+            result["diff"] = [_stat(stat) for stat in snapshot.compare_to(previous, group_by)[:limit]]
+        return result
+
+
+def _stat(stat) -> Dict[str, object]:
+    frame = stat.traceback[0]
+    entry = {"site": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+_tracer: Optional[AllocationTracer] = None
+
+
+def get_allocation_tracer() -> AllocationTracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = AllocationTracer()
+    return _tracer
+
+
+def memory_report() -> Dict[str, object]:
+    """Budget status + per-cache accounting (cheap - no tracemalloc)"""
+    budget = get_memory_budget()
+    return {
+        "budget": budget.as_dict() if budget else {"rss_mb": round(rss_bytes() / 2**20, 1)},
+        "caches": cache_usage(),
+        "gc_counts": gc.get_count(),
+    }
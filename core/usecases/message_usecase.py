@@ -3,10 +3,18 @@ Message Processing Use Case - Application Layer
 Xử lý business logic độc lập với platform
 """
 import asyncio
+import logging
+import time
 from dataclasses import dataclass
+from typing import Optional
 from pydantic import BaseModel
 from services.bot_service import BotService, UserAction, BotResponse
 from core.interfaces.messaging_gateway import MessagingGateway
+from core.admission import get_admission_controller
+from core.deadline import check_deadline, committed, deadline_scope, remaining
+from core.metrics import PIPELINE_LATENCY
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -16,6 +24,7 @@ class ProcessMessageRequest:
     user_name: str
     message_text: str
     platform_data: dict
+    deadline: Optional[float] = None  # epoch seconds; the reply is dropped after this
 
 
 class MessageRequestDTO(BaseModel):
@@ -40,6 +49,8 @@ class ProcessMessageResponse:
     success: bool
     message: str
     response_text: str = ""
+    expired: bool = False  # deadline passed - dropped on purpose, not worth retrying
+    sent: bool = False  # a reply was handed to the gateway - never retry (it may have been delivered)
 
 
 class MessageUseCase:
@@ -51,46 +62,114 @@ class MessageUseCase:
     def __init__(self, bot_service: BotService, message_gateway: MessagingGateway):
         self.bot_service = bot_service
         self.message_gateway = message_gateway
+        self._replies_waiting = 0  # messages handled, sleeping through the reply delay
+        self._shed_blind = False  # shedding without a way to tell new users apart (logged once)
+
+    def replies_waiting(self) -> int:
+        """Messages already through bot handling, waiting out the reply delay (not backlog)"""
+        return self._replies_waiting
+    
+    def admit(self, user_id: str) -> bool:
+        """
+        Admission check for the webhook: while shedding, only confirmed first-time users
+        (absent from the loaded snapshot / row-mode id index) are processed; known users
+        get a fast ack. With neither loaded no user can be confirmed new: shed everyone.
+        """
+        admission = get_admission_controller()
+        if admission is None or not admission.should_shed():
+            self._shed_blind = False
+            return True
+        known = self.bot_service.form_service.is_known_user(user_id)
+        if known is None:
+            if not self._shed_blind:
+                self._shed_blind = True
+                logger.warning("Shedding degraded: no user snapshot or row index loaded, "
+                               "first-time users are shed too")
+            return False
+        return not known
     
     async def process_message(self, request: ProcessMessageRequest) -> ProcessMessageResponse:
         """
         Process incoming message - pure business logic
         """
+        start = time.perf_counter()
+        outcome = "error"
+        sent = False
         try:
-            # Convert to domain model
-            user_action = UserAction(
-                user_id=request.user_id,
-                user_name=request.user_name,
-                action_type="text_message",
-                data=request.message_text
-            )
-            
-            # Business logic - route to appropriate handler based on action type
-            if user_action.action_type == "text_message":
-                response = self.bot_service.handle_text_message(user_action)
-            elif user_action.action_type == "start":
-                response = self.bot_service.handle_start_command(user_action)
-            elif user_action.action_type == "callback":
-                response = self.bot_service.handle_callback(user_action)
-            else:
-                response = self.bot_service.handle_start_command(user_action)
-            
-            # Add delay to give LLM time to process before potential follow-up messages
-            # Only delay if we have a response to send (not empty/ignore responses)
-            if response.action_type != "ignore" and response.text.strip():
-                await asyncio.sleep(2.5)  # Wait 2.5 seconds
-            
-            # Send through gateway (abstraction layer)
-            await self.message_gateway.send_response(response, request.user_id)
+            # Deadline is propagated through a contextvar to every Sheets / LLM / Zalo call below
+            with deadline_scope(request.deadline):
+                check_deadline("processing")
+                
+                # Convert to domain model
+                user_action = UserAction(
+                    user_id=request.user_id,
+                    user_name=request.user_name,
+                    action_type="text_message",
+                    data=request.message_text
+                )
+                
+                # Bot logic does blocking Sheets / LLM I/O: run it off the event loop,
+                # bounded by the remaining budget (the thread stops at its next external call)
+                work = asyncio.ensure_future(asyncio.to_thread(self._handle_action, user_action))
+                try:
+                    response = await asyncio.wait_for(asyncio.shield(work), timeout=remaining())
+                except TimeoutError:
+                    if not committed():
+                        raise
+                    # A write already reached the sheet (stage may have moved): a thread cannot
+                    # be cancelled anyway, so finish and deliver the reply that matches it
+                    response = await work
+                
+                # Add delay to give LLM time to process before potential follow-up messages
+                # Only delay if we have a response to send (not empty/ignore responses)
+                # Skipped while degraded: the delay keeps tasks alive and grows the backlog
+                admission = get_admission_controller()
+                delay_enabled = admission is None or admission.reply_delay_enabled()
+                if delay_enabled and response.action_type != "ignore" and response.text.strip():
+                    self._replies_waiting += 1
+                    try:
+                        await asyncio.sleep(2.5)  # Wait 2.5 seconds
+                    finally:
+                        self._replies_waiting -= 1
+                
+                # Send through gateway (abstraction layer) - a late reply is worse than none
+                check_deadline("reply")
+                sent = True  # set before the call: a send that fails midway may still reach the user
+                await self.message_gateway.send_response(response, request.user_id)
+                outcome = "ignored" if response.action_type == "ignore" else "replied"
             
             return ProcessMessageResponse(
                 success=True,
                 message="Message processed successfully",
-                response_text=response.text
+                response_text=response.text,
+                sent=True
+            )
+        
+        except TimeoutError as e:  # DeadlineExceeded or wait_for timeout
+            outcome = "expired"
+            return ProcessMessageResponse(
+                success=False,
+                message=f"Deadline exceeded, message dropped: {e or 'time budget spent'}",
+                expired=True,
+                sent=sent
             )
             
         except Exception as e:
             return ProcessMessageResponse(
                 success=False,
-                message=f"Error processing message: {str(e)}"
+                message=f"Error processing message: {str(e)}",
+                sent=sent
             )
+        finally:
+            PIPELINE_LATENCY.observe(time.perf_counter() - start, outcome)
+    
+    def _handle_action(self, user_action: UserAction) -> BotResponse:
+        """Business logic - route to appropriate handler based on action type"""
+        if user_action.action_type == "text_message":
+            return self.bot_service.handle_text_message(user_action)
+        elif user_action.action_type == "start":
+            return self.bot_service.handle_start_command(user_action)
+        elif user_action.action_type == "callback":
+            return self.bot_service.handle_callback(user_action)
+        else:
+            return self.bot_service.handle_start_command(user_action)
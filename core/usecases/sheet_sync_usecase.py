@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Optional, Dict, Any, List
+from services.google_sheets_service import GoogleSheetsService
+
+logger = logging.getLogger(__name__)
+
+
+class RowDelta(BaseModel):
+    row: int  # sheet row number (1-based, header = 1)
+    columns: List[int]  # changed columns (1-based: A = 1)
+    values: List[Any]
+
+    @model_validator(mode='after')
+    def check_cells(self) -> 'RowDelta':
+        # zip() would silently drop or shift cells: a malformed delta is rejected whole.
+        # Columns past the tracked ones (A-H) are valid sheet columns and ignored later.
+        if self.row < 1:
+            raise ValueError(f"row must be >= 1, got {self.row}")
+        if len(self.columns) != len(self.values):
+            raise ValueError(f"{len(self.columns)} columns but {len(self.values)} values")
+        if any(column < 1 for column in self.columns):
+            raise ValueError(f"columns must be >= 1, got {self.columns}")
+        if len(set(self.columns)) != len(self.columns):
+            raise ValueError(f"duplicate columns: {self.columns}")
+        return self
+
+
+class SheetChangedDTO(BaseModel):
+    version: int  # incremented by Apps Script per batch
+    sheet: Optional[str] = None
+    deltas: List[RowDelta] = Field(default_factory=list)
+
+
+class SheetSyncUseCase:
+    def __init__(self, sheets_service: GoogleSheetsService, resync_min_interval: float = 60):
+        self.sheets_service = sheets_service
+        self.resync_min_interval = resync_min_interval
+        self._last_resync = float("-inf")
+
+    def reject(self, error: ValidationError) -> Dict[str, Any]:
+        """Malformed batch: its edits are lost, so the snapshot is no longer trusted as fresh"""
+        errors = error.errors(include_url=False, include_context=False, include_input=False)  # no cell values
+        logger.warning("Rejected malformed sheet delta batch - snapshot expired: %s",
+                       "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in errors))
+        self.sheets_service.expire_snapshot()
+        return {"status": "invalid", "errors": errors}
+
+    async def apply(self, dto: SheetChangedDTO) -> Dict[str, Any]:
+        """Apply pushed row edits to the local user cache; reload the sheet only on a gap."""
+        if dto.sheet and dto.sheet != self.sheets_service.worksheet_name:
+            return {"status": "ignored", "message": f"Sheet {dto.sheet} is not tracked"}
+
+        deltas = [
+            {"row": delta.row, "cells": dict(zip(delta.columns, delta.values))}
+            for delta in dto.deltas
+        ]
+        result = self.sheets_service.apply_row_deltas(dto.version, deltas)
+        if result["duplicate"]:
+            return {"status": "duplicate", "version": dto.version}
+        if result["resync"]:
+            now = time.monotonic()
+            if now - self._last_resync < self.resync_min_interval:
+                # Full downloads cost Sheets quota: one per interval, otherwise let the
+                # next lookup re-read (the snapshot is no longer trusted as fresh)
+                logger.warning("Sheet delta version %s out of sequence - resync deferred", dto.version)
+                self.sheets_service.expire_snapshot()
+                return {"status": "resync_deferred", "version": dto.version, "applied": result["applied"]}
+            self._last_resync = now
+            logger.warning("Sheet delta version %s out of sequence - reloading snapshot", dto.version)
+            await asyncio.to_thread(self.sheets_service.refresh_snapshot)
+            return {"status": "resynced", "version": dto.version, "applied": result["applied"]}
+        return {"status": "success", "version": dto.version, "applied": result["applied"]}
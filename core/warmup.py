@@ -0,0 +1,93 @@
+"""
+Startup warm-up phase
+
+Chạy song song trong background ngay khi app bắt đầu serve (sau deploy hoặc
+wake-from-sleep): Sheets auth + snapshot đầu tiên, parse templates, mở
+connection pool tới Zalo / OpenAI. /health trả về `ready` khi warm-up xong.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupState:
+    """Readiness flag + per-step result, exposed on /health"""
+    ready: bool = False
+    started_at: Optional[float] = None
+    duration_ms: Optional[float] = None
+    steps: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "duration_ms": self.duration_ms,
+            "steps": self.steps,
+        }
+
+
+def _warm_sheets():
+    from services.google_sheets_service import get_sheets_service
+    sheets = get_sheets_service()
+    sheets.connect()
+    # Re-reads the sheet unless a snapshot restored from disk is still current
+    return {"rows": len(sheets.reconcile_snapshot())}
+
+
+def _warm_templates():
+    from services.template_service import get_template_service
+    return {"templates": get_template_service().preload()}
+
+
+def _warm_zalo():
+    from core.container import get_container
+    get_container().zalo_gateway.warm_up()
+
+
+def _warm_openai():
+    from services.llm_service import get_llm_service
+    get_llm_service().warm_up()
+
+
+WARMUP_STEPS: Dict[str, Callable[[], Any]] = {
+    "sheets": _warm_sheets,
+    "templates": _warm_templates,
+    "zalo": _warm_zalo,
+    "openai": _warm_openai,
+}
+
+
+async def _run_step(state: WarmupState, name: str, func: Callable[[], Any], timeout: float) -> None:
+    start = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(asyncio.to_thread(func), timeout=timeout)
+        state.steps[name] = {"status": "ok", **(detail or {})}
+    except Exception as e:
+        # A failed step is not fatal: the resource is created on first use instead
+        state.steps[name] = {"status": "error", "error": str(e) or type(e).__name__}
+        logger.warning("Warm-up step %s failed: %s", name, e, extra={"step": name})
+    state.steps[name]["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def run_warmup(state: WarmupState, steps: List[str], timeout: float = 30) -> WarmupState:
+    """Run configured warm-up steps concurrently, then mark the app ready"""
+    state.started_at = time.time()
+    start = time.perf_counter()
+
+    unknown = [name for name in steps if name not in WARMUP_STEPS]
+    for name in unknown:
+        logger.warning("Unknown warm-up step: %s", name, extra={"step": name})
+
+    await asyncio.gather(*(
+        _run_step(state, name, WARMUP_STEPS[name], timeout)
+        for name in steps if name in WARMUP_STEPS
+    ))
+
+    state.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+    state.ready = True
+    logger.info("Warm-up completed", extra={"duration_ms": state.duration_ms, "steps": state.steps})
+    return state
@@ -0,0 +1,19 @@
+"""
+Migration: backfill `stage` column on the UserStatus sheet
+
+Chạy một lần sau khi deploy state machine:
+    python -m migrations.backfill_stage [--overwrite]
+"""
+import sys
+from services.google_sheets_service import get_sheets_service
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    overwrite = "--overwrite" in argv
+    updated = get_sheets_service().backfill_stages(overwrite=overwrite)
+    print(f"Stage migration done: {updated} rows updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 from typing import Optional, Tuple, Dict, Any
 from services.form_service import FormService, get_form_service
-from services.llm_service import get_llm_service
+from services.llm_service import extract_email_rule_based, get_llm_service
+from core.admission import get_admission_controller
+from core.metrics import BOT_STAGE
 
 # Constants
 THANK_YOU = "Cảm ơn bạn đã hoàn thành form! 🙏"
@@ -71,8 +73,13 @@ class BotService:
             )
         
         # User has sent actual email input - proceed with extraction
-        llm_service = get_llm_service()
-        extracted = llm_service.extract_email(user_action.data)
+        # (regex instead of LLM while the admission controller is degraded)
+        admission = get_admission_controller()
+        if admission is not None and not admission.use_llm():
+            extracted = extract_email_rule_based(user_action.data)
+        else:
+            llm_service = get_llm_service()
+            extracted = llm_service.extract_email(user_action.data)
 
         email_to_update = extracted.get('email') or current_info.get('email')
         if email_to_update:
@@ -106,9 +113,10 @@ class BotService:
             action_type="message"
         )
 
-    def handle_user_stage(self, user_action: UserAction) -> BotResponse:
+    def handle_user_stage(self, user_action: UserAction, stage: Optional[str] = None) -> BotResponse:
         """Handle user interaction based on their stage"""
-        stage = self.form_service.get_user_stage(user_action.user_id)
+        if stage is None:
+            stage = self.form_service.get_user_stage(user_action.user_id)
 
         if stage == 'first_time':
             return self.handle_first_time(user_action)
@@ -138,32 +146,18 @@ class BotService:
             )
             return self.handle_callback(callback_action)
         
-        # For first time users - always respond (no slash command needed)
-        if self.form_service.is_first_time_user(user_action.user_id):
-            return self.handle_user_stage(user_action)
-        
-        # Check if user has completed form (submitted status)
-        if self.form_service.has_completed_form(user_action.user_id):
-            # For completed users - ONLY respond if slash command present
-            if self.has_slash_command(user_action.data):
-                return self.handle_user_stage(user_action)
-            # No response - let human conversation continue
-            return BotResponse(
-                text="",  # Empty response = no reply
-                action_type="ignore"
-            )
-        
-        # For users still in form completion process (pending status)
-        user_stage = self.form_service.get_user_stage(user_action.user_id)
-        if user_stage == 'provide_field':
-            # Still need to collect email - always respond
-            return self.handle_user_stage(user_action)
+        # Stage is materialized on the user row -> one lookup decides the path
+        stage = self.form_service.get_user_stage(user_action.user_id)
         
-        # For other existing users - only respond if slash command present
-        if self.has_slash_command(user_action.data):
-            return self.handle_user_stage(user_action)
+        # For first time users - always respond (no slash command needed)
+        # For users still in form completion process, still need to collect email - always respond
+        # For completed and other existing users - only respond if slash command present
+        if stage in ('first_time', 'provide_field') or self.has_slash_command(user_action.data):
+            BOT_STAGE.inc(stage)
+            return self.handle_user_stage(user_action, stage)
         
         # No response - let human conversation continue
+        BOT_STAGE.inc('ignored')
         return BotResponse(
             text="",  # Empty response = no reply
             action_type="ignore"
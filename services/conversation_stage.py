@@ -0,0 +1,205 @@
+"""
+Conversation stage state machine
+
+Stage được lưu trực tiếp ở cột `stage` của sheet UserStatus, nên việc xác định
+stage của user chỉ còn là đọc một field. `derive_stage` chỉ dùng để backfill
+các dòng cũ hoặc tính stage mới khi dữ liệu user thay đổi.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from utils.date_convert import iso_to_vn_datetime
+
+logger = logging.getLogger(__name__)
+
+VN_TZ = timezone(timedelta(hours=7))
+
+FIRST_TIME = 'first_time'
+PROVIDE_FIELD = 'provide_field'
+SECOND_INTERACTION = 'second_interaction'
+FOLLOW_UP = 'follow_up'
+COMPLETED = 'completed'
+
+STAGES = (FIRST_TIME, PROVIDE_FIELD, SECOND_INTERACTION, FOLLOW_UP, COMPLETED)
+
+FOLLOW_UP_THRESHOLD = 86400  # 24 hours = 86400 seconds
+
+# Allowed moves between stages (self-transitions are always allowed)
+TRANSITIONS = {
+    FIRST_TIME: {PROVIDE_FIELD, SECOND_INTERACTION, FOLLOW_UP, COMPLETED},
+    PROVIDE_FIELD: {SECOND_INTERACTION, FOLLOW_UP, COMPLETED},
+    SECOND_INTERACTION: {FOLLOW_UP, COMPLETED},
+    FOLLOW_UP: {COMPLETED},
+    COMPLETED: set(),
+}
+
+# Moves the bot itself never makes, but a hand edit of the row does (ops reopen a form,
+# clear an email or a follow-up timestamp). Only used to re-sync a stored stage with the
+# row's data before a write - see FormService.apply_transition
+MANUAL_EDIT_TRANSITIONS = {
+    COMPLETED: {PROVIDE_FIELD, SECOND_INTERACTION, FOLLOW_UP},  # form_status back to pending
+    FOLLOW_UP: {PROVIDE_FIELD, SECOND_INTERACTION},  # email / last_follow_up_sent cleared
+    SECOND_INTERACTION: {PROVIDE_FIELD},  # email cleared
+}
+
+
+class InvalidStageTransition(ValueError):
+    """Raised when a stage move is not allowed by TRANSITIONS"""
+
+    def __init__(self, current: str, target: str):
+        super().__init__(f"Invalid stage transition: {current} → {target}")
+        self.current = current
+        self.target = target
+
+
+def can_transition(current: str, target: str, manual_edit: bool = False) -> bool:
+    """Check if moving from current to target stage is allowed (`manual_edit`: also hand-edit moves)"""
+    if current == target:
+        return True
+    if manual_edit and target in MANUAL_EDIT_TRANSITIONS.get(current, set()):
+        return True
+    return target in TRANSITIONS.get(current, set())
+
+
+def validate_transition(current: str, target: str) -> str:
+    """Return target stage or raise InvalidStageTransition"""
+    if target not in STAGES:
+        raise InvalidStageTransition(current, target)
+    if not can_transition(current, target):
+        raise InvalidStageTransition(current, target)
+    return target
+
+
+def derive_stage(user: Optional[Dict]) -> str:
+    """
+    Compute stage from a single user record (same rules as the old
+    FormService.get_user_stage, but without any extra lookup):
+    - 'first_time': Never seen before
+    - 'completed': form_status is not pending
+    - 'provide_field': pending, email missing
+    - 'second_interaction': pending, has email, no last_follow_up_sent
+    - 'follow_up': pending, has email and last_follow_up_sent
+    """
+    if not user:
+        return FIRST_TIME
+    if user.get('form_status') != 'pending':
+        return COMPLETED
+    if not str(user.get('email') or '').strip():
+        return PROVIDE_FIELD
+    if not user.get('last_follow_up_sent'):
+        return SECOND_INTERACTION
+    return FOLLOW_UP
+
+
+def read_stage(user: Optional[Dict]) -> str:
+    """
+    Read materialized stage of a user record.
+    Falls back to derive_stage for rows that have not been backfilled yet.
+    form_status is still honoured because Apps Script / ops can flip it to
+    'submitted' directly in the sheet without touching the stage column - or
+    back to 'pending' (form reopened), which makes a stored 'completed' stale.
+    """
+    if not user:
+        return FIRST_TIME
+    if user.get('form_status') != 'pending':
+        return COMPLETED
+    stage = str(user.get('stage') or '').strip()
+    if stage in STAGES and stage != COMPLETED:
+        return stage
+    return derive_stage(user)
+
+
+@dataclass
+class StageClassification:
+    """Column-oriented result of classify_users (one entry per user row)"""
+    user_ids: List[str] = field(default_factory=list)
+    user_names: List[str] = field(default_factory=list)
+    stages: List[str] = field(default_factory=list)
+    eligible: List[bool] = field(default_factory=list)
+    hours_until_due: List[Optional[float]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def due(self):
+        """Yield (user_id, user_name) of users eligible for a follow-up now"""
+        for user_id, user_name, ok in zip(self.user_ids, self.user_names, self.eligible):
+            if ok:
+                yield user_id, user_name
+
+
+def classify_users(records: List[Dict], now: Optional[datetime] = None,
+                   threshold_seconds: int = FOLLOW_UP_THRESHOLD) -> StageClassification:
+    """
+    Classify every user of one sheet snapshot in a single pass.
+    Rows are split into column arrays first, then stage / eligibility /
+    hours-until-due are computed column-wise - no per-user sheet lookups.
+    """
+    now = now or datetime.now(VN_TZ)
+    now_ts = now.timestamp()
+
+    ids = [str(r.get('id', '')) for r in records]
+    names = [r.get('username') or 'User' for r in records]
+    stages = [read_stage(r) for r in records]
+    last_sent = [follow_up_timestamp(r) for r in records]
+
+    elapsed = [now_ts - t if t is not None else None for t in last_sent]
+    candidate = [s == FOLLOW_UP and e is not None for s, e in zip(stages, elapsed)]
+    eligible = [c and e > threshold_seconds for c, e in zip(candidate, elapsed)]
+    hours = [
+        max(0.0, (threshold_seconds - e) / 3600) if c else None
+        for c, e in zip(candidate, elapsed)
+    ]
+
+    return StageClassification(
+        user_ids=ids,
+        user_names=names,
+        stages=stages,
+        eligible=eligible,
+        hours_until_due=hours,
+    )
+
+
+def parse_time(value) -> Optional[datetime]:
+    """Parse ISO timestamp from sheet into VN timezone, None if empty/invalid"""
+    if not value:
+        return None
+    try:
+        return iso_to_vn_datetime(str(value))
+    except ValueError:
+        return None
+
+
+def follow_up_timestamp(record: Dict) -> Optional[float]:
+    """last_follow_up_sent as epoch seconds (pre-parsed on snapshot UserRecords)"""
+    try:
+        return record.last_follow_up_ts
+    except AttributeError:
+        parsed = parse_time(record.get('last_follow_up_sent'))
+        return parsed.timestamp() if parsed else None
+
+
+# Listeners called with (user_id, record) after a user row changes
+_stage_listeners: List[Callable[[str, Dict], None]] = []
+
+
+def add_stage_listener(listener: Callable[[str, Dict], None]) -> None:
+    """Register a callback for user row / stage changes"""
+    if listener not in _stage_listeners:
+        _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener: Callable[[str, Dict], None]) -> None:
+    """Unregister a stage listener"""
+    if listener in _stage_listeners:
+        _stage_listeners.remove(listener)
+
+
+def notify_stage_listeners(user_id: str, record: Dict) -> None:
+    """Notify listeners, never letting a listener error break the write path"""
+    for listener in list(_stage_listeners):
+        try:
+            listener(str(user_id), record)
+        except Exception as e:
+            logger.warning("Stage listener failed for user %s: %s", user_id, e, extra={"user_id": user_id})
@@ -1,7 +1,21 @@
+import logging
 from datetime import datetime, timezone
 from typing import Optional, Dict, Tuple, Any
+from core.admission import get_admission_controller
 from core.config import settings
 from services.google_sheets_service import GoogleSheetsService, get_sheets_service
+from services.conversation_stage import (
+    COMPLETED,
+    PROVIDE_FIELD,
+    InvalidStageTransition,
+    can_transition,
+    derive_stage,
+    notify_stage_listeners,
+    read_stage,
+    validate_transition,
+)
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_USER_NAME = "User" # Default username if can not get username form platform
 
@@ -22,6 +36,10 @@ class FormService:
         """Get user data from sheets"""
         return self.sheets_service.get_user(user_id)
 
+    def is_known_user(self, user_id: str) -> Optional[bool]:
+        """True / False from in-memory state (no Sheets call), None when nothing is loaded to tell"""
+        return self.sheets_service.is_known_user(user_id)
+
     def is_first_time_user(self, user_id: str) -> bool:
         """Check if user is completely new (never seen before)"""
         return self.get_user(user_id) is None
@@ -29,11 +47,14 @@ class FormService:
     def mark_user_as_seen(self, user_id: str, username: str = None) -> bool:
         """Mark user as seen for the first time"""
         username = username or self.default_user_name
-        return self.sheets_service.add_user(user_id, username, 'pending')
+        return self.sheets_service.add_user(user_id, username, 'pending', stage=PROVIDE_FIELD)
 
     def mark_form_completed(self, user_id: str) -> bool:
         """Mark that user completed the form"""
-        return self.sheets_service.mark_form_submitted(user_id)
+        success = self.sheets_service.mark_form_submitted(user_id)
+        if success:
+            notify_stage_listeners(user_id, {'id': user_id, 'form_status': 'submitted', 'stage': COMPLETED})
+        return success
 
     def has_completed_form(self, user_id: str) -> bool:
         """Check if user completed the form"""
@@ -59,44 +80,71 @@ class FormService:
         # Có last_follow_up_sent, tức là 2+ lần
         return 2
 
-    def get_user_stage(self, user_id: str) -> str:
+    def get_user_stage(self, user_id: str, user: Optional[Dict] = None) -> str:
         """
-        Determine what stage user is in:
+        Read user stage from the materialized `stage` column:
         - 'first_time': Never seen before -> template_welcome_1
         - 'provide_field': Just seen, need to collect name/email -> template_customercare_1
         - 'second_interaction': Has name/email, 1st interaction -> template_customercare_2  
         - 'follow_up': Has 2+ interactions, pending status -> template_customercare_3
         - 'completed': Has completed form -> thank you message
         """
-        if self.is_first_time_user(user_id):
-            return 'first_time'
-        if self.has_completed_form(user_id):
-            return 'completed'
-        user = self.get_user(user_id)
-        if not user or user.get('form_status') != 'pending':
-            return 'completed'
-        
-        # Check if user has provided required fields (name and email)
-        if not self.has_provided_required_fields(user_id):
-            return 'provide_field'
-        
-        message_count = self.get_user_message_count(user_id)
-        if message_count == 1:
-            return 'second_interaction'
-        return 'follow_up'
+        if user is None:
+            user = self.get_user(user_id)
+        return read_stage(user)
+
+    def apply_transition(self, user_id: str, user: Optional[Dict] = None, **updates) -> bool:
+        """
+        Write field updates together with the stage they lead to, so the stage
+        column never drifts from the data. The move must be allowed by TRANSITIONS;
+        a stored stage left behind by a hand edit of the row is first re-synced with
+        the row's data when MANUAL_EDIT_TRANSITIONS lists that move. Any other invalid
+        move is logged and nothing is written (returns False).
+        """
+        if user is None:
+            user = self.get_user(user_id)
+        if not user:
+            return False
+
+        current = read_stage(user)
+        recorded = derive_stage(user)
+        if current != recorded and can_transition(current, recorded, manual_edit=True):
+            logger.info("Stage of user %s re-synced after a manual edit: %s -> %s", user_id, current, recorded,
+                        extra={"user_id": user_id, "stage_from": current, "stage_to": recorded})
+            current = recorded
+        try:
+            target = validate_transition(current, derive_stage({**user, **updates}))
+        except InvalidStageTransition as e:
+            logger.error("%s for user %s - update not written", e, user_id,
+                         extra={"user_id": user_id, "stage_from": e.current, "stage_to": e.target})
+            return False
+        if target != user.get('stage'):
+            updates['stage'] = target
+        if not updates:
+            return True
+        success = self.sheets_service.update_user(user_id, **updates)
+        if success:
+            notify_stage_listeners(user_id, {**user, **updates})
+        return success
 
-    def mark_follow_up_sent(self, user_id: str) -> bool:
+    def mark_follow_up_sent(self, user_id: str, user: Optional[Dict] = None) -> bool:
         """Mark that follow-up message was sent"""
-        return self.sheets_service.mark_follow_up_sent(user_id)
+        now = datetime.now().isoformat()
+        return self.apply_transition(user_id, user, last_follow_up_sent=now)
         
     def increment_message_count(self, user_id: str) -> None:
         """
         Update last_follow_up_sent for second interaction.
-        For subsequent interactions, rely on time comparison in get_user_stage.
+        For subsequent interactions, stage stays at follow_up.
         """
         user = self.get_user(user_id)
         if user and not user.get('last_follow_up_sent'):
-            self.mark_follow_up_sent(user_id)
+            admission = get_admission_controller()
+            if admission is not None and admission.defer_writes():
+                # Degraded: write later (re-reads the row then), one pending write per user
+                admission.defer(('follow_up_sent', user_id), lambda: self.mark_follow_up_sent(user_id))
+                return
+            self.mark_follow_up_sent(user_id, user)
 
     def get_welcome_message(self, user_name: str = None) -> Tuple[str, Any]:
         """Get welcome message using template"""
@@ -120,7 +168,9 @@ class FormService:
     
     def update_user_info(self, user_id: str, email: str = None) -> bool:
         """Update user's email information"""
-        return self.sheets_service.update_user_info(user_id, email)
+        if email is None:
+            return True
+        return self.apply_transition(user_id, email=email)
     
     def get_user_info(self, user_id: str) -> dict:
         """Get user's current email information"""
@@ -1,38 +1,175 @@
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 import os
-from typing import Optional, Dict, List
+import logging
+import re
+import threading
+import time
+from typing import Optional, Dict, Iterator, List
 from dotenv import load_dotenv
+from core.deadline import DeadlineExceeded
+from core.instrumentation import SHEETS_READ, SHEETS_WRITE, track_call
+from core.memory import track_cache
+from services.conversation_stage import COMPLETED, derive_stage, notify_stage_listeners
+from services.sheet_export import stream_records
+from services.snapshot_store import SnapshotStore
+from services.user_snapshot import UserRecord, UserSnapshot
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Sheet columns (1-based), header row must match these names
+FIELD_TO_COL = {
+    'id': 1,
+    'username': 2,
+    'email': 3,
+    'form_status': 4,
+    'form_submitted_at': 5,
+    'last_follow_up_sent': 6,
+    'created_at': 7,
+    'stage': 8
+}
+COL_TO_FIELD = {col: field for field, col in FIELD_TO_COL.items()}
+LAST_COL = 'H'  # column letter of the last field (stage)
+
+def _col_letter(col: int) -> str:
+    letters = ''
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
 class GoogleSheetsService:
     """Service to interact with Google Sheets as database"""
     
-    def __init__(self):
+    def __init__(self, lazy: bool = True, client=None):
         self.scopes = ['https://www.googleapis.com/auth/spreadsheets']
         self.credentials_file = os.getenv('CREDENTIALS_FILE', 'credentials.json')
         self.sheet_name = os.getenv('GOOGLE_SHEET_NAME', 'ZaloOA Users')
         self.sheet_id = os.getenv('GOOGLE_SHEET_ID')
         self.worksheet_name = os.getenv('WORKSHEET_NAME', 'UserStatus')
+        # Full-sheet snapshot reused by lookups for this many seconds (0 = always re-read)
+        self.cache_ttl = float(os.getenv('SHEETS_CACHE_TTL', '30'))
+        # HTTP read timeout of the gspread client; request deadlines are enforced before each call
+        self.timeout = float(os.getenv('SHEETS_TIMEOUT', '30'))
+        # Shared transport for all Sheets / Drive calls (see adapters/google_transport.py)
+        self.connect_timeout = float(os.getenv('SHEETS_CONNECT_TIMEOUT', '5'))
+        self.pool_size = int(os.getenv('SHEETS_POOL_SIZE', '4'))
+        self.retries = int(os.getenv('SHEETS_RETRIES', '2'))  # GET only, on connection errors / 429 / 5xx
+        self.token_refresh_margin = float(os.getenv('SHEETS_TOKEN_REFRESH_MARGIN', '600'))
+        self.transport = None
+        # "snapshot": lookups scan the full-sheet snapshot (re-read when stale)
+        # "row": lookups use an id-column index + single-row reads/writes when the snapshot is stale
+        self.access_mode = os.getenv('SHEETS_ACCESS_MODE', 'snapshot')
+        # Once Apps Script pushes row deltas (/sheet-changed), the snapshot's values are kept current
+        # by them and stay fresh up to this age instead of cache_ttl (0 = ignore pushes for freshness).
+        # Row positions are not: onEdit does not fire for row inserts / deletes or API writes,
+        # so positional writes still re-read after cache_ttl
+        self.push_max_age = float(os.getenv('SHEETS_PUSH_MAX_AGE', '600'))
+        # Change detection for stale snapshots: read a cheap revision marker first and re-download
+        # only when it changed. '' = off, 'drive' = spreadsheet modifiedTime (sees every writer,
+        # including our own writes), or an A1 cell kept current by Apps Script (e.g. 'Meta!A1').
+        # A cell marker only moves on onEdit (manual edits): API writes from other processes
+        # leave it unchanged, so it is only safe while this process is the sheet's only API writer
+        self.revision_source = os.getenv('SHEETS_REVISION_SOURCE', '')
+        if self.revision_source not in ('', 'drive') and os.getenv('WORKER_MODE', 'inprocess') == 'queue':
+            # The web process and the queue worker both write - the marker would hide the
+            # other's writes for up to SHEETS_REVISION_MAX_AGE
+            logger.warning("SHEETS_REVISION_SOURCE=%s ignored in queue mode (use 'drive')", self.revision_source)
+            self.revision_source = ''
+        # Full re-read at least this often even if the revision looks unchanged (0 = never)
+        self.revision_max_age = float(os.getenv('SHEETS_REVISION_MAX_AGE', '3600'))
+        if self.revision_source == 'drive':
+            self.scopes.append('https://www.googleapis.com/auth/drive.metadata.readonly')
+        # Full-sheet reads: 'values' = get_all_records() (whole response held in memory),
+        # 'csv' = stream the worksheet's CSV export and parse rows as they arrive (flat memory)
+        self.bulk_reader = os.getenv('SHEETS_BULK_READER', 'values')
+        # Local snapshot file for warm restarts ('' = off), saved at most every interval when changed.
+        # Off by default: the file holds user emails
+        snapshot_path = os.getenv('SHEETS_SNAPSHOT_PATH', '')
+        self.snapshot_store = SnapshotStore(snapshot_path) if snapshot_path else None
+        self.snapshot_save_interval = float(os.getenv('SHEETS_SNAPSHOT_SAVE_INTERVAL', '60'))
         
-        # Initialize connection
-        self._init_connection()
-        self._init_worksheet()
+        # Connection is opened on first use (or by the lifespan warm-up), not at import/construction.
+        # `client` lets callers inject an already-authorized gspread-compatible client (load tests, fakes)
+        self.gc = client
+        self._spreadsheet = None
+        self._worksheet = None
+        self._connect_lock = threading.Lock()
+        self._records: Optional[UserSnapshot] = None
+        self._records_loaded_at = 0.0  # last time the snapshot was downloaded or revalidated
+        self._records_fetched_at = 0.0  # last full download
+        self._records_revision = None  # revision marker seen before that download
+        self._records_generation = 0  # bumped on every snapshot change
+        self._records_verified = True  # False for a restored snapshot until checked against the sheet
+        self._saved_generation = 0  # generation last written to the snapshot file
+        self._records_lock = threading.RLock()
+        self._row_index = None  # user_id -> 1-based sheet row (row mode)
+        self._row_index_lock = threading.Lock()
+        self._delta_version = None  # last applied /sheet-changed version
+        track_cache("user_snapshot", lambda: self._records, evict=self._evict_snapshot,
+                    size=lambda: self._records.approx_bytes() if self._records is not None else 0)
+        track_cache("row_index", lambda: self._row_index)
+        if not lazy:
+            self.connect()
+    
+    def connect(self) -> None:
+        """Authenticate and open the worksheet once (thread-safe, idempotent)"""
+        if self._worksheet is not None:
+            return
+        with self._connect_lock:
+            if self._worksheet is None:
+                if self.gc is None:
+                    self._init_connection()
+                self._init_worksheet()
+    
+    @property
+    def is_connected(self) -> bool:
+        return self._worksheet is not None
+    
+    @property
+    def spreadsheet(self):
+        self.connect()
+        return self._spreadsheet
+    
+    @spreadsheet.setter
+    def spreadsheet(self, value):
+        self._spreadsheet = value
+    
+    @property
+    def worksheet(self):
+        self.connect()
+        return self._worksheet
+    
+    @worksheet.setter
+    def worksheet(self, value):
+        self._worksheet = value
     
     def _init_connection(self):
         """Initialize Google Sheets connection"""
+        # Heavy Google client imports are deferred until the first connection
+        import gspread
+        from google.oauth2.service_account import Credentials
+        from adapters.google_transport import GoogleTransport
         try:
             creds = Credentials.from_service_account_file(
                 self.credentials_file, 
                 scopes=self.scopes
             )
-            self.gc = gspread.authorize(creds)
-            print("✅ Google Sheets connection established")
+            self.transport = GoogleTransport(
+                creds,
+                pool_size=self.pool_size,
+                retries=self.retries,
+                refresh_margin=self.token_refresh_margin,
+            )
+            self.gc = gspread.authorize(creds, session=self.transport.session)
+            self.gc.set_timeout((self.connect_timeout, self.timeout))
+            self.transport.start()
+            logger.info("Google Sheets connection established")
         except Exception as e:
-            print(f"❌ Failed to connect to Google Sheets: {e}")
+            logger.error("Failed to connect to Google Sheets: %s", e)
             raise
     
     def _init_worksheet(self):
@@ -40,38 +177,359 @@ class GoogleSheetsService:
         try:
             if self.sheet_id:
                 # Open by ID
-                self.spreadsheet = self.gc.open_by_key(self.sheet_id)
+                spreadsheet = self.gc.open_by_key(self.sheet_id)
             else:
                 # Open by name
-                self.spreadsheet = self.gc.open(self.sheet_name)
+                spreadsheet = self.gc.open(self.sheet_name)
             
-            self.worksheet = self.spreadsheet.worksheet(self.worksheet_name)
+            self._spreadsheet = spreadsheet
+            self._worksheet = spreadsheet.worksheet(self.worksheet_name)
                 
         except Exception as e:
-            print(f"❌ Failed to initialize worksheet: {e}")
+            logger.error("Failed to initialize worksheet: %s", e, extra={"worksheet": self.worksheet_name})
+            raise
+    
+    def _snapshot_fresh(self, positional: bool = False) -> bool:
+        max_age = self.cache_ttl
+        if not positional and self._delta_version is not None and self.push_max_age > 0:
+            max_age = max(max_age, self.push_max_age)
+        if positional and not self._records_verified:
+            return False  # restored from file: row positions may be days old
+        return (
+            self._records is not None
+            and max_age > 0
+            and time.monotonic() - self._records_loaded_at < max_age
+        )
+    
+    def _get_records(self, force: bool = False, revalidate: bool = False,
+                     positional: bool = False) -> UserSnapshot:
+        """
+        Return the cached snapshot of all rows, re-reading the sheet when stale.
+        `revalidate` skips the TTL shortcut but still goes through the revision check.
+        `positional`: the caller needs row positions (writes) - pushed deltas do not extend freshness.
+        """
+        with self._records_lock:
+            if self._snapshot_fresh(positional) and not (force or revalidate):
+                return self._records
+        
+        # Read the revision before the download: an edit landing during it bumps the
+        # revision again, so it is picked up by the next check instead of being lost
+        revision = self._read_revision() if self.revision_source else None
+        if not force and self._revision_unchanged(revision):
+            with self._records_lock:
+                self._records_loaded_at = time.monotonic()
+                self._records_verified = True
+                return self._records
+        
+        records = self._download_records()
+        with self._records_lock:
+            self._records = records
+            self._records_loaded_at = self._records_fetched_at = time.monotonic()
+            self._records_revision = revision
+            self._records_generation += 1
+            self._records_verified = True
+        self._index_rows(records)
+        return records
+    
+    def _download_records(self) -> UserSnapshot:
+        if self.bulk_reader == 'csv':
+            return UserSnapshot(self.iter_records())
+        with track_call(SHEETS_READ):
+            return UserSnapshot(self.worksheet.get_all_records())
+    
+    def iter_records(self, worksheet=None) -> Iterator[Dict]:
+        """
+        Stream the rows of `worksheet` (default: the user sheet) as get_all_records()-shaped
+        dicts, parsed from the CSV export while it downloads - nothing is materialized
+        """
+        worksheet = worksheet or self.worksheet
+        http = self.gc.http_client
+        with track_call(SHEETS_READ):
+            yield from stream_records(http.session, self.spreadsheet.id, worksheet.id, timeout=http.timeout)
+    
+    def _index_rows(self, records: UserSnapshot) -> None:
+        # Snapshot order is sheet order: rebuild the row-mode index for free
+        # (snapshot mode finds rows through the snapshot's own id index)
+        if self.access_mode == 'row':
+            with self._row_index_lock:
+                self._row_index = {r.user_id: i + 2 for i, r in enumerate(records)}
+    
+    def _row_holds(self, row: int, user_id: str) -> bool:
+        """
+        One-cell read of column A: row numbers cached from an earlier read go stale
+        once another process adds, inserts or deletes rows, so check before writing
+        """
+        with track_call(SHEETS_READ):
+            values = self.worksheet.get(f"A{row}")
+        return bool(values and values[0]) and str(values[0][0]) == str(user_id)
+    
+    def _read_revision(self) -> Optional[str]:
+        """Current revision marker of the sheet, None when it cannot be read"""
+        try:
+            with track_call(SHEETS_READ):
+                if self.revision_source == 'drive':
+                    return self.spreadsheet.get_lastUpdateTime()
+                values = self.spreadsheet.values_get(self.revision_source).get('values')
+            return str(values[0][0]) if values and values[0] else ''
+        except DeadlineExceeded:
             raise
+        except Exception as e:
+            logger.warning("Could not read sheet revision (%s): %s", self.revision_source, e)
+            return None
+    
+    def _revision_unchanged(self, revision: Optional[str]) -> bool:
+        """True when the snapshot was downloaded at this same revision (and is not too old)"""
+        with self._records_lock:
+            return (
+                revision is not None
+                and self._records is not None
+                and revision == self._records_revision
+                and (self.revision_max_age <= 0
+                     or time.monotonic() - self._records_fetched_at < self.revision_max_age)
+            )
+    
+    def apply_row_deltas(self, version: int, deltas: List[Dict]) -> Dict:
+        """
+        Apply row edits pushed by Apps Script to the snapshot - no Sheets call.
+        `deltas`: [{'row': sheet row (1-based), 'cells': {column (1-based): value}}]
+        `version` increases by one per batch; a gap (missed batch), an edit of the
+        header or of rows past the end of the snapshot sets `resync` - the caller
+        should then reload the snapshot. Version 1 after higher versions = sender restarted.
+        Without a snapshot (row mode / not loaded yet) only the row index is kept valid.
+        """
+        changed = []
+        with self._records_lock:
+            last = self._delta_version
+            if last is not None and version <= last and version != 1:
+                return {'applied': 0, 'duplicate': True, 'resync': False}
+            resync = last is not None and version != last + 1
+            self._delta_version = version
+            records = self._records
+            if records is None:
+                if any(FIELD_TO_COL['id'] in map(int, delta['cells']) for delta in deltas):
+                    with self._row_index_lock:
+                        self._row_index = None  # ids moved: re-read the id column on next lookup
+                return {'applied': 0, 'duplicate': False, 'resync': False}
+            
+            for delta in deltas:
+                row, cells = int(delta['row']), delta['cells']
+                index = row - 2
+                if index < 0 or index > len(records):
+                    resync = True
+                    continue
+                if index == len(records):
+                    records.append(UserRecord())
+                old_id = records[index].user_id
+                fields = {COL_TO_FIELD[int(col)]: value for col, value in cells.items() if int(col) in COL_TO_FIELD}
+                record = records.update(index, fields)
+                changed.append((row, old_id, record))
+            if changed:
+                self._records_generation += 1
+        
+        with self._row_index_lock:
+            if self._row_index is not None:
+                for row, old_id, record in changed:
+                    if str(record.get('id')) != old_id:
+                        self._row_index.pop(old_id, None)
+                    if record.get('id') != '':
+                        self._row_index[str(record.get('id'))] = row
+        for row, old_id, record in changed:
+            if record.get('id') != '':
+                notify_stage_listeners(str(record.get('id')), record)
+        
+        logger.info("Applied %s sheet row deltas (version %s)", len(changed), version,
+                    extra={"version": version, "rows": len(changed), "resync": resync})
+        return {'applied': len(changed), 'duplicate': False, 'resync': resync}
+    
+    # --- Row mode: id-column index + point reads / writes ---------------------
+    
+    def _load_row_index(self) -> Dict[str, int]:
+        """Read only the id column and map user_id -> sheet row"""
+        with track_call(SHEETS_READ):
+            ids = self.worksheet.col_values(FIELD_TO_COL['id'])
+        index = {str(value): row for row, value in enumerate(ids, start=1) if row > 1 and value != ''}
+        with self._row_index_lock:
+            self._row_index = index
+        return index
+    
+    def _find_row(self, user_id: str) -> Optional[int]:
+        """Sheet row of a user; reloads the id column once on a miss (rows added by other processes)"""
+        index = self._row_index
+        reloaded = index is None
+        if index is None:
+            index = self._load_row_index()
+        row = index.get(str(user_id))
+        if row is None and not reloaded:
+            row = self._load_row_index().get(str(user_id))
+        return row
+    
+    def _read_row(self, row: int) -> Optional[Dict]:
+        """Fetch one `A{n}:H{n}` row as a record shaped like get_all_records()"""
+        from gspread.utils import numericise_all
+        
+        with track_call(SHEETS_READ):
+            values = self.worksheet.get(f"A{row}:{LAST_COL}{row}")
+        if not values or not values[0]:
+            return None
+        keys = list(FIELD_TO_COL.keys())
+        cells = values[0] + [''] * (len(keys) - len(values[0]))
+        return dict(zip(keys, numericise_all(cells, default_blank='')))
+    
+    def _get_user_by_row(self, user_id: str) -> Optional[Dict]:
+        row = self._find_row(user_id)
+        if row is None:
+            return None
+        record = self._read_row(row)
+        if record is None or str(record.get('id')) != str(user_id):
+            # Rows moved since the index was built - rebuild and retry once
+            row = self._load_row_index().get(str(user_id))
+            record = self._read_row(row) if row else None
+        return record
+    
+    def _update_row(self, user_id: str, fields: Dict) -> bool:
+        """Write only the given fields of one row, in a single batch request"""
+        index = self._row_index
+        row = self._find_row(user_id)
+        if row is None:
+            return False
+        if self._row_index is index and not self._row_holds(row, user_id):
+            # Index predates a row insert / delete - rebuild it rather than overwrite another user
+            row = self._load_row_index().get(str(user_id))
+            if row is None:
+                return False
+        data = [
+            {'range': f"{_col_letter(FIELD_TO_COL[field])}{row}", 'values': [[value]]}
+            for field, value in fields.items()
+        ]
+        with track_call(SHEETS_WRITE):
+            self.worksheet.batch_update(data)
+        with self._records_lock:
+            records = self._records
+            position = records.position(user_id) if records is not None else None
+            if position is not None:
+                records.update(position, fields)  # keep snapshot in sync with the sheet
+                self._records_generation += 1
+        return True
+    
+    def refresh_snapshot(self) -> UserSnapshot:
+        """Force a full re-read of the sheet into the snapshot cache"""
+        return self._get_records(force=True)
+    
+    def reconcile_snapshot(self) -> UserSnapshot:
+        """Bring the current (e.g. restored) snapshot up to date: revision check, else full re-read"""
+        return self._get_records(revalidate=True)
+    
+    def _snapshot_key(self) -> str:
+        return f"{self.sheet_id or self.sheet_name}/{self.worksheet_name}"
+    
+    def restore_snapshot(self) -> int:
+        """
+        Load the snapshot file saved by a previous run (warm restart) and serve it to
+        reads as fresh; reconcile_snapshot() (warm-up) then checks it against the live
+        sheet. Until that succeeds, writes re-read the sheet first (positions may be stale).
+        Returns the number of rows restored.
+        """
+        if self.snapshot_store is None:
+            return 0
+        loaded = self.snapshot_store.load(expect={'sheet': self._snapshot_key()})
+        if loaded is None:
+            return 0
+        records, header = loaded
+        now = time.monotonic()
+        with self._records_lock:
+            if self._records is not None:
+                return 0  # live data arrived first
+            self._records = records
+            self._records_loaded_at = now
+            self._records_fetched_at = now - max(0.0, time.time() - header.get('fetched_at', 0))
+            self._records_revision = header.get('revision')
+            self._records_verified = False
+            # The push sequence (/sheet-changed version) is not restored: deltas sent while this
+            # process was down are lost, so pushes must not extend this snapshot's freshness
+            self._saved_generation = self._records_generation
+        self._index_rows(records)
+        logger.info("Restored %s users from snapshot file", len(records),
+                    extra={"rows": len(records), "saved_at": header.get('saved_at')})
+        return len(records)
+    
+    def save_snapshot(self) -> bool:
+        """Write the snapshot file if the snapshot changed since the last save (blocking)"""
+        if self.snapshot_store is None:
+            return False
+        with self._records_lock:
+            records, generation = self._records, self._records_generation
+            if records is None or generation == self._saved_generation:
+                return False
+            rows = [record.to_row() for record in records]  # copy under the lock, write outside it
+            meta = {
+                'sheet': self._snapshot_key(),
+                'revision': self._records_revision,
+                'fetched_at': time.time() - (time.monotonic() - self._records_fetched_at),
+            }
+        size = self.snapshot_store.save(rows, meta)
+        with self._records_lock:
+            self._saved_generation = generation
+        logger.info("Saved %s users to snapshot file (%s bytes)", len(rows), size)
+        return True
+    
+    def expire_snapshot(self) -> None:
+        """Keep the snapshot but make the next lookup revalidate it (revision check or re-read)"""
+        with self._records_lock:
+            self._records_loaded_at = 0.0
+    
+    def _evict_snapshot(self, level: int) -> int:
+        """
+        Memory pressure: in row mode the snapshot is optional (lookups fall back to row
+        reads, the row index tells known users apart), so drop it. Snapshot mode serves
+        every lookup from it - dropping it would only re-download the sheet into the
+        same memory - so there it is exempt.
+        """
+        if self.access_mode != 'row':
+            return 0
+        with self._records_lock:
+            records, self._records = self._records, None
+        return len(records) if records is not None else 0
+    
+    def invalidate_snapshot(self) -> None:
+        """Drop the snapshot so the next lookup re-reads the sheet"""
+        with self._records_lock:
+            self._records = None
     
     def get_user(self, user_id: str) -> Optional[Dict]:
         """Get user data from sheet"""
         try:
-            records = self.worksheet.get_all_records()
-            for record in records:
-                if str(record.get('id')) == str(user_id):
-                    return record
-            return None
+            if self.access_mode == 'row' and not self._snapshot_fresh():
+                return self._get_user_by_row(user_id)
+            return self._get_records().get(user_id)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"❌ Error getting user {user_id}: {e}")
+            logger.error("Error getting user %s: %s", user_id, e, extra={"user_id": user_id})
             return None
         
-    def get_all_users(self) -> List[Dict]:
+    def is_known_user(self, user_id: str) -> Optional[bool]:
+        """
+        Whether the user already has a row, from memory only (loaded snapshot of any
+        age, or the row-mode id index) - None when neither is loaded
+        """
+        records, index = self._records, self._row_index
+        if records is not None and records.position(user_id) is not None:
+            return True
+        if index is not None:
+            return str(user_id) in index
+        return False if records is not None else None
+
+    def get_all_users(self) -> List[UserRecord]:
         """Get all users from sheet"""
         try:
-            return self.worksheet.get_all_records()
+            return list(self._get_records())
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"❌ Error getting all users: {e}")
+            logger.error("Error getting all users: %s", e)
             return []
     
-    def add_user(self, user_id: str, username: str, form_status: str = 'pending') -> bool:
+    def add_user(self, user_id: str, username: str, form_status: str = 'pending', stage: str = '') -> bool:
         """Add new user to sheet"""
         try:
             now = datetime.now().isoformat()
@@ -82,79 +540,92 @@ class GoogleSheetsService:
                 form_status,
                 '',  # form_submitted_at
                 '',  # last_follow_up_sent
-                now  # created_at
+                now,  # created_at
+                stage
             ]
             
-            # Find the next empty row and append from column A
-            next_row = len(self.worksheet.get_all_values()) + 1
-            range_name = f"A{next_row}:G{next_row}"  # From column A to G (removed one column)
-            self.worksheet.update(range_name, [row_data])
+            if self._records is not None and not self._records_verified:
+                self.reconcile_snapshot()  # restored snapshot: check it before appending to it
             
-            print(f"✅ Added user {user_id} ({username}) to row {next_row}")
+            # Append after the last row of the table (Sheets picks the row, counting rows whose
+            # column A is blank): no read first, and no overwrite of a row added meanwhile
+            with track_call(SHEETS_WRITE):
+                result = self.worksheet.append_row(row_data, value_input_option='RAW',
+                                                   insert_data_option='INSERT_ROWS', table_range='A1')
+            next_row = int(re.search(r'(\d+)$', result['updates']['updatedRange']).group(1))
+            with self._records_lock:
+                if self._records is not None:
+                    if len(self._records) + 2 == next_row:
+                        self._records.append(dict(zip(FIELD_TO_COL.keys(), row_data)))
+                        self._records_generation += 1
+                    else:
+                        # Rows were added / removed behind the snapshot: its positions are off
+                        logger.info("Snapshot has %s rows, sheet had %s - dropping it",
+                                    len(self._records), next_row - 2, extra={"row": next_row})
+                        self.invalidate_snapshot()
+            with self._row_index_lock:
+                if self._row_index is not None:
+                    self._row_index[str(user_id)] = next_row
+            
+            logger.info("Added user %s to row %s", user_id, next_row, extra={"user_id": user_id, "row": next_row})
             return True
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"❌ Error adding user {user_id}: {e}")
+            logger.error("Error adding user %s: %s", user_id, e, extra={"user_id": user_id})
             return False
     
     def update_user(self, user_id: str, **kwargs) -> bool:
         """Update user data in sheet"""
-        records = self.worksheet.get_all_records()
-        for i, record in enumerate(records):
-            if str(record.get('id')) == str(user_id):
-                row_num = i + 2  # +2 because of header and 1-based indexing
-                field_to_col = {
-                    'username': 2,
-                    'email': 3,
-                    'form_status': 4,
-                    'form_submitted_at': 5,
-                    'last_follow_up_sent': 6,
-                    'created_at': 7
-                }
-                    
-                if 'username' in kwargs and 'username' in field_to_col:
-                    self.worksheet.update_cell(row_num, field_to_col['username'], kwargs['username'])
-                if 'email' in kwargs and 'email' in field_to_col:   
-                    self.worksheet.update_cell(row_num, field_to_col['email'], kwargs['email'])
-                if 'form_status' in kwargs and 'form_status' in field_to_col:
-                    self.worksheet.update_cell(row_num, field_to_col['form_status'], kwargs['form_status'])
-                if 'form_submitted_at' in kwargs and 'form_submitted_at' in field_to_col:
-                    self.worksheet.update_cell(row_num, field_to_col['form_submitted_at'], kwargs['form_submitted_at'])
-                if 'last_follow_up_sent' in kwargs and 'last_follow_up_sent' in field_to_col:
-                    self.worksheet.update_cell(row_num, field_to_col['last_follow_up_sent'], kwargs['last_follow_up_sent'])
-                if 'created_at' in kwargs and 'created_at' in field_to_col:
-                    self.worksheet.update_cell(row_num, field_to_col['created_at'], kwargs['created_at'])
-                    
-                return True
-        return False
+        if self.access_mode == 'row' and not self._snapshot_fresh(positional=True):
+            fields = {f: v for f, v in kwargs.items() if f in FIELD_TO_COL and f != 'id'}
+            return self._update_row(user_id, fields) if fields else self._find_row(user_id) is not None
+        fetched_at = self._records_fetched_at
+        records = self._get_records(positional=True)
+        position = records.position(user_id)
+        if position is None:
+            return False
+        if self._records_fetched_at == fetched_at and not self._row_holds(position + 2, user_id):
+            # Snapshot predates a row insert / delete by another process - re-read, never
+            # write into whichever user now sits at the cached row number
+            records = self.refresh_snapshot()
+            position = records.position(user_id)
+            if position is None:
+                return False
+        row_num = position + 2  # +2 because of header and 1-based indexing
+        for field, value in kwargs.items():
+            if field in FIELD_TO_COL and field != 'id':
+                with track_call(SHEETS_WRITE):
+                    self.worksheet.update_cell(row_num, FIELD_TO_COL[field], value)
+                with self._records_lock:
+                    records.update(position, {field: value})  # keep snapshot in sync with the sheet
+                    self._records_generation += 1
+        return True
     
     def sync_form_responses(self, response_sheet_name="UserStatus"):
-        response_ws = self.spreadsheet.worksheet(response_sheet_name)
-        responses = response_ws.get_all_records()
-        
-        all_users = self.get_all_users()
-        
-        email_to_userid = {}
-        for user in all_users:
-            email = user.get("email", "").strip().lower()  
-            if email:
-                email_to_userid[email] = user.get("id")
+        # Form submissions are written by Apps Script -> always start from a fresh snapshot
+        all_users = self.refresh_snapshot()
+        if response_sheet_name == self.worksheet_name:
+            responses = all_users
+        else:
+            response_ws = self.spreadsheet.worksheet(response_sheet_name)
+            if self.bulk_reader == 'csv':
+                responses = self.iter_records(response_ws)  # matched row by row while streaming
+            else:
+                with track_call(SHEETS_READ):
+                    responses = response_ws.get_all_records()
         
+        # Pending users are matched through the snapshot's email index - no per-response scan
         updated_users = []
         for response in responses:
-            email = response.get("email", "").strip().lower()  
-            if not email:
-                continue
+            user_data = all_users.find_email(response.get("email", ""))
+            if user_data and user_data.get("form_status") != "submitted":
+                success = self.mark_form_submitted(user_data.user_id)
                 
-            if email in email_to_userid:
-                user_id = email_to_userid[email]
-                user_data = self.get_user(user_id)
-                if user_data and user_data.get("form_status") != "submitted":
-                    success = self.mark_form_submitted(user_id)
-                    
-                    if success:
-                        username = user_data.get("username", "Unknown")
-                        updated_users.append(username)
+                if success:
+                    username = user_data.get("username", "Unknown")
+                    updated_users.append(username)
                         
         return updated_users
     
@@ -164,7 +635,8 @@ class GoogleSheetsService:
         return self.update_user(
             user_id, 
             form_status='submitted', 
-            form_submitted_at=now
+            form_submitted_at=now,
+            stage=COMPLETED
         )
     
     def mark_follow_up_sent(self, user_id: str) -> bool:
@@ -192,10 +664,65 @@ class GoogleSheetsService:
         
         return bool(email)
     
-    def get_users_by_status(self, status: str) -> List[Dict]:
-        """Get users by form status"""
-        all_users = self.get_all_users()
-        return [user for user in all_users if user.get('form_status') == status]
+    def funnel_stats(self) -> Dict:
+        """
+        Funnel counters maintained by the snapshot on every write / delta / reload.
+        O(1): never re-reads the sheet except to load a first snapshot - and in row mode,
+        where lookups never refresh the snapshot, to reload it once older than cache_ttl.
+        """
+        records = self._records
+        if records is None or (self.access_mode == 'row' and not self._snapshot_fresh()):
+            records = self._get_records()
+        with self._records_lock:
+            stats = records.funnel()
+            stats['snapshot_age_s'] = round(time.monotonic() - self._records_loaded_at, 1)
+        return stats
+    
+    def get_users_by_status(self, status: str) -> List[UserRecord]:
+        """Get users by form status (snapshot status index)"""
+        try:
+            return self._get_records().with_status(status)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error("Error getting users with status %s: %s", status, e)
+            return []
+
+    def backfill_stages(self, overwrite: bool = False) -> int:
+        """
+        Migration: add `stage` header and fill the stage column for existing rows.
+        Uses one read and one range write. Returns number of rows updated.
+        """
+        with track_call(SHEETS_READ):
+            values = self.worksheet.get_all_values()
+        if not values:
+            return 0
+        
+        header = values[0]
+        stage_col = FIELD_TO_COL['stage']
+        if len(header) < stage_col or header[stage_col - 1] != 'stage':
+            with track_call(SHEETS_WRITE):
+                self.worksheet.update_cell(1, stage_col, 'stage')
+        
+        keys = list(FIELD_TO_COL.keys())
+        column = []
+        updated = 0
+        for row in values[1:]:
+            record = dict(zip(keys, row + [''] * (len(keys) - len(row))))
+            current = record.get('stage', '')
+            if current and not overwrite:
+                column.append([current])
+                continue
+            column.append([derive_stage(record)])
+            updated += 1
+        
+        if column:
+            last_row = len(values)
+            with track_call(SHEETS_WRITE):
+                self.worksheet.update(f"H2:H{last_row}", column)
+        
+        logger.info("Backfilled stage for %s users", updated, extra={"updated": updated})
+        return updated
 
 # Global instance
 sheets_service = None
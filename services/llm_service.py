@@ -1,11 +1,22 @@
 import json
 import logging
-from openai import OpenAI
+import re
 from typing import Optional, Dict, List, Any
 from core.config import settings
+from core.deadline import call_timeout, remaining
+from core.instrumentation import LLM_CALL, track_call
 
 logger = logging.getLogger(__name__)
 
+_EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+
+
+def extract_email_rule_based(text: str) -> Dict[str, Any]:
+    """Regex fallback for extract_email (degraded mode) - same result shape, no API call"""
+    match = _EMAIL_PATTERN.search(text or "")
+    return {"email": match.group(0).lower() if match else None}
+
+
 class LLMService:
     """Centralized service for all interacting with LLMs"""
     
@@ -14,11 +25,22 @@ class LLMService:
             logger.warning("OpenAI API key not configured. LLM operations will be disabled.")
             self.client = None
         else:
-            self.client = OpenAI(api_key=settings.openai_api_key)
+            # Imported here: the openai package is slow to import and only needed once LLM is used
+            from openai import OpenAI
+            self.client = OpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=settings.openai_timeout,
+            )
             self.model = settings.openai_model
             self.temperature = settings.openai_temperature
             self.max_tokens = settings.openai_max_tokens
             
+    def warm_up(self) -> None:
+        """Open a pooled TLS connection to the OpenAI API ahead of the first extraction"""
+        if self._is_available():
+            self.client.with_options(timeout=10, max_retries=0).models.list()
+
     def _is_available(self) -> bool:
         """Check if LLM is available"""
         return self.client is not None
@@ -45,14 +67,20 @@ class LLMService:
         - "chỉ có email@domain.com thôi" → {{"name": null, "email": "email@domain.com"}}
         """
             
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens
-        )
+        # Inside a request deadline: timeout from the remaining budget, no retries past it
+        client = self.client
+        if remaining() is not None:
+            client = client.with_options(timeout=call_timeout(settings.openai_timeout, "LLM call"), max_retries=0)
+        
+        with track_call(LLM_CALL):
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
             
         content = response.choices[0].message.content.strip()
             
@@ -68,7 +96,9 @@ class LLMService:
             "email": email
         }
             
-        logger.info(f"Extracted: {result}")
+        # Chỉ log kết quả, không log email của user
+        logger.info("Email extraction %s", "succeeded" if email else "found nothing",
+                    extra={"extracted": bool(email)})
         return result
         
 _llm_service = None
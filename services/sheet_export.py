@@ -0,0 +1,73 @@
+"""
+Streaming CSV export reader
+
+get_all_records() giữ toàn bộ JSON của values API rồi dựng thêm list dict
+cho cả sheet, nên peak memory tăng theo số dòng. Reader này đọc CSV export
+của worksheet qua HTTP streaming và parse từng dòng ngay khi dữ liệu tới:
+tại một thời điểm chỉ có một chunk + một dòng trong bộ nhớ (ngoài những gì
+caller giữ lại, ví dụ UserSnapshot).
+
+Record có cùng dạng với get_all_records(): header làm key, giá trị số được
+numericise, dòng trống ở giữa được giữ (vị trí = số dòng - 2), dòng trống ở
+cuối bị bỏ như values API.
+"""
+import csv
+from typing import Dict, Iterable, Iterator, List
+
+EXPORT_URL = "https://docs.google.com/spreadsheets/d/{key}/export"
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split decoded text chunks into lines, keeping the line ends (csv needs them inside quoted cells)"""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def iter_records(rows: Iterable[List[str]]) -> Iterator[Dict]:
+    """csv.reader rows (header first) -> get_all_records()-shaped dicts, one at a time"""
+    from gspread.utils import numericise_all
+
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    width = len(header)
+    blank_rows = 0  # empty rows since the last non-empty one: only emitted if more data follows
+    for row in rows:
+        if not any(row):
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield dict.fromkeys(header, "")
+        blank_rows = 0
+        if len(row) < width:
+            row += [""] * (width - len(row))
+        yield dict(zip(header, numericise_all(row)))
+
+
+def stream_records(session, spreadsheet_id: str, gid: int, timeout=None) -> Iterator[Dict]:
+    """
+    Download one worksheet as CSV through `session` (the authorized gspread
+    session) and yield its records while the body is still arriving.
+    """
+    response = session.get(
+        EXPORT_URL.format(key=spreadsheet_id),
+        params={"format": "csv", "gid": gid},
+        stream=True,
+        timeout=timeout,
+    )
+    try:
+        response.raise_for_status()
+        response.encoding = "utf-8"  # export is always UTF-8; skip requests' charset sniffing
+        chunks = response.iter_content(CHUNK_SIZE, decode_unicode=True)
+        yield from iter_records(csv.reader(iter_lines(chunks)))
+    finally:
+        response.close()
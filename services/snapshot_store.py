@@ -0,0 +1,113 @@
+"""
+Local snapshot file for warm restarts
+
+Render restart / sleep xoá toàn bộ cache trong process. User snapshot được
+ghi ra file local (khi có thay đổi, theo chu kỳ, và lúc shutdown) để lần
+khởi động sau nạp lại trong vài chục ms, rồi warm-up đối chiếu với sheet
+thật trong background.
+
+Format:
+    MAGIC
+    header JSON (1 dòng): format version, marshal version, fields, sheet,
+                          revision, crc32 của body...
+    body: marshal của list tuple (USER_FIELDS + timestamp đã parse)
+File không khớp (format / field / sheet khác, hỏng) bị bỏ qua - khởi động
+lạnh như trước. File chứa email của user: chỉ bật (SHEETS_SNAPSHOT_PATH) trên
+disk được bảo vệ.
+"""
+import asyncio
+import gc
+import json
+import logging
+import marshal
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.user_snapshot import USER_FIELDS, UserRecord, UserSnapshot
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZALOBOT-USERSNAP\n"
+FORMAT_VERSION = 1
+
+
+class SnapshotStore:
+    """Save / load a UserSnapshot (plus its metadata) to one local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save(self, rows: List[tuple], meta: Dict[str, Any]) -> int:
+        """Write UserRecord.to_row() tuples atomically (temp file + rename); returns the body size"""
+        body = marshal.dumps(rows)
+        header = {
+            **meta,
+            "format": FORMAT_VERSION,
+            "marshal": marshal.version,
+            "fields": list(USER_FIELDS),
+            "rows": len(rows),
+            "saved_at": time.time(),
+            "crc32": zlib.crc32(body),
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(body)
+        os.replace(tmp_path, self.path)
+        return len(body)
+
+    def load(self, expect: Optional[Dict[str, Any]] = None) -> Optional[Tuple[UserSnapshot, Dict[str, Any]]]:
+        """
+        Read the file back; None when missing, unreadable or written for another
+        format / sheet. `expect` holds header values that must match (e.g. the sheet).
+        """
+        try:
+            with open(self.path, "rb") as f:
+                if f.readline() != MAGIC:
+                    raise ValueError("not a snapshot file")
+                header = json.loads(f.readline())
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring snapshot file %s: %s", self.path, e)
+            return None
+
+        expected = {
+            "format": FORMAT_VERSION,
+            "marshal": marshal.version,
+            "fields": list(USER_FIELDS),
+            **(expect or {}),
+        }
+        mismatched = [key for key, value in expected.items() if header.get(key) != value]
+        if mismatched or zlib.crc32(body) != header.get("crc32"):
+            logger.warning("Ignoring snapshot file %s (mismatch: %s)", self.path, mismatched or ["crc32"])
+            return None
+        # Hundreds of thousands of new objects and no garbage: cyclic GC passes
+        # triggered by the allocations would take most of the load time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            snapshot = UserSnapshot(UserRecord.from_row(row) for row in marshal.loads(body))
+        except (ValueError, TypeError, EOFError) as e:
+            logger.warning("Ignoring snapshot file %s: %s", self.path, e)
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return snapshot, header
+
+
+async def save_periodically(sheets_service, interval: float) -> None:
+    """Background task: persist the snapshot every `interval` seconds when it changed"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sheets_service.save_snapshot)
+        except Exception as e:
+            logger.warning("Saving user snapshot failed: %s", e)
@@ -2,6 +2,7 @@ import json
 import os
 from pathlib import Path
 from typing import Dict, Any, Tuple, List, Optional
+from core.memory import track_cache
 
 class TemplateService:
     """Service to handle message templates"""
@@ -16,18 +17,32 @@ class TemplateService:
             self.templates_dir = Path(__file__).parent.parent / "templates"
         else:
             self.templates_dir = Path(templates_dir)
+        # Parsed templates, templates are static files so they are read once
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        track_cache("templates", lambda: self._cache)
     
     def load_template(self, template_name: str) -> Dict[str, Any]:
         """Load template JSON file"""
+        cached = self._cache.get(template_name)
+        if cached is not None:
+            return cached
         template_path = self.templates_dir / f"{template_name}.json"
         try:
             with open(template_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
+                template = json.load(file)
+            self._cache[template_name] = template
+            return template
         except FileNotFoundError:
             raise FileNotFoundError(f"Template {template_name} not found at {template_path}")
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in template {template_name}: {e}")
 
+    def preload(self) -> int:
+        """Parse every template in templates_dir into the cache, returns count"""
+        for template_path in self.templates_dir.glob("*.json"):
+            self.load_template(template_path.stem)
+        return len(self._cache)
+
     def format_template_message(self, template_data: Dict[str, Any], 
                                 user_name: str = "Bạn", 
                                 survey_link: str = None,
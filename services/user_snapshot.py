@@ -0,0 +1,291 @@
+"""
+Compact in-memory user snapshot
+
+Snapshot của sheet UserStatus được giữ dưới dạng `UserRecord` (__slots__,
+không có dict key lặp lại ở mỗi dòng) thay cho list dict của
+get_all_records(). Status / stage được intern (chỉ vài giá trị khác nhau),
+timestamp được parse sẵn thành epoch float (`*_ts`) khi field được gán, và
+`UserSnapshot` giữ index theo id, email và form_status nên lookup / lọc
+không cần quét toàn bộ, cùng các counter funnel (user theo stage / status,
+form submit theo ngày, số user đã được follow-up) cập nhật cùng lúc với
+index - /stats đọc O(1).
+
+UserRecord vẫn đọc được như dict (`get`, `[]`, `keys`, `{**record}`), nên
+code cũ dùng `record.get('field')` không phải đổi. Mọi thay đổi phải đi qua
+`UserSnapshot.update()` để index luôn đúng.
+"""
+import sys
+from collections.abc import Mapping
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from services.conversation_stage import VN_TZ, parse_time, read_stage
+
+# Sheet fields in column order (same as GoogleSheetsService.FIELD_TO_COL)
+USER_FIELDS = (
+    'id', 'username', 'email', 'form_status', 'form_submitted_at',
+    'last_follow_up_sent', 'created_at', 'stage',
+)
+_FIELD_SET = frozenset(USER_FIELDS)
+# Few distinct values across all rows - share one string object
+_INTERNED = frozenset(('form_status', 'stage'))
+# Timestamp field -> slot holding it as epoch seconds (float is half the size of a datetime)
+_TIME_SLOTS = {
+    'form_submitted_at': 'form_submitted_ts',
+    'last_follow_up_sent': 'last_follow_up_ts',
+    'created_at': 'created_ts',
+}
+_VN_OFFSET = VN_TZ.utcoffset(None).total_seconds()
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _timestamp(value) -> Optional[float]:
+    parsed = parse_time(value)
+    return parsed.timestamp() if parsed else None
+
+
+def _vn_day(ts: float) -> int:
+    """Vietnam calendar day of an epoch timestamp, as days since 1970-01-01"""
+    return int((ts + _VN_OFFSET) // 86400)
+
+
+def email_key(value) -> str:
+    """Normalized email used by the email index (reuses the cell string when already normalized)"""
+    email = str(value or '').strip()
+    lowered = email.lower()
+    return email if lowered == email else lowered
+
+
+class UserRecord(Mapping):
+    """One sheet row; read-only Mapping over USER_FIELDS plus parsed timestamps"""
+
+    __slots__ = USER_FIELDS + tuple(_TIME_SLOTS.values())
+
+    def __init__(self, values: Optional[Mapping] = None):
+        # Unrolled on purpose: runs once per row on every snapshot load
+        get = (values or {}).get
+        self.id = get('id', '')
+        self.username = get('username', '')
+        self.email = get('email', '')
+        self.form_status = _intern(get('form_status', ''))
+        self.form_submitted_at = get('form_submitted_at', '')
+        self.last_follow_up_sent = get('last_follow_up_sent', '')
+        self.created_at = get('created_at', '')
+        self.stage = _intern(get('stage', ''))
+        self.form_submitted_ts = _timestamp(self.form_submitted_at)
+        self.last_follow_up_ts = _timestamp(self.last_follow_up_sent)
+        self.created_ts = _timestamp(self.created_at)
+
+    def _set(self, field: str, value) -> None:
+        if value is None:
+            value = ''
+        if field in _INTERNED:
+            value = _intern(value)
+        setattr(self, field, value)
+        slot = _TIME_SLOTS.get(field)
+        if slot:
+            setattr(self, slot, _timestamp(value))
+
+    # --- Mapping interface (dict-compatible reads) ---------------------------
+
+    def __getitem__(self, field: str):
+        if field not in _FIELD_SET:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(USER_FIELDS)
+
+    def __len__(self) -> int:
+        return len(USER_FIELDS)
+
+    def __contains__(self, field) -> bool:
+        return field in _FIELD_SET
+
+    def __bool__(self) -> bool:
+        return True  # `if user:` checks would otherwise go through __len__
+
+    def get(self, field: str, default=None):
+        return getattr(self, field) if field in _FIELD_SET else default
+
+    def to_row(self) -> tuple:
+        """All slots (fields + parsed timestamps) as a tuple, for the snapshot file"""
+        return (self.id, self.username, self.email, self.form_status, self.form_submitted_at,
+                self.last_follow_up_sent, self.created_at, self.stage,
+                self.form_submitted_ts, self.last_follow_up_ts, self.created_ts)
+
+    @classmethod
+    def from_row(cls, row) -> "UserRecord":
+        """Inverse of to_row - no re-parsing of timestamps"""
+        record = cls.__new__(cls)
+        (record.id, record.username, record.email, form_status, record.form_submitted_at,
+         record.last_follow_up_sent, record.created_at, stage,
+         record.form_submitted_ts, record.last_follow_up_ts, record.created_ts) = row
+        record.form_status = _intern(form_status)
+        record.stage = _intern(stage)
+        return record
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in USER_FIELDS}
+
+    def __repr__(self) -> str:
+        return f"UserRecord({self.to_dict()!r})"
+
+    @property
+    def user_id(self) -> str:
+        return str(self.id)
+
+
+class UserSnapshot:
+    """Sheet-ordered UserRecords (row = position + 2) with id / email / status indexes"""
+
+    def __init__(self, records: Iterable[Mapping] = ()):
+        self.records: List[UserRecord] = []
+        self.by_id: Dict[str, int] = {}  # user_id -> position in `records`
+        self.by_email: Dict[str, UserRecord] = {}
+        self.by_status: Dict[str, Dict[str, UserRecord]] = {}
+        # Funnel counters over rows with an id (blank rows are not users)
+        self.users = 0
+        self.stage_counts: Dict[str, int] = {}  # read_stage() -> rows
+        self.status_counts: Dict[str, int] = {}  # form_status -> rows
+        self.submissions_by_day: Dict[int, int] = {}  # _vn_day(form_submitted_at) -> rows
+        # rows with last_follow_up_sent set - users, not messages: the field is also set on
+        # the 2nd interaction and only keeps the latest send
+        self.users_followed_up = 0
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        return iter(self.records)
+
+    def __getitem__(self, position: int) -> UserRecord:
+        return self.records[position]
+
+    def position(self, user_id) -> Optional[int]:
+        return self.by_id.get(str(user_id))
+
+    def get(self, user_id) -> Optional[UserRecord]:
+        position = self.by_id.get(str(user_id))
+        return None if position is None else self.records[position]
+
+    def find_email(self, email: str) -> Optional[UserRecord]:
+        return self.by_email.get(email_key(email))
+
+    def with_status(self, status: str) -> List[UserRecord]:
+        return list(self.by_status.get(status, {}).values())
+
+    def append(self, record: Mapping) -> UserRecord:
+        if not isinstance(record, UserRecord):
+            record = UserRecord(record)
+        self.records.append(record)
+        self._index(len(self.records) - 1, record)
+        return record
+
+    def extend(self, records: Iterable[Mapping]) -> None:
+        """Bulk append (snapshot loads): same indexing as append(), inlined for speed"""
+        by_id, by_email, by_status = self.by_id, self.by_email, self.by_status
+        stage_counts, status_counts, by_day = self.stage_counts, self.status_counts, self.submissions_by_day
+        position = len(self.records)
+        for record in records:
+            if not isinstance(record, UserRecord):
+                record = UserRecord(record)
+            self.records.append(record)
+            user_id = str(record.id)
+            if user_id not in by_id:
+                by_id[user_id] = position
+            if record.email:
+                email = email_key(record.email)
+                if email:
+                    by_email[email] = record
+            members = by_status.get(record.form_status)
+            if members is None:
+                members = by_status[record.form_status] = {}
+            members[user_id] = record
+            position += 1
+            if user_id:
+                self.users += 1
+                stage = read_stage(record)
+                stage_counts[stage] = stage_counts.get(stage, 0) + 1
+                status_counts[record.form_status] = status_counts.get(record.form_status, 0) + 1
+                if record.form_submitted_ts is not None:
+                    day = _vn_day(record.form_submitted_ts)
+                    by_day[day] = by_day.get(day, 0) + 1
+                if record.last_follow_up_ts is not None:
+                    self.users_followed_up += 1
+
+    def approx_bytes(self) -> int:
+        """Sampled estimate: records + index tables (index keys / values are shared with the records)"""
+        from core.memory import approx_size
+
+        return (approx_size(self.records) + sys.getsizeof(self.by_id) + sys.getsizeof(self.by_email)
+                + sum(sys.getsizeof(members) for members in self.by_status.values()))
+
+    def update(self, position: int, fields: Mapping) -> UserRecord:
+        """Change fields of the record at `position` in place, keeping the indexes in sync"""
+        record = self.records[position]
+        self._unindex(position, record)
+        for field, value in fields.items():
+            if field in USER_FIELDS:
+                record._set(field, value)
+        self._index(position, record)
+        return record
+
+    def _index(self, position: int, record: UserRecord) -> None:
+        user_id = record.user_id
+        self.by_id.setdefault(user_id, position)  # duplicate ids: first row wins, like a scan
+        email = email_key(record.email)
+        if email:
+            self.by_email[email] = record  # duplicate emails: last row wins
+        self.by_status.setdefault(record.form_status, {})[user_id] = record
+        self._count(record, 1)
+
+    def _unindex(self, position: int, record: UserRecord) -> None:
+        user_id = record.user_id
+        if self.by_id.get(user_id) == position:
+            del self.by_id[user_id]
+        email = email_key(record.email)
+        if email and self.by_email.get(email) is record:
+            del self.by_email[email]
+        members = self.by_status.get(record.form_status)
+        if members is not None and members.get(user_id) is record:
+            del members[user_id]
+        self._count(record, -1)
+
+    def _count(self, record: UserRecord, step: int) -> None:
+        """Add (+1) or remove (-1) one record's contribution to the funnel counters"""
+        if not record.user_id:
+            return
+        self.users += step
+        _bump(self.stage_counts, read_stage(record), step)
+        _bump(self.status_counts, record.form_status, step)
+        if record.form_submitted_ts is not None:
+            _bump(self.submissions_by_day, _vn_day(record.form_submitted_ts), step)
+        if record.last_follow_up_ts is not None:
+            self.users_followed_up += step
+
+    def funnel(self) -> Dict:
+        """Current funnel counters (no scan)"""
+        return {
+            'users': self.users,
+            'by_stage': dict(self.stage_counts),
+            'by_status': dict(self.status_counts),
+            'submissions_by_day': {
+                date.fromordinal(day + _EPOCH_ORDINAL).isoformat(): count
+                for day, count in sorted(self.submissions_by_day.items())
+            },
+            'users_followed_up': self.users_followed_up,
+        }
+
+
+def _bump(counts: Dict, key, step: int) -> None:
+    count = counts.get(key, 0) + step
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
@@ -0,0 +1,7 @@
+import os
+
+# core.config validates these at import time
+os.environ.setdefault("BOT_TOKEN", "test")
+os.environ.setdefault("FORM_URL", "https://example.com/form")
+# Tests never read or write a local snapshot file
+os.environ["SHEETS_SNAPSHOT_PATH"] = ""
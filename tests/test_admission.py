@@ -0,0 +1,71 @@
+"""
+Admission controller depth signal
+
+    python -m pytest tests/test_admission.py
+
+Ở 10 msg/s, mỗi message nằm ~2.5s trong delay trước reply: ~25 task sống cùng
+lúc, vượt ngưỡng level 1 (20) nếu đếm theo số task. Backlog thật (message chưa
+qua bot handling) chỉ vài message, nên controller phải giữ NORMAL.
+"""
+import asyncio
+import time
+
+from core.admission import NORMAL, AdmissionController, set_admission_controller
+from core.container import ServiceContainer
+from core.usecases.message_usecase import ProcessMessageRequest
+from services.bot_service import BotResponse
+from workers.background import BackgroundTaskManager
+from workers.tasks import process_message_background
+
+
+class FakeBotService:
+    """Answers every message after a short blocking 'Sheets' call"""
+
+    def handle_text_message(self, user_action):
+        time.sleep(0.05)
+        return BotResponse(text="ok", action_type="message")
+
+
+class FakeGateway:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_response(self, response, user_id):
+        self.sent += 1
+
+
+def test_ten_rps_stays_normal():
+    from core.usecases.message_usecase import MessageUseCase
+
+    gateway = FakeGateway()
+    message_usecase = MessageUseCase(bot_service=FakeBotService(), message_gateway=gateway)
+    background = BackgroundTaskManager()
+    container = ServiceContainer(
+        sheets_service=None, template_service=None, form_service=None, bot_service=None,
+        zalo_gateway=None, message_usecase=message_usecase, form_sync_usecase=None,
+        sheet_sync_usecase=None, status_change_usecase=None, background=background,
+    )
+
+    async def run():
+        admission = AdmissionController(depth_fn=container.backlog, cooldown=15, interval=0.1)
+        set_admission_controller(admission)
+        levels, tasks_alive = [], []
+        try:
+            for i in range(30):  # 10 msg/s for 3s
+                background.run(process_message_background, message_usecase, ProcessMessageRequest(
+                    user_id=f"u{i}", user_name="u", message_text="hi", platform_data={},
+                ))
+                await asyncio.sleep(0.1)
+                levels.append(admission.evaluate())
+                tasks_alive.append(background.depth())
+            while background.depth():
+                await asyncio.sleep(0.1)
+                levels.append(admission.evaluate())
+        finally:
+            set_admission_controller(None)
+        return levels, tasks_alive
+
+    levels, tasks_alive = asyncio.run(run())
+    assert max(tasks_alive) >= 20  # the task count alone would have escalated
+    assert set(levels) == {NORMAL}
+    assert gateway.sent == 30
@@ -0,0 +1,121 @@
+"""
+Backend-call budget for the bot decision path
+
+    python -m pytest tests/test_call_budget.py
+
+Với mỗi conversation stage và mỗi SHEETS_ACCESS_MODE, gửi một inbound message
+qua BotService.handle_text_message + ZaloMessagingGateway.send_response (đúng
+những gì MessageUseCase làm) trên fake Sheets / OpenAI / Zalo, đếm call bằng
+core.instrumentation và so với BUDGETS. Snapshot cache tắt (TTL=0) để mỗi
+lookup là một lần đọc sheet thật - đo worst case, không phụ thuộc thời điểm.
+A change that adds (or removes) backend calls to a stage fails this test: update
+the budget only on purpose.
+"""
+import asyncio
+from typing import Dict, List, Tuple
+
+import pytest
+
+from tools.loadtest.faults import FaultConfig
+
+# name -> (seed row or None, message text)
+SCENARIOS: Dict[str, Tuple[List[str], str]] = {
+    "first_time": (None, "xin chào"),
+    "provide_field": (["", "pending", "", "", "provide_field"], "email của tôi là budget@example.com"),
+    "second_interaction": (["budget@example.com", "pending", "", "", "second_interaction"], "/support"),
+    "follow_up": (["budget@example.com", "pending", "", "2024-01-01T09:00:00", "follow_up"], "/support"),
+    "completed": (["budget@example.com", "submitted", "2024-01-01T10:00:00", "", "completed"], "/support"),
+    "ignored": (["budget@example.com", "pending", "", "2024-01-01T09:00:00", "follow_up"], "cảm ơn nhé"),
+}
+
+# Exact calls per inbound message (snapshot cache disabled), per SHEETS_ACCESS_MODE - the
+# measured counts, so one extra call fails the test (and so does one fewer: lower the budget).
+# snapshot: every read is the full sheet; update_user writes one cell per field,
+#           so a field + stage update costs 2 writes. add_user is one append, no read.
+# row:      reads are the id column or one A:H row; update_user is one batch write,
+#           preceded by a one-cell read checking the indexed row still holds the user.
+# provide_field reads the user for: stage, current email, the email transition, its
+# update, has_complete_user_info, increment_message_count and the follow-up update.
+BUDGETS: Dict[str, Dict[str, Dict[str, int]]] = {
+    "snapshot": {
+        "first_time": {"sheets_read": 1, "sheets_write": 1, "llm": 0, "zalo_send": 1},
+        "provide_field": {"sheets_read": 7, "sheets_write": 4, "llm": 1, "zalo_send": 1},
+        "second_interaction": {"sheets_read": 3, "sheets_write": 2, "llm": 0, "zalo_send": 1},
+        "follow_up": {"sheets_read": 2, "sheets_write": 0, "llm": 0, "zalo_send": 1},
+        "completed": {"sheets_read": 1, "sheets_write": 0, "llm": 0, "zalo_send": 1},
+        "ignored": {"sheets_read": 1, "sheets_write": 0, "llm": 0, "zalo_send": 0},
+    },
+    "row": {
+        "first_time": {"sheets_read": 1, "sheets_write": 1, "llm": 0, "zalo_send": 1},
+        "provide_field": {"sheets_read": 7, "sheets_write": 2, "llm": 1, "zalo_send": 1},
+        "second_interaction": {"sheets_read": 3, "sheets_write": 1, "llm": 0, "zalo_send": 1},
+        "follow_up": {"sheets_read": 2, "sheets_write": 0, "llm": 0, "zalo_send": 1},
+        "completed": {"sheets_read": 1, "sheets_write": 0, "llm": 0, "zalo_send": 1},
+        "ignored": {"sheets_read": 1, "sheets_write": 0, "llm": 0, "zalo_send": 0},
+    },
+}
+
+
+def seed(worksheet, user_id: str, row: List[str]) -> None:
+    email, form_status, submitted_at, last_follow_up, stage = row
+    worksheet.update(f"A{worksheet.row_count + 1}", [[
+        user_id, user_id, email, form_status, submitted_at, last_follow_up, "2024-01-01T08:00:00", stage,
+    ]])
+
+
+@pytest.fixture(scope="module")
+def backends():
+    """OpenAI / Zalo stand-ins, with the LLM client pointed at the fake"""
+    from tools.loadtest.fake_servers import ServerThread, ZaloRecorder, make_openai_app, make_zalo_app
+
+    openai_server = ServerThread(make_openai_app(FaultConfig())).start()
+    zalo_server = ServerThread(make_zalo_app(FaultConfig(), ZaloRecorder())).start()
+
+    import services.llm_service as llm_module
+    from core.config import settings
+
+    saved = settings.openai_api_key, settings.openai_base_url, llm_module._llm_service
+    settings.openai_api_key, settings.openai_base_url = "budget", f"{openai_server.url}/v1"
+    llm_module._llm_service = None
+    try:
+        yield zalo_server.url
+    finally:
+        settings.openai_api_key, settings.openai_base_url, llm_module._llm_service = saved
+        zalo_server.stop()
+        openai_server.stop()
+
+
+@pytest.mark.parametrize("stage", list(SCENARIOS))
+@pytest.mark.parametrize("access_mode", list(BUDGETS))
+def test_stage_within_call_budget(backends, monkeypatch, access_mode, stage):
+    monkeypatch.setenv("SHEETS_CACHE_TTL", "0")
+    monkeypatch.setenv("SHEETS_ACCESS_MODE", access_mode)
+
+    from adapters.zalo_messaging_gateway import ZaloMessagingGateway
+    from core.instrumentation import BACKEND_CALLS, count_calls
+    from services.bot_service import BotService, UserAction
+    from services.form_service import FormService
+    from services.google_sheets_service import GoogleSheetsService
+    from tools.loadtest.fake_sheets import make_fake_client
+
+    client = make_fake_client()
+    sheets = GoogleSheetsService(client=client)
+    bot = BotService(form_service=FormService(sheets_service=sheets))
+    gateway = ZaloMessagingGateway(access_token="budget", api_url=f"{backends}/v3.0/")
+
+    user_id = f"budget-{stage}"
+    row, text = SCENARIOS[stage]
+    if row is not None:
+        seed(client.spreadsheet.worksheet("UserStatus"), user_id, row)
+
+    if access_mode == "row":
+        sheets._load_row_index()  # process-lifetime index, loaded once - not a per-message cost
+
+    action = UserAction(user_id=user_id, user_name=user_id, action_type="text_message", data=text)
+    with count_calls() as calls:
+        response = bot.handle_text_message(action)
+        asyncio.run(gateway.send_response(response, user_id))
+
+    budget = BUDGETS[access_mode][stage]
+    counts = {kind: calls[kind] for kind in BACKEND_CALLS}
+    assert counts == budget, f"{access_mode}/{stage} call count changed: {counts} != {budget}"
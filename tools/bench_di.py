@@ -0,0 +1,153 @@
+"""
+Micro-benchmark: per-request dependency-injection overhead
+
+    python -m tools.bench_di [--requests 5000]
+
+So sánh 3 endpoint giống hệt nhau, chỉ khác cách lấy use case:
+- baseline:  không có dependency
+- legacy:    mô phỏng core/deps.py cũ (lru_cache + Depends lồng nhau,
+             use case/background manager tạo mới mỗi request)
+- container: accessor mỏng đọc từ app.state.container (core/deps.py hiện tại)
+Dùng stub object nên không cần mạng; overhead DI = latency - baseline.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Annotated
+
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("FORM_URL", "https://example.com/form")
+
+import httpx
+from fastapi import Depends, FastAPI, Request
+
+
+class _Stub:
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+# --- Legacy wiring (shape of the previous core/deps.py) ---------------------
+
+@lru_cache()
+def legacy_sheets() -> _Stub:
+    return _Stub()
+
+
+@lru_cache()
+def legacy_templates() -> _Stub:
+    return _Stub()
+
+
+@lru_cache()
+def legacy_form(sheets: _Stub = Depends(legacy_sheets), templates: _Stub = Depends(legacy_templates)) -> _Stub:
+    return _Stub(sheets, templates)
+
+
+@lru_cache()
+def legacy_bot(form: _Stub = Depends(legacy_form)) -> _Stub:
+    return _Stub(form)
+
+
+@lru_cache()
+def legacy_gateway() -> _Stub:
+    return _Stub()
+
+
+@lru_cache()
+def legacy_message(bot: _Stub = Depends(legacy_bot), gateway: _Stub = Depends(legacy_gateway)) -> _Stub:
+    return _Stub(bot, gateway)
+
+
+def legacy_status(bot: _Stub = Depends(legacy_bot), gateway: _Stub = Depends(legacy_gateway)) -> _Stub:
+    return _Stub(bot, gateway)
+
+
+def legacy_background() -> _Stub:
+    return _Stub()
+
+
+# --- Container wiring (same accessors as core/deps.py) ----------------------
+
+async def container_message(request: Request) -> _Stub:
+    return request.app.state.container.message_usecase
+
+
+async def container_status(request: Request) -> _Stub:
+    return request.app.state.container.status_change_usecase
+
+
+async def container_background(request: Request) -> _Stub:
+    return request.app.state.container.background
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.state.container = SimpleNamespace(
+        message_usecase=_Stub(),
+        status_change_usecase=_Stub(),
+        background=_Stub(),
+    )
+
+    @app.post("/baseline")
+    async def baseline():
+        return {"ok": True}
+
+    @app.post("/legacy")
+    async def legacy(
+        message: Annotated[_Stub, Depends(legacy_message)],
+        status: Annotated[_Stub, Depends(legacy_status)],
+        background: Annotated[_Stub, Depends(legacy_background)],
+    ):
+        return {"ok": True}
+
+    @app.post("/container")
+    async def container(
+        message: Annotated[_Stub, Depends(container_message)],
+        status: Annotated[_Stub, Depends(container_status)],
+        background: Annotated[_Stub, Depends(container_background)],
+    ):
+        return {"ok": True}
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> list:
+    for _ in range(min(200, requests)):  # warm-up
+        await client.post(path)
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await client.post(path)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def run(requests: int) -> None:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {path: await measure(client, f"/{path}", requests) for path in ("baseline", "legacy", "container")}
+
+    base = statistics.median(results["baseline"])
+    print(f"{'endpoint':<10} {'p50 us':>9} {'p99 us':>9} {'DI overhead us':>15}")
+    for path, samples in results.items():
+        samples.sort()
+        p50 = statistics.median(samples)
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        print(f"{path:<10} {p50:9.1f} {p99:9.1f} {p50 - base:15.1f}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Import-time budget check
+
+    python -m tools.import_budget [--module main] [--budget-ms 800] [--top 15]
+
+Chạy `python -X importtime -c "import <module>"` trong subprocess sạch,
+in ra các module import chậm nhất (self và cumulative) và trả exit code 1
+nếu tổng thời gian import vượt budget - dùng được trong CI để chặn việc
+import nặng (openai, gspread, boto3...) quay lại đường khởi động.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Settings() requires these at import time; dummy values are enough to import the app
+REQUIRED_ENV = {"BOT_TOKEN": "import-budget", "FORM_URL": "https://example.com/form"}
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every import"""
+    env = {**REQUIRED_ENV, **os.environ}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append((name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=800)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    rows = measure(args.module)
+    total_ms = next((cum for name, _, cum in rows if name == args.module), 0) / 1000
+
+    print(f"Top {args.top} imports by cumulative time:")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cum_us / 1000:8.1f} ms  {name}")
+
+    print(f"\nTop {args.top} imports by self time:")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    status = "OK" if total_ms <= args.budget_ms else "OVER BUDGET"
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms) - {status}")
+    return 0 if total_ms <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
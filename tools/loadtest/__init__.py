@@ -0,0 +1,7 @@
+"""
+End-to-end load-test harness
+
+Chạy app thật (`create_app()`) trên uvicorn, trỏ các call ra ngoài vào stand-in
+local: OpenAI-compatible completion server, Zalo `oa/message/cs` server và
+một Sheets backend tương thích gspread (in-process). Xem `python -m tools.loadtest -h`.
+"""
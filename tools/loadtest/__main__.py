@@ -0,0 +1,117 @@
+"""
+Load test: real create_app() against local Zalo / OpenAI / Sheets stand-ins
+
+    python -m tools.loadtest --rps 20 --duration 30 \\
+        --mix webhook=0.8,form=0.1,status=0.1 \\
+        --openai-latency-ms 400 --zalo-latency-ms 80 --sheets-latency-ms 150 \\
+        --openai-error-rate 0.02
+
+Báo cáo: ack latency p50/p99 theo endpoint, end-to-end reply latency
+(webhook gửi → Zalo stand-in nhận tin trả lời), throughput, số call backend
+và bộ nhớ (RSS) của process.
+Lưu ý: mỗi user bị rate limit 5s/tin, nên --users nên >= rps * 5.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict
+
+from tools.loadtest.harness import LoadStats, LocalStack, add_backend_args, fire, match_replies, peak_rss_mb
+
+WEBHOOK_SCRIPT = [
+    "xin chào",
+    "email của tôi là {user}@example.com",
+    "cảm ơn",
+    "/support",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--drain", type=float, default=10, help="seconds to wait for replies after load stops")
+    parser.add_argument("--users", type=int, default=0, help="distinct webhook users (default rps * 10)")
+    parser.add_argument("--mix", default="webhook=0.8,form=0.1,status=0.1")
+    add_backend_args(parser)
+    return parser.parse_args(argv)
+
+
+async def drive(base_url: str, args, stats: LoadStats) -> float:
+    import httpx
+
+    mix = {}
+    for part in args.mix.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    endpoints, weights = list(mix), list(mix.values())
+    users = args.users or max(50, int(args.rps * 10))
+    turns: Dict[str, int] = defaultdict(int)
+
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        tasks = []
+        interval = 1 / args.rps
+        start = time.monotonic()
+        n = 0
+        while time.monotonic() - start < args.duration:
+            endpoint = random.choices(endpoints, weights)[0]
+            if endpoint == "webhook":
+                user_id = f"lt-{n % users}"
+                text = WEBHOOK_SCRIPT[turns[user_id] % len(WEBHOOK_SCRIPT)].format(user=user_id)
+                turns[user_id] += 1
+                payload = {"event_name": "user_send_text", "sender": {"id": user_id},
+                           "user_name": user_id, "message": {"text": text}}
+                tasks.append(asyncio.create_task(fire(client, stats, endpoint, "/webhook", payload, user_id)))
+            elif endpoint == "form":
+                payload = {"email": f"lt-{random.randrange(users)}@example.com", "form_id": "loadtest"}
+                tasks.append(asyncio.create_task(fire(client, stats, endpoint, "/form-submitted", payload)))
+            elif endpoint == "status":
+                payload = {"id": f"st-{n}", "username": "Load Test", "old_status": "pending", "new_status": "submitted"}
+                tasks.append(asyncio.create_task(fire(client, stats, endpoint, "/status-changed", payload)))
+            n += 1
+            # Open-loop pacing: next request is scheduled regardless of outstanding responses
+            await asyncio.sleep(max(0.0, start + n * interval - time.monotonic()))
+        await asyncio.gather(*tasks)
+        return time.monotonic() - start
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+
+    from tools.loadtest.fake_servers import percentile
+
+    stack = LocalStack(args)
+    # Let the warm-up finish so the run measures steady state
+    time.sleep(1)
+
+    stats = LoadStats()
+    print(f"Driving {args.rps} rps for {args.duration}s against {stack.url} ...")
+    elapsed = asyncio.run(drive(stack.url, args, stats))
+    time.sleep(args.drain)
+
+    stack.stop()
+
+    print(f"\n{'endpoint':<10} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for endpoint, samples in stats.ack_ms.items():
+        statuses = ", ".join(f"{k}={v}" for k, v in sorted(stats.statuses[endpoint].items()))
+        print(f"{endpoint:<10} {len(samples):7d} {percentile(samples, 50):9.1f} "
+              f"{percentile(samples, 99):9.1f} {max(samples):9.1f}  {statuses}")
+
+    replies = match_replies(stats.sends, stack.recorder)
+    accepted = sum(len(v) for v in stats.sends.values())
+    print(f"\nEnd-to-end reply latency (webhook → Zalo send): {len(replies)}/{accepted} accepted messages replied")
+    if replies:
+        print(f"  p50 {percentile(replies, 50):.1f} ms   p99 {percentile(replies, 99):.1f} ms   max {max(replies):.1f} ms")
+
+    print(f"\nThroughput: {stats.completed / elapsed:.1f} req/s acked (target {args.rps})")
+    calls = stack.backend_calls()
+    print("Backend calls: " + " ".join(f"{name}={count}" for name, count in calls.items()))
+    print(f"Memory: RSS {stack.rss_start:.1f} MB → {stack.rss_end:.1f} MB "
+          f"(peak {peak_rss_mb():.1f} MB, includes harness + fakes)")
+
+
+if __name__ == "__main__":
+    main()
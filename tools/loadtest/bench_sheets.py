@@ -0,0 +1,123 @@
+"""
+Offline benchmark: cost of GoogleSheetsService access patterns at 10k-100k rows
+
+    python -m tools.loadtest.bench_sheets [--rows 10000,50000,100000] [--ops 30]
+
+Chạy GoogleSheetsService thật trên fake gspread với đồng hồ ảo: latency
+(base + tỉ lệ số cell) và quota/phút được mô phỏng nhưng không sleep.
+Mỗi pattern chạy `--ops` lần liên tiếp trên một service mới, báo cáo:
+- api ms/op:  thời gian API mô phỏng trung bình
+- cpu ms/op:  thời gian xử lý thật trong process (parse, scan, classify)
+- calls/op, cells read/op, số lần bị 429
+"""
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("FORM_URL", "https://example.com/form")
+
+from services.conversation_stage import classify_users
+from services.google_sheets_service import GoogleSheetsService
+from tools.loadtest.fake_sheets import SheetsLatency, SheetsQuota, SimClock, make_fake_client
+
+
+@dataclass
+class PatternResult:
+    api_ms: float
+    cpu_ms: float
+    calls: float
+    cells_read: float
+    throttled: int
+
+
+def _lookup(service: GoogleSheetsService, i: int, rows: int) -> None:
+    service.get_user(f"seed-{(i * 7919) % rows}")
+
+
+def _add(service: GoogleSheetsService, i: int, rows: int) -> None:
+    service.add_user(f"bench-{i}", f"Bench {i}")
+
+
+def _update(service: GoogleSheetsService, i: int, rows: int) -> None:
+    service.update_user(f"seed-{(i * 7919) % rows}", email=f"b{i}@example.com", form_status="pending")
+
+
+def _classify(service: GoogleSheetsService, i: int, rows: int) -> None:
+    classify_users(service.get_all_users())
+
+
+# name -> (operation, snapshot cache TTL, SHEETS_ACCESS_MODE[, SHEETS_REVISION_SOURCE])
+PATTERNS: Dict[str, tuple] = {
+    "get_user (ttl=0)": (_lookup, 0, "snapshot"),
+    "get_user rev (ttl=0)": (_lookup, 0, "snapshot", "drive"),
+    "get_user (ttl=30)": (_lookup, 30, "snapshot"),
+    "get_user row (ttl=0)": (_lookup, 0, "row"),
+    "add_user": (_add, 30, "snapshot"),
+    "add_user row": (_add, 0, "row"),
+    "update_user x2 fields": (_update, 30, "snapshot"),
+    "update_user row": (_update, 0, "row"),
+    "classify all": (_classify, 30, "snapshot"),
+    "classify all rev (ttl=0)": (_classify, 0, "snapshot", "drive"),
+}
+
+
+def run_pattern(operation: Callable, ttl: float, mode: str, revision: str, rows: int, ops: int,
+                args) -> PatternResult:
+    clock = SimClock(realtime=False)
+    quota = SheetsQuota(args.reads_per_minute, args.writes_per_minute, clock=clock)
+    latency = SheetsLatency(args.read_base_ms, args.write_base_ms, args.per_1k_cells_ms)
+    client = make_fake_client(users=rows, latency=latency, quota=quota, clock=clock)
+    worksheet = client.spreadsheet.worksheet("UserStatus")
+
+    service = GoogleSheetsService(client=client)
+    service.cache_ttl = ttl
+    service.access_mode = mode
+    service.revision_source = revision
+    service.connect()
+
+    cpu_start = time.perf_counter()
+    for i in range(ops):
+        try:
+            operation(service, i, rows)
+        except Exception:
+            pass  # throttled / failed calls are counted by the fake
+    cpu_s = time.perf_counter() - cpu_start
+
+    return PatternResult(
+        api_ms=worksheet.stats["api_seconds"] * 1000 / ops,
+        cpu_ms=cpu_s * 1000 / ops,
+        calls=sum(worksheet.calls.values()) / ops,
+        cells_read=worksheet.stats["cells_read"] / ops,
+        throttled=worksheet.stats["throttled"],
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,50000,100000")
+    parser.add_argument("--ops", type=int, default=30)
+    parser.add_argument("--read-base-ms", type=float, default=150)
+    parser.add_argument("--write-base-ms", type=float, default=250)
+    parser.add_argument("--per-1k-cells-ms", type=float, default=5)
+    parser.add_argument("--reads-per-minute", type=int, default=60)
+    parser.add_argument("--writes-per-minute", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    # 429s are expected here and logged by the service - keep the report readable
+    logging.getLogger("services").setLevel(logging.CRITICAL)
+
+    print(f"{'rows':>7}  {'pattern':<24} {'api ms/op':>10} {'cpu ms/op':>10} "
+          f"{'calls/op':>9} {'cells/op':>10} {'429s':>5}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        for name, (operation, ttl, mode, *revision) in PATTERNS.items():
+            result = run_pattern(operation, ttl, mode, revision[0] if revision else "", rows, args.ops, args)
+            print(f"{rows:7d}  {name:<24} {result.api_ms:10.1f} {result.cpu_ms:10.2f} "
+                  f"{result.calls:9.2f} {result.cells_read:10.0f} {result.throttled:5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local HTTP stand-ins for OpenAI and Zalo, served by uvicorn in background threads
+"""
+import json
+import re
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from tools.loadtest.faults import FaultConfig
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """Run an ASGI app on 127.0.0.1 in a daemon thread"""
+
+    def __init__(self, app, port: int = None):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def make_openai_app(faults: FaultConfig) -> FastAPI:
+    """OpenAI-compatible `/v1/chat/completions` that 'extracts' the first email in the prompt"""
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "created": 0, "owned_by": "loadtest"}]}
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await faults.apply_async()
+        if faults.should_fail():
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=faults.error_status)
+
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        # The prompt also contains example emails - only look at the quoted user message
+        quoted = prompt.split('"', 2)[1] if prompt.count('"') >= 2 else prompt
+        match = _EMAIL.search(quoted)
+        content = json.dumps({"email": match.group(0) if match else None})
+        return {
+            "id": f"chatcmpl-{app.state.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+class ZaloRecorder:
+    """Arrival times of outbound Zalo messages per user (monotonic clock)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.arrivals: Dict[str, Deque[float]] = defaultdict(deque)
+        self.total = 0
+
+    def record(self, user_id: str) -> None:
+        with self._lock:
+            self.arrivals[user_id].append(time.monotonic())
+            self.total += 1
+
+    def pop(self, user_id: str):
+        with self._lock:
+            queue = self.arrivals.get(user_id)
+            return queue.popleft() if queue else None
+
+
+def make_zalo_app(faults: FaultConfig, recorder: ZaloRecorder) -> FastAPI:
+    """Zalo OA `v3.0/oa/message/cs` stand-in"""
+    app = FastAPI()
+
+    @app.head("/v3.0/")
+    @app.get("/v3.0/")
+    async def root():
+        return {}
+
+    @app.post("/v3.0/oa/message/cs")
+    async def send_message(request: Request):
+        body = await request.json()
+        await faults.apply_async()
+        if faults.should_fail():
+            return JSONResponse({"error": -32, "message": "injected failure"}, status_code=faults.error_status)
+        recorder.record(str(body.get("recipient", {}).get("user_id", "")))
+        return {"error": 0, "message": "Success", "data": {"message_id": "fake"}}
+
+    return app
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,383 @@
+"""
+In-memory gspread stand-in (Client / Spreadsheet / Worksheet subset used by
+GoogleSheetsService) cho load test và benchmark offline.
+
+Mô phỏng:
+- latency tỉ lệ với kích thước response (base + per 1k cells)
+- quota theo phút (read/write, cửa sổ trượt 60s) → 429 RESOURCE_EXHAUSTED
+- lỗi ngẫu nhiên qua FaultConfig
+Lỗi được raise dưới dạng gspread.exceptions.APIError thật, nên code gọi
+không cần biết đang chạy với fake.
+
+Với `SimClock(realtime=False)` latency chỉ được cộng vào đồng hồ ảo (không
+sleep), dùng để đo chi phí access pattern ở 10k-100k dòng trong vài giây.
+"""
+import csv
+import io
+import json
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, List, Optional
+
+import requests
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import numericise_all, to_records
+
+from tools.loadtest.faults import FaultConfig
+
+HEADER = ["id", "username", "email", "form_status", "form_submitted_at",
+          "last_follow_up_sent", "created_at", "stage"]
+
+_A1 = re.compile(r"^([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$")
+
+
+def api_error(status: int, message: str) -> APIError:
+    """Build a real gspread APIError for the given HTTP status"""
+    response = requests.Response()
+    response.status_code = status
+    reason = "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"
+    response._content = json.dumps({"error": {"code": status, "message": message, "status": reason}}).encode()
+    return APIError(response)
+
+
+def _col_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index
+
+
+class SimClock:
+    """Monotonic clock; with realtime=False latency advances a virtual offset instead of sleeping"""
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self._offset = 0.0
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.monotonic() + self._offset
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        if self.realtime:
+            time.sleep(seconds)
+        else:
+            with self._lock:
+                self._offset += seconds
+
+
+@dataclass
+class SheetsLatency:
+    """Response time model: base + size-proportional component (ms)"""
+    read_base_ms: float = 150.0
+    write_base_ms: float = 250.0
+    per_1k_cells_ms: float = 5.0
+
+    def seconds(self, kind: str, cells: int) -> float:
+        base = self.read_base_ms if kind == "read" else self.write_base_ms
+        return (base + self.per_1k_cells_ms * cells / 1000) / 1000
+
+
+class SheetsQuota:
+    """Per-minute request quota (Sheets API default: 60 reads + 60 writes per user per minute)"""
+
+    def __init__(self, reads_per_minute: int = 60, writes_per_minute: int = 60,
+                 window: float = 60.0, clock: SimClock = None):
+        self.limits = {"read": reads_per_minute, "write": writes_per_minute}
+        self.window = window
+        self.clock = clock or SimClock()
+        self._requests = {"read": deque(), "write": deque()}  # type: dict[str, Deque[float]]
+        self._lock = threading.Lock()
+
+    def acquire(self, kind: str) -> bool:
+        """Record one request; False when the quota for the current window is exhausted"""
+        limit = self.limits[kind]
+        if limit <= 0:
+            return True
+        now = self.clock.now()
+        with self._lock:
+            requests_in_window = self._requests[kind]
+            while requests_in_window and now - requests_in_window[0] >= self.window:
+                requests_in_window.popleft()
+            if len(requests_in_window) >= limit:
+                return False
+            requests_in_window.append(now)
+            return True
+
+
+class FakeWorksheet:
+    def __init__(self, title: str, rows: Optional[List[List[str]]] = None, faults: FaultConfig = None,
+                 latency: SheetsLatency = None, quota: SheetsQuota = None, clock: SimClock = None):
+        self.title = title
+        self.id = 0
+        self.faults = faults or FaultConfig()
+        self.latency = latency or SheetsLatency(read_base_ms=0, write_base_ms=0, per_1k_cells_ms=0)
+        self.clock = clock or SimClock()
+        self.quota = quota
+        self._rows = rows if rows is not None else [list(HEADER)]
+        self._lock = threading.Lock()
+        self.calls = {"read": 0, "write": 0}
+        self.revision = 0  # bumped on every write (Drive modifiedTime stand-in)
+        self.stats = {"cells_read": 0, "cells_written": 0, "throttled": 0, "failed": 0, "api_seconds": 0.0}
+
+    def _cells(self) -> int:
+        return sum(len(row) for row in self._rows)
+
+    def _call(self, kind: str, cells: int) -> None:
+        self.calls[kind] += 1
+        if self.quota is not None and not self.quota.acquire(kind):
+            self.stats["throttled"] += 1
+            raise api_error(429, f"Quota exceeded for quota metric '{kind.title()} requests' "
+                                 f"and limit '{kind.title()} requests per minute per user'")
+
+        delay = self.latency.seconds(kind, cells) + self.faults.delay_seconds()
+        self.stats["api_seconds"] += delay
+        self.stats["cells_read" if kind == "read" else "cells_written"] += cells
+        self.clock.sleep(delay)
+
+        if self.faults.should_fail():
+            self.stats["failed"] += 1
+            raise api_error(self.faults.error_status, "Injected failure")
+
+    @property
+    def row_count(self) -> int:
+        return len(self._rows)
+
+    def get_all_values(self, *args, **kwargs) -> List[List[str]]:
+        self._call("read", self._cells())
+        with self._lock:
+            return [list(row) for row in self._rows]
+
+    def export_csv(self, chunk_rows: int = 1000) -> Iterator[str]:
+        """CSV export body in chunks (one read charged for the whole download)"""
+        self._call("read", self._cells())
+        with self._lock:
+            width = max((len(row) for row in self._rows), default=0)  # export is the full grid
+            total = len(self._rows)
+        for start in range(0, total, chunk_rows):
+            with self._lock:
+                rows = [row + [""] * (width - len(row)) for row in self._rows[start:start + chunk_rows]]
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\r\n").writerows(rows)
+            yield buffer.getvalue()
+
+    def get_all_records(self, head: int = 1, default_blank: str = "", numericise_ignore=None,
+                        allow_underscores_in_numeric_literals: bool = False, empty2zero: bool = False,
+                        **kwargs) -> List[dict]:
+        """Same shape as gspread: header row as keys, numeric-looking strings converted"""
+        values = self.get_all_values()
+        if len(values) < head:
+            return []
+        keys = values[head - 1]
+        rows = [row + [""] * (len(keys) - len(row)) for row in values[head:]]
+        if numericise_ignore != ["all"]:
+            rows = [
+                numericise_all(row, empty2zero, default_blank,
+                               allow_underscores_in_numeric_literals, numericise_ignore or [])
+                for row in rows
+            ]
+        return to_records(keys, rows)
+
+    def col_values(self, col: int, *args, **kwargs) -> List[str]:
+        """Values of one column down to its last non-empty cell"""
+        with self._lock:
+            values = [row[col - 1] if len(row) >= col else "" for row in self._rows]
+        while values and values[-1] == "":
+            values.pop()
+        self._call("read", len(values))
+        return values
+
+    def get(self, range_name: str, *args, **kwargs) -> List[List[str]]:
+        """Values of an A1 range (trailing empty cells trimmed, like the API)"""
+        match = _A1.match(range_name)
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        first_row, first_col = int(match.group(2)), _col_index(match.group(1))
+        last_row = int(match.group(4) or first_row)
+        last_col = _col_index(match.group(3) or match.group(1))
+        with self._lock:
+            result = []
+            for row in self._rows[first_row - 1:last_row]:
+                cells = row[first_col - 1:last_col]
+                while cells and cells[-1] == "":
+                    cells = cells[:-1]
+                result.append(list(cells))
+        while result and not result[-1]:
+            result.pop()
+        self._call("read", sum(len(row) for row in result))
+        return result
+
+    def batch_update(self, data: List[dict], **kwargs) -> dict:
+        """Several ranges in one write request"""
+        self._call("write", sum(len(row) for item in data for row in item["values"]))
+        for item in data:
+            self._write(item["range"], item["values"])
+        return {"totalUpdatedCells": sum(len(row) for item in data for row in item["values"])}
+
+    def update(self, range_name: str, values=None, **kwargs) -> dict:
+        match = _A1.match(range_name)
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        values = values or []
+        self._call("write", sum(len(row) for row in values))
+        self._write(range_name, values)
+        return {"updatedRange": f"{self.title}!{range_name}", "updatedCells": sum(len(row) for row in values)}
+
+    def _write(self, range_name: str, values: List[list]) -> None:
+        match = _A1.match(range_name)
+        if not match:
+            raise ValueError(f"Unsupported range: {range_name}")
+        first_row, first_col = int(match.group(2)), _col_index(match.group(1))
+        with self._lock:
+            self.revision += 1
+            for i, row in enumerate(values):
+                while len(self._rows) < first_row + i:
+                    self._rows.append([])
+                target = self._rows[first_row + i - 1]
+                for j, value in enumerate(row):
+                    while len(target) < first_col + j:
+                        target.append("")
+                    target[first_col + j - 1] = "" if value is None else str(value)
+
+    def append_row(self, values: list, value_input_option: str = "RAW", insert_data_option: str = None,
+                   table_range: str = None, **kwargs) -> dict:
+        """Write after the last row holding any value (the API's table detection), like values_append"""
+        self._call("write", len(values))
+        with self._lock:
+            self.revision += 1
+            row = len(self._rows)
+            while row and not any(cell != "" for cell in self._rows[row - 1]):
+                row -= 1
+            self._rows.insert(row, ["" if value is None else str(value) for value in values])
+        last_col = ""
+        col = len(values)
+        while col:
+            col, rem = divmod(col - 1, 26)
+            last_col = chr(65 + rem) + last_col
+        return {"updates": {"updatedRange": f"{self.title}!A{row + 1}:{last_col}{row + 1}",
+                            "updatedRows": 1, "updatedCells": len(values)}}
+
+    def update_cell(self, row: int, col: int, value) -> dict:
+        letters = ""
+        while col:
+            col, rem = divmod(col - 1, 26)
+            letters = chr(65 + rem) + letters
+        return self.update(f"{letters}{row}", [[value]])
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets: List[FakeWorksheet]):
+        self._worksheets = {ws.title: ws for ws in worksheets}
+        for gid, ws in enumerate(worksheets):
+            ws.id = gid
+        self.id = "fake-spreadsheet"
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        try:
+            return self._worksheets[title]
+        except KeyError:
+            raise WorksheetNotFound(title) from None
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        return list(self._worksheets.values())
+
+    def values_get(self, range_name: str, params=None) -> dict:
+        """Values API read of 'Sheet!A1:B2' (one read request on that worksheet)"""
+        title, _, cells = range_name.rpartition("!")
+        worksheet = self.worksheet(title.strip("'")) if title else self.worksheets()[0]
+        return {"range": range_name, "values": worksheet.get(cells)}
+
+    def get_lastUpdateTime(self) -> str:
+        """Drive modifiedTime stand-in: changes whenever any worksheet is written"""
+        worksheets = self.worksheets()
+        worksheets[0]._call("read", 1)
+        return f"rev-{sum(ws.revision for ws in worksheets)}"
+
+
+class FakeExportResponse:
+    """requests.Response subset used by the streaming CSV reader"""
+
+    def __init__(self, chunks: Iterator[str]):
+        self.status_code = 200
+        self.encoding = None
+        self._chunks = chunks
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int = 1, decode_unicode: bool = False) -> Iterator[str]:
+        return self._chunks
+
+    def close(self) -> None:
+        pass
+
+
+class FakeSession:
+    """Authorized-session stand-in serving the spreadsheet CSV export URL"""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def get(self, url: str, params=None, stream: bool = False, timeout=None) -> FakeExportResponse:
+        gid = int((params or {}).get("gid", 0))
+        for worksheet in self.spreadsheet.worksheets():
+            if worksheet.id == gid:
+                return FakeExportResponse(worksheet.export_csv())
+        raise api_error(404, f"No worksheet with gid {gid}")
+
+
+class FakeHTTPClient:
+    """gspread HTTPClient subset: the session and timeout used for raw requests"""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.session = FakeSession(spreadsheet)
+        self.timeout = None
+
+
+class FakeClient:
+    """gspread.Client subset: open_by_key / open (+ http_client for the CSV export)"""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+        self.http_client = FakeHTTPClient(spreadsheet)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return self.spreadsheet
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        return self.spreadsheet
+
+
+def seed_rows(users: int) -> List[List[str]]:
+    """Header + `users` rows; every fifth is submitted (with email), the rest pending without email"""
+    rows = [list(HEADER)]
+    for i in range(users):
+        submitted = i % 5 == 0
+        rows.append([
+            f"seed-{i}",
+            f"Seed {i}",
+            f"seed-{i}@example.com" if submitted else "",
+            "submitted" if submitted else "pending",
+            "2024-01-01 10:00:00" if submitted else "",
+            "",
+            "2024-01-01 09:00:00",
+            "completed" if submitted else "provide_field",
+        ])
+    return rows
+
+
+def make_fake_client(worksheet_name: str = "UserStatus", users: int = 0, faults: FaultConfig = None,
+                     latency: SheetsLatency = None, quota: SheetsQuota = None,
+                     clock: SimClock = None) -> FakeClient:
+    """Fake client with `users` pre-seeded rows.
+
+    Without `latency`/`quota` only FaultConfig applies (load-test default).
+    """
+    clock = clock or (quota.clock if quota else SimClock())
+    worksheet = FakeWorksheet(worksheet_name, seed_rows(users), faults, latency, quota, clock)
+    return FakeClient(FakeSpreadsheet([worksheet]))
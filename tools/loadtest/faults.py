@@ -0,0 +1,30 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class FaultConfig:
+    """Latency and error injection for a fake backend"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0  # 0.0 - 1.0
+    error_status: int = 500
+
+    def delay_seconds(self) -> float:
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    async def apply_async(self) -> None:
+        delay = self.delay_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def apply_sync(self) -> None:
+        delay = self.delay_seconds()
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,152 @@
+"""
+Shared harness for the load test and webhook replay
+
+LocalStack chạy create_app() thật trên cổng local, với OpenAI / Zalo là
+stand-in HTTP (fake_servers) và Sheets là fake gspread trong process, nên
+không call nào ra ngoài. LoadStats / fire / match_replies đo ack latency
+theo endpoint và reply latency end-to-end (webhook → Zalo stand-in).
+"""
+import bisect
+import os
+import resource
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from tools.loadtest.faults import FaultConfig
+
+
+def faults_for(args, backend: str) -> FaultConfig:
+    return FaultConfig(
+        latency_ms=getattr(args, f"{backend}_latency_ms"),
+        jitter_ms=getattr(args, f"{backend}_jitter_ms"),
+        error_rate=getattr(args, f"{backend}_error_rate"),
+        error_status=429 if backend == "sheets" else 500,
+    )
+
+
+def add_backend_args(parser) -> None:
+    """--{openai,zalo,sheets}-{latency-ms,jitter-ms,error-rate} + fake sheet options"""
+    parser.add_argument("--seed-users", type=int, default=1000, help="pre-existing rows in the fake sheet")
+    parser.add_argument("--sheets-cache-ttl", type=float, default=30)
+    parser.add_argument("--sheets-per-1k-cells-ms", type=float, default=0, help="size-proportional Sheets latency")
+    parser.add_argument("--sheets-reads-per-minute", type=int, default=0, help="Sheets read quota (0 = unlimited)")
+    parser.add_argument("--sheets-writes-per-minute", type=int, default=0, help="Sheets write quota (0 = unlimited)")
+    for backend, latency in (("openai", 300), ("zalo", 50), ("sheets", 100)):
+        parser.add_argument(f"--{backend}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{backend}-jitter-ms", type=float, default=latency / 5)
+        parser.add_argument(f"--{backend}-error-rate", type=float, default=0.0)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LocalStack:
+    """create_app() on a local port with OpenAI / Zalo / Sheets stand-ins"""
+
+    def __init__(self, args):
+        from tools.loadtest.fake_servers import ServerThread, ZaloRecorder, make_openai_app, make_zalo_app
+
+        self.recorder = ZaloRecorder()
+        self.openai_app = make_openai_app(faults_for(args, "openai"))
+        self.openai_server = ServerThread(self.openai_app).start()
+        self.zalo_server = ServerThread(make_zalo_app(faults_for(args, "zalo"), self.recorder)).start()
+
+        # Configure the app before core.config is imported (Settings reads env at import)
+        os.environ.setdefault("BOT_TOKEN", "loadtest")
+        os.environ.setdefault("FORM_URL", "https://example.com/form")
+        os.environ.update({
+            "LOG_LEVEL": "WARNING",
+            "FOLLOW_UP_SCHEDULER_ENABLED": "false",
+            "OPENAI_API_KEY": "loadtest",
+            "OPENAI_BASE_URL": f"{self.openai_server.url}/v1",
+            "ZALO_API_URL": f"{self.zalo_server.url}/v3.0/",
+            "ZALO_OA_ACCESS_TOKEN": "loadtest",
+            "SHEETS_CACHE_TTL": str(args.sheets_cache_ttl),
+            "SHEETS_SNAPSHOT_PATH": "",  # every run starts cold
+            "WEBHOOK_CAPTURE_PATH": "",  # never capture the harness' own traffic
+            "WORKER_MODE": "inprocess",
+        })
+
+        import services.google_sheets_service as sheets_module
+        from tools.loadtest.fake_sheets import SheetsLatency, SheetsQuota, make_fake_client
+        from core.app import create_app
+
+        fake_client = make_fake_client(
+            users=args.seed_users,
+            faults=faults_for(args, "sheets"),
+            latency=SheetsLatency(read_base_ms=0, write_base_ms=0, per_1k_cells_ms=args.sheets_per_1k_cells_ms),
+            quota=SheetsQuota(args.sheets_reads_per_minute, args.sheets_writes_per_minute),
+        )
+        sheets_module.sheets_service = sheets_module.GoogleSheetsService(client=fake_client)
+        self.worksheet = fake_client.spreadsheet.worksheet("UserStatus")
+
+        self.rss_start = rss_mb()
+        self.app_server = ServerThread(create_app()).start()
+        self.url = self.app_server.url
+
+    def stop(self) -> None:
+        self.rss_end = rss_mb()
+        self.app_server.stop()
+        self.zalo_server.stop()
+        self.openai_server.stop()
+
+    def backend_calls(self) -> Dict[str, int]:
+        return {
+            "openai": self.openai_app.state.calls,
+            "zalo_sends": self.recorder.total,
+            "sheets_reads": self.worksheet.calls["read"],
+            "sheets_writes": self.worksheet.calls["write"],
+            "sheets_429s": self.worksheet.stats["throttled"],
+        }
+
+
+class LoadStats:
+    def __init__(self):
+        self.ack_ms: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.sends: Dict[str, List[float]] = defaultdict(list)  # webhook user -> send times (accepted only)
+        self.completed = 0
+
+
+async def fire(client, stats: LoadStats, endpoint: str, path: str, payload: dict, user_id: str = None):
+    start = time.monotonic()
+    try:
+        response = await client.post(path, json=payload)
+        status = response.json().get("status", str(response.status_code)) if response.status_code == 200 else str(response.status_code)
+    except Exception as e:
+        status = type(e).__name__
+    stats.ack_ms[endpoint].append((time.monotonic() - start) * 1000)
+    stats.statuses[endpoint][status] += 1
+    stats.completed += 1
+    if user_id and status == "received":
+        stats.sends[user_id].append(start)
+
+
+def match_replies(sends: Dict[str, List[float]], recorder) -> List[float]:
+    """Pair each Zalo arrival with the latest unmatched webhook send before it"""
+    latencies = []
+    for user_id, user_sends in sends.items():
+        user_sends = sorted(user_sends)
+        matched = set()
+        arrivals = sorted(recorder.arrivals.get(user_id, []))
+        for arrival in arrivals:
+            index = bisect.bisect_right(user_sends, arrival) - 1
+            while index >= 0 and index in matched:
+                index -= 1
+            if index >= 0:
+                matched.add(index)
+                latencies.append((arrival - user_sends[index]) * 1000)
+    return latencies
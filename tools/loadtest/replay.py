@@ -0,0 +1,207 @@
+"""
+Replay captured webhook traffic (WEBHOOK_CAPTURE_PATH, core/capture.py) against the current build
+
+    python -m tools.loadtest.replay capture.ndjson                    # 1x, original pacing
+    python -m tools.loadtest.replay capture.ndjson --speed 10         # 10x faster
+    python -m tools.loadtest.replay capture.ndjson --speed max --concurrency 50
+    python -m tools.loadtest.replay capture.ndjson --save before.json
+    python -m tools.loadtest.replay capture.ndjson --baseline before.json
+
+Chạy create_app() của working tree với stand-in Zalo / OpenAI / Sheets
+(LocalStack), gửi lại từng request với đúng path + body, theo khoảng cách
+thời gian gốc chia cho --speed ("max" = không chờ, giới hạn bởi
+--concurrency). Báo cáo ack latency theo endpoint, reply latency end-to-end
+(webhook → Zalo stand-in), throughput (gốc vs replay) và số call backend.
+--save ghi kết quả ra JSON; --baseline in bảng so sánh với một lần chạy đã lưu
+(ví dụ trước / sau một thay đổi, cùng file capture và cùng --speed).
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, List, Optional
+
+from tools.loadtest.harness import LoadStats, LocalStack, add_backend_args, fire, match_replies, peak_rss_mb
+
+ENDPOINTS = {"/webhook": "webhook", "/form-submitted": "form", "/status-changed": "status"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="NDJSON file written by WEBHOOK_CAPTURE_PATH")
+    parser.add_argument("--speed", default="1", help="time scale: 1 = real time, N = N times faster, max = no pacing")
+    parser.add_argument("--concurrency", type=int, default=50, help="in-flight requests with --speed max")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N records")
+    parser.add_argument("--drain", type=float, default=10, help="seconds to wait for replies after the last request")
+    parser.add_argument("--save", help="write the summary to this JSON file")
+    parser.add_argument("--baseline", help="summary JSON of an earlier run to compare against")
+    add_backend_args(parser)
+    args = parser.parse_args(argv)
+    if args.speed != "max" and float(args.speed) <= 0:
+        parser.error("--speed must be > 0 or 'max'")
+    return args
+
+
+def load_capture(path: str, limit: int = 0) -> List[dict]:
+    """Replayable records sorted by arrival time (unknown paths / broken lines skipped)"""
+    records, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record["path"] in ENDPOINTS and isinstance(record["body"], dict):
+                    records.append(record)
+                    continue
+            except (ValueError, KeyError, TypeError):
+                pass
+            skipped += 1
+    if skipped:
+        print(f"Skipped {skipped} unreadable / non-replayable lines", file=sys.stderr)
+    records.sort(key=lambda record: record["t"])
+    return records[:limit] if limit else records
+
+
+async def replay(base_url: str, records: List[dict], speed: Optional[float], concurrency: int,
+                 stats: LoadStats) -> float:
+    """Send `records` with the original gaps divided by `speed` (None = as fast as possible)"""
+    import httpx
+
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    gate = asyncio.Semaphore(concurrency) if speed is None else None
+
+    async def send(record: dict) -> None:
+        path, body = record["path"], record["body"]
+        user_id = str(body.get("sender", {}).get("id", "")) if path == "/webhook" else None
+        if gate is None:
+            await fire(client, stats, ENDPOINTS[path], path, body, user_id)
+            return
+        async with gate:
+            await fire(client, stats, ENDPOINTS[path], path, body, user_id)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        tasks = []
+        first = records[0]["t"]
+        start = time.monotonic()
+        for record in records:
+            if speed is not None:
+                # Open loop, like production: the next request does not wait for earlier responses
+                await asyncio.sleep(max(0.0, start + (record["t"] - first) / speed - time.monotonic()))
+            tasks.append(asyncio.create_task(send(record)))
+        await asyncio.gather(*tasks)
+        return time.monotonic() - start
+
+
+def summarize(args, records: List[dict], stats: LoadStats, elapsed: float, stack: LocalStack) -> Dict:
+    from tools.loadtest.fake_servers import percentile
+
+    span = records[-1]["t"] - records[0]["t"]
+    replies = match_replies(stats.sends, stack.recorder)
+    return {
+        "capture": args.capture,
+        "speed": args.speed,
+        "requests": len(records),
+        "captured_rps": round(len(records) / span, 2) if span > 0 else None,
+        "replay_seconds": round(elapsed, 2),
+        "throughput_rps": round(stats.completed / elapsed, 2) if elapsed > 0 else None,
+        "endpoints": {
+            endpoint: {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 50), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+                "max_ms": round(max(samples), 1),
+                "statuses": dict(sorted(stats.statuses[endpoint].items())),
+            }
+            for endpoint, samples in stats.ack_ms.items()
+        },
+        "replies": {
+            "accepted": sum(len(v) for v in stats.sends.values()),
+            "replied": len(replies),
+            "p50_ms": round(percentile(replies, 50), 1) if replies else None,
+            "p99_ms": round(percentile(replies, 99), 1) if replies else None,
+        },
+        "backend_calls": stack.backend_calls(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _metrics(summary: Dict) -> Dict[str, Optional[float]]:
+    """Flat view of a summary for the comparison table"""
+    flat = {
+        "throughput req/s": summary["throughput_rps"],
+        "replay seconds": summary["replay_seconds"],
+        "reply p50 ms": summary["replies"]["p50_ms"],
+        "reply p99 ms": summary["replies"]["p99_ms"],
+        "replied": summary["replies"]["replied"],
+    }
+    for endpoint, values in summary["endpoints"].items():
+        flat[f"{endpoint} ack p50 ms"] = values["p50_ms"]
+        flat[f"{endpoint} ack p99 ms"] = values["p99_ms"]
+    for name, count in summary["backend_calls"].items():
+        flat[f"calls {name}"] = count
+    return flat
+
+
+def print_summary(summary: Dict) -> None:
+    print(f"\n{'endpoint':<10} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for endpoint, values in summary["endpoints"].items():
+        statuses = ", ".join(f"{k}={v}" for k, v in values["statuses"].items())
+        print(f"{endpoint:<10} {values['count']:7d} {values['p50_ms']:9.1f} "
+              f"{values['p99_ms']:9.1f} {values['max_ms']:9.1f}  {statuses}")
+
+    replies = summary["replies"]
+    print(f"\nEnd-to-end reply latency (webhook → Zalo send): "
+          f"{replies['replied']}/{replies['accepted']} accepted messages replied")
+    if replies["replied"]:
+        print(f"  p50 {replies['p50_ms']:.1f} ms   p99 {replies['p99_ms']:.1f} ms")
+
+    print(f"\nThroughput: {summary['throughput_rps']} req/s replayed "
+          f"(captured traffic: {summary['captured_rps']} req/s, speed {summary['speed']})")
+    print("Backend calls: " + " ".join(f"{name}={count}" for name, count in summary["backend_calls"].items()))
+
+
+def print_comparison(baseline: Dict, current: Dict) -> None:
+    if (baseline.get("capture"), baseline.get("speed")) != (current["capture"], current["speed"]):
+        print(f"\nNote: baseline replayed {baseline.get('capture')} at speed {baseline.get('speed')}")
+    before, after = _metrics(baseline), _metrics(current)
+    print(f"\n{'metric':<24} {'baseline':>10} {'current':>10} {'change':>9}")
+    for name in list(dict.fromkeys([*before, *after])):
+        old, new = before.get(name), after.get(name)
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else ""
+        print(f"{name:<24} {_cell(old):>10} {_cell(new):>10} {change:>9}")
+
+
+def _cell(value) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        sys.exit(f"No replayable records in {args.capture}")
+    speed = None if args.speed == "max" else float(args.speed)
+
+    stack = LocalStack(args)
+    # Let the warm-up finish so the run measures steady state
+    time.sleep(1)
+
+    stats = LoadStats()
+    print(f"Replaying {len(records)} requests at speed {args.speed} against {stack.url} ...")
+    elapsed = asyncio.run(replay(stack.url, records, speed, args.concurrency, stats))
+    time.sleep(args.drain)
+    stack.stop()
+
+    summary = summarize(args, records, stats, elapsed, stack)
+    print_summary(summary)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_comparison(json.load(f), summary)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"\nSaved summary to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
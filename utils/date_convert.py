@@ -1,5 +1,7 @@
 from datetime import datetime, timezone, timedelta
 
+VN_TZ = timezone(timedelta(hours=7))
+
 def iso_to_vn_datetime(iso_time_str):
     """
     Chuyển chuỗi ISO thành datetime với timezone UTC+7.
@@ -7,9 +9,9 @@ def iso_to_vn_datetime(iso_time_str):
     """
     dt = datetime.fromisoformat(iso_time_str)
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone(timedelta(hours=7)))
+        dt = dt.replace(tzinfo=VN_TZ)
     else:
-        dt = dt.astimezone(timezone(timedelta(hours=7)))
+        dt = dt.astimezone(VN_TZ)
     return dt
 
 def compare_datetime(now, last_follow_up):
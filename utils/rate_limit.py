@@ -1,6 +1,8 @@
 import time
 import logging
 
+from core.memory import track_cache
+
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,21 @@ def cleanup_rate_limit_cache() -> None:
         )
 
 
+def evict_rate_limit_cache(level: int) -> int:
+    """Memory pressure: drop every entry that can no longer rate-limit anyone"""
+    global user_last_message
+    cutoff_time = time.time() - MIN_MESSAGE_INTERVAL
+    before = len(user_last_message)
+    user_last_message = {
+        uid: timestamp for uid, timestamp in user_last_message.items()
+        if timestamp > cutoff_time
+    }
+    return before - len(user_last_message)
+
+
+track_cache("rate_limit", lambda: user_last_message, evict=evict_rate_limit_cache)
+
+
 def is_rate_limited(user_id: str) -> bool:
     """Return True if the user should be rate limited, False otherwise."""
     cleanup_rate_limit_cache()
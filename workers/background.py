@@ -1,10 +1,43 @@
 import asyncio
 
+from core.memory import track_cache
+
 
 class BackgroundTaskManager:
     """Thin wrapper around asyncio to allow DI and future swapping to a queue."""
 
+    queued = False
+
+    def __init__(self):
+        # Strong references keep tasks alive until done; size doubles as queue depth
+        self._tasks = set()
+        track_cache("background_tasks", lambda: self._tasks)
+
     def run(self, coro_func, *args, **kwargs):
-        asyncio.create_task(coro_func(*args, **kwargs))
+        task = asyncio.create_task(coro_func(*args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def depth(self) -> int:
+        """Background jobs still running in this process"""
+        return len(self._tasks)
+
+
+class QueueTaskManager(BackgroundTaskManager):
+    """Hand jobs to the standalone worker (`python -m workers.cron_worker`) via the local job queue."""
+
+    queued = True
+
+    def __init__(self, job_queue):
+        super().__init__()
+        self.job_queue = job_queue
+
+    async def enqueue(self, kind: str, payload: dict) -> int:
+        # SQLite insert may wait on the write lock (busy timeout): keep it off the event loop
+        return await asyncio.to_thread(self.job_queue.enqueue, kind, payload)
+
+    def depth(self) -> int:
+        """Jobs waiting in (or claimed from) the shared queue"""
+        return self.job_queue.depth()
 
 
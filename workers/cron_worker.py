@@ -0,0 +1,143 @@
+"""
+Standalone worker process
+
+    python -m workers.cron_worker
+
+Chạy tách khỏi web process (WORKER_MODE=queue): web tier chỉ ack webhook và
+enqueue vào SQLite job queue, worker này claim job, chạy use case tương ứng
+và (nếu FOLLOW_UP_SCHEDULER_ENABLED) chạy luôn follow-up scheduler.
+Có thể chạy nhiều worker, nhưng chỉ bật scheduler ở một worker.
+"""
+import asyncio
+import logging
+import signal
+
+from core.config import settings
+from core.logging import setup_logging
+from workers.job_queue import Job, SQLiteJobQueue, get_job_queue
+from workers.tasks import JOB_HANDLERS, JobContext
+
+logger = logging.getLogger(__name__)
+
+
+def build_job_context() -> JobContext:
+    """Build use cases once for the lifetime of the worker"""
+    from core.container import get_container
+
+    container = get_container()
+    return JobContext(
+        message_usecase=container.message_usecase,
+        form_sync_usecase=container.form_sync_usecase,
+        sheet_sync_usecase=container.sheet_sync_usecase,
+        status_change_usecase=container.status_change_usecase,
+    )
+
+
+class Worker:
+    """Poll the job queue and run handlers with bounded concurrency"""
+
+    def __init__(self, queue: SQLiteJobQueue, ctx: JobContext,
+                 concurrency: int = 4, poll_interval: float = 0.5):
+        self.queue = queue
+        self.ctx = ctx
+        self.poll_interval = poll_interval
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stopping = asyncio.Event()
+        self._tasks = set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Worker started (queue=%s)", self.queue.path, extra={"queue_path": self.queue.path})
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # Drain in-flight jobs before exiting
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("Worker stopped")
+
+    async def _execute(self, job: Job) -> None:
+        try:
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            await handler(self.ctx, job.payload)
+        except Exception as e:
+            logger.error("Job %s (%s) failed on attempt %s: %s", job.id, job.kind, job.attempts, e,
+                         extra={"job_id": job.id, "job_kind": job.kind, "attempts": job.attempts})
+            await asyncio.to_thread(self.queue.fail, job, str(e))
+            self._slots.release()
+            return
+        try:
+            # The handler's side effects (Zalo reply, Sheets writes) already happened:
+            # a failed `complete` must not turn into a retry of the whole job
+            await self._complete(job)
+        finally:
+            self._slots.release()
+
+    async def _complete(self, job: Job, attempts: int = 3) -> None:
+        for attempt in range(1, attempts + 1):
+            try:
+                await asyncio.to_thread(self.queue.complete, job.id)
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    logger.error("Job %s (%s) done but could not be removed from the queue: %s", job.id, job.kind, e,
+                                 extra={"job_id": job.id, "job_kind": job.kind})
+                    return
+                await asyncio.sleep(attempt)
+
+
+async def main():
+    """Worker entry point"""
+    setup_logging()
+
+    ctx = build_job_context()
+    worker = Worker(
+        get_job_queue(),
+        ctx,
+        concurrency=settings.worker_concurrency,
+        poll_interval=settings.worker_poll_interval,
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            pass
+
+    scheduler = None
+    if settings.follow_up_scheduler_enabled:
+        from workers.follow_up_scheduler import FollowUpScheduler
+        scheduler = FollowUpScheduler(
+            bot_service=ctx.message_usecase.bot_service,
+            gateway=ctx.message_usecase.message_gateway,
+        )
+        scheduler.start()
+
+    try:
+        await worker.run()
+    finally:
+        if scheduler is not None:
+            await scheduler.stop()
+        from core.container import get_container
+        get_container().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
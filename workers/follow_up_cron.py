@@ -1,44 +1,39 @@
-from services.form_service import get_form_service
 from services.google_sheets_service import get_sheets_service
 from services.bot_service import BotService
 from services.bot_service import UserAction
-from utils.date_convert import *
-from datetime import datetime
+from services.conversation_stage import FOLLOW_UP_THRESHOLD, classify_users
+import asyncio
 import os
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
-FOLLOW_UP_THRESHOLD = 86400  # 24 hours = 86400 seconds
+logger = logging.getLogger(__name__)
+
+def get_bot_service() -> BotService:
+    """Get BotService from the process container (created on first use, not at import time)"""
+    from core.container import get_container
+    return get_container().bot_service
 
-# Initialize services
-form_service = get_form_service()
-bot_service = BotService(form_service)
 
 async def run_sync_form_responses():
-    updated_users = get_sheets_service().sync_form_responses("UserStatus")
-    print("Auto synced users:", updated_users)
-    all_users = get_sheets_service().get_all_users()
-    
-    for username in updated_users:
-        user = next((u for u in all_users if u.get("username") == username), None)
-        if user:
-            user_id = user.get("id")
-            response = bot_service.handle_completed(UserAction(
-                user_id=user_id,
-                user_name=username,
-                action_type="completed"
-            ))
-    
+    """
+    Sync form responses vào sheet UserStatus. gspread là blocking nên chạy trong
+    thread, không chặn event loop. Tin nhắn cảm ơn không gửi ở đây: nó đi qua
+    /status-changed khi status chuyển sang submitted.
+    """
+    updated_users = await asyncio.to_thread(get_sheets_service().sync_form_responses, "UserStatus")
+    logger.info("Auto synced %s users", len(updated_users), extra={"usernames": updated_users})
     return updated_users
-    
+
 async def send_follow_up(user_id, user_name):
     user_action = UserAction(
         user_id=user_id,
         user_name=user_name,
         action_type="follow_up"
     )
-    response = bot_service.handle_follow_up(user_action)
+    response = get_bot_service().handle_follow_up(user_action)
             
 async def run_follow_up_cron():
     """
@@ -46,46 +41,26 @@ async def run_follow_up_cron():
     - Chưa submit form (status = pending)
     - Đã qua 24h kể từ lần cuối follow-up
     - Đang ở stage follow_up
+    Chỉ đọc sheet 1 lần, sau đó phân loại toàn bộ user trong 1 lượt.
     """
-    print("🔍 Starting daily follow-up check...")
+    logger.info("Starting daily follow-up check")
     
-    sheets = get_sheets_service()
-    all_users = sheets.get_all_users()
+    all_users = get_sheets_service().get_all_users()
+    classified = classify_users(all_users, threshold_seconds=FOLLOW_UP_THRESHOLD)
     follow_up_sent = 0
     
-    for user in all_users:
-        user_id = user.get('id')  
-        user_name = user.get('username', 'User')
-        form_status = user.get('form_status', '')
-        
-        # Skip users who already submitted form
-        if form_status == 'submitted':
-            continue
-            
-        stage = form_service.get_user_stage(user_id)
-        
-        # Chỉ gửi follow-up cho user ở stage 'follow_up'
-        if stage != 'follow_up':
-            continue
-            
-        last_follow_up_time = user.get('last_follow_up_sent', '')
-        
-        # Nếu chưa từng gửi follow-up, skip (đợi user tương tác trước)
-        if not last_follow_up_time:
-            continue
-            
-        # Check 24h đã qua chưa
-        last = iso_to_vn_datetime(last_follow_up_time)
-        now = datetime.now(timezone(timedelta(hours=7)))
-        diff = compare_datetime(now, last)
-        seconds = timedelta_to_seconds(diff)
-        
-        if seconds and seconds > FOLLOW_UP_THRESHOLD:
+    for user_id, user_name, eligible, hours_left in zip(
+        classified.user_ids,
+        classified.user_names,
+        classified.eligible,
+        classified.hours_until_due,
+    ):
+        if eligible:
             await send_follow_up(user_id, user_name)
             follow_up_sent += 1
-            print(f"📨 Sent daily follow-up to {user_name} (ID: {user_id})")
-        else:
-            hours_left = (FOLLOW_UP_THRESHOLD - (seconds or 0)) / 3600
-            print(f"⏳ {user_name}: waiting {hours_left:.1f}h more for next follow-up")
+            logger.info("Sent daily follow-up to user %s", user_id, extra={"user_id": user_id})
+        elif hours_left is not None:
+            logger.debug("User %s waiting %.1fh more for next follow-up", user_id, hours_left,
+                         extra={"user_id": user_id, "hours_left": round(hours_left, 1)})
     
-    print(f"✅ Daily follow-up completed: {follow_up_sent} messages sent")
\ No newline at end of file
+    logger.info("Daily follow-up completed: %s messages sent", follow_up_sent, extra={"sent": follow_up_sent})
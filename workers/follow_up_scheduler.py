@@ -0,0 +1,192 @@
+"""
+In-process follow-up scheduler
+
+Thay cho cron quét toàn bộ user mỗi ngày: giữ một min-heap
+(next_follow_up_due, user_id) và chỉ thức dậy khi item đầu heap đến hạn.
+Heap được build 1 lần từ snapshot sheet, sau đó cập nhật qua stage listener
+mỗi khi user tương tác (last_follow_up_sent / stage thay đổi).
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.interfaces.messaging_gateway import MessagingGateway
+from core.memory import approx_size, track_cache
+from core.metrics import FOLLOW_UPS_SENT
+from services.bot_service import BotService, UserAction
+from services.conversation_stage import (
+    FOLLOW_UP,
+    FOLLOW_UP_THRESHOLD,
+    add_stage_listener,
+    classify_users,
+    follow_up_timestamp,
+    read_stage,
+    remove_stage_listener,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FollowUpScheduler:
+    """Due-time priority queue of follow-ups, dispatched through the messaging gateway"""
+
+    def __init__(self, bot_service: BotService, gateway: MessagingGateway,
+                 threshold_seconds: int = FOLLOW_UP_THRESHOLD):
+        self.bot_service = bot_service
+        self.form_service = bot_service.form_service
+        self.gateway = gateway
+        self.threshold_seconds = threshold_seconds
+
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}  # user_id -> current due time (heap entries may be stale)
+        self._names: Dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        track_cache("follow_up_schedule", lambda: self._heap, size=self._approx_bytes, evict=self._compact)
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def _approx_bytes(self) -> int:
+        return approx_size(self._heap) + approx_size(self._due) + approx_size(self._names)
+
+    def _compact(self, level: int) -> int:
+        """Memory pressure: rebuild the heap without stale (moved / cancelled) entries"""
+        before = len(self._heap)
+        self._heap = [(due_at, user_id) for user_id, due_at in self._due.items()]
+        heapq.heapify(self._heap)
+        return before - len(self._heap)
+
+    def schedule(self, user_id: str, due_at: float, user_name: str = None) -> None:
+        """Add or move a user's next follow-up (epoch seconds)"""
+        user_id = str(user_id)
+        if user_name:
+            self._names[user_id] = user_name
+        if self._due.get(user_id) == due_at:
+            return
+        self._due[user_id] = due_at
+        heapq.heappush(self._heap, (due_at, user_id))
+        # Only wake the loop if the new item is now the earliest one
+        if self._heap[0][1] == user_id:
+            self._wakeup.set()
+
+    def cancel(self, user_id: str) -> None:
+        """Drop a user's pending follow-up (heap entry is skipped lazily)"""
+        self._due.pop(str(user_id), None)
+        self._names.pop(str(user_id), None)
+
+    def on_user_changed(self, user_id: str, record: Dict) -> None:
+        """Stage listener - reschedule from the updated user row"""
+        # Sheet writes may run in worker threads; heap is only touched on the loop
+        if self._loop is not None and not self._on_loop():
+            self._loop.call_soon_threadsafe(self.on_user_changed, user_id, record)
+            return
+
+        last_sent = follow_up_timestamp(record)
+        if read_stage(record) == FOLLOW_UP and last_sent is not None:
+            self.schedule(user_id, last_sent + self.threshold_seconds, record.get('username'))
+        else:
+            self.cancel(user_id)
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def load(self) -> int:
+        """Build the heap from one sheet snapshot"""
+        sheets = self.form_service.sheets_service
+        records = await asyncio.to_thread(sheets.get_all_users)
+        classified = classify_users(records, threshold_seconds=self.threshold_seconds)
+
+        now = time.time()
+        for user_id, user_name, hours_left in zip(
+            classified.user_ids,
+            classified.user_names,
+            classified.hours_until_due,
+        ):
+            if hours_left is not None:
+                self.schedule(user_id, now + hours_left * 3600, user_name)
+
+        logger.info("Follow-up scheduler loaded %s pending follow-ups", len(self._due), extra={"pending": len(self._due)})
+        return len(self._due)
+
+    def start(self) -> None:
+        """Start scheduler loop as a background task"""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            add_stage_listener(self.on_user_changed)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop scheduler loop"""
+        remove_stage_listener(self.on_user_changed)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error("Follow-up scheduler failed to load snapshot: %s", e)
+
+        while True:
+            timeout = self._seconds_until_next()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                continue  # heap changed, recompute next wake-up
+            except asyncio.TimeoutError:
+                pass
+
+            for user_id in self._pop_due():
+                try:
+                    await self._dispatch(user_id)
+                except Exception as e:
+                    logger.error("Follow-up dispatch failed for user %s: %s", user_id, e, extra={"user_id": user_id})
+
+    def _seconds_until_next(self) -> Optional[float]:
+        """Seconds until earliest valid item, None if heap is empty"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # stale entry
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.time())
+
+    def _pop_due(self) -> List[str]:
+        now = time.time()
+        due_users = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) == due_at:
+                del self._due[user_id]
+                due_users.append(user_id)
+        return due_users
+
+    async def _dispatch(self, user_id: str) -> None:
+        """Re-check the user row, send the follow-up and restart the 24h clock"""
+        user = await asyncio.to_thread(self.form_service.get_user, user_id)
+        if read_stage(user) != FOLLOW_UP:
+            self._names.pop(user_id, None)
+            return
+
+        cached_name = self._names.pop(user_id, None)
+        user_name = user.get('username') or cached_name or 'User'
+        response = await asyncio.to_thread(
+            self.bot_service.handle_follow_up,
+            UserAction(user_id=user_id, user_name=user_name, action_type="follow_up"),
+        )
+        await self.gateway.send_response(response, user_id)
+        FOLLOW_UPS_SENT.inc()
+        # Listener reschedules this user for the next day
+        await asyncio.to_thread(self.form_service.mark_follow_up_sent, user_id, user)
+        logger.info("Sent follow-up to %s (ID: %s)", user_name, user_id, extra={"user_id": user_id})
@@ -0,0 +1,148 @@
+"""
+Local job queue shared between web process and standalone worker
+
+SQLite (WAL mode) file trên cùng máy: web tier chỉ enqueue, worker
+(`python -m workers.cron_worker`) claim và xử lý. Nhiều worker có thể chạy
+song song vì claim được thực hiện trong một transaction IMMEDIATE.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    locked_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (status, available_at, id);
+"""
+
+
+@dataclass
+class Job:
+    """A claimed job"""
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: float
+
+
+class SQLiteJobQueue:
+    """Durable FIFO job queue backed by a local SQLite file"""
+
+    def __init__(self, path: str, visibility_timeout: float = 300, max_attempts: int = 3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Short-lived connections: safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0) -> int:
+        """Add a job, returns job id"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), now + delay, now),
+            )
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Job]:
+        """Atomically take the oldest available job (or a job whose worker died)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT id, kind, payload, attempts, created_at FROM jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'running' AND locked_at < ?)
+                ORDER BY id LIMIT 1
+                """,
+                (now, now - self.visibility_timeout),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', locked_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (now, row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return Job(id=row[0], kind=row[1], payload=json.loads(row[2]), attempts=row[3] + 1, created_at=row[4])
+
+    def complete(self, job_id: int) -> None:
+        """Remove a finished job"""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job: Job, error: str, retry_delay: float = 30) -> None:
+        """Retry later, or park as 'failed' after max_attempts"""
+        with closing(self._connect()) as conn:
+            if job.attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = ? WHERE id = ?",
+                    (error, job.id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', locked_at = NULL, available_at = ?, last_error = ? WHERE id = ?",
+                    (time.time() + retry_delay * job.attempts, error, job.id),
+                )
+
+    def depth(self) -> int:
+        """Number of jobs waiting or running"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+
+    def waiting(self) -> int:
+        """Number of jobs not yet claimed by a worker"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'pending'"
+            ).fetchone()[0]
+
+
+_job_queue = None
+
+
+def get_job_queue() -> SQLiteJobQueue:
+    """Get SQLiteJobQueue singleton instance"""
+    global _job_queue
+    if _job_queue is None:
+        from core.config import settings
+        _job_queue = SQLiteJobQueue(
+            settings.job_queue_path,
+            max_attempts=settings.job_max_attempts,
+        )
+    return _job_queue
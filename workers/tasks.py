@@ -1,4 +1,6 @@
 import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
 
 
 logger = logging.getLogger(__name__)
@@ -8,9 +10,62 @@ async def process_message_background(message_usecase, process_request):
     """Process message in background to keep webhook response fast."""
     try:
         result = await message_usecase.process_message(process_request)
-        if not result.success:
-            logger.error(f"Background processing failed: {result.message}")
+        if result.expired:
+            logger.warning("Background processing dropped: %s", result.message, extra={"user_id": process_request.user_id})
+        elif not result.success:
+            logger.error("Background processing failed: %s", result.message, extra={"user_id": process_request.user_id})
     except Exception as e:
-        logger.error(f"Background processing error: {e}")
+        logger.error("Background processing error: %s", e, extra={"user_id": process_request.user_id})
 
 
+@dataclass
+class JobContext:
+    """Use cases available to queued job handlers (built once per worker)"""
+    message_usecase: Any
+    form_sync_usecase: Any
+    sheet_sync_usecase: Any
+    status_change_usecase: Any
+
+
+JobHandler = Callable[[JobContext, Dict[str, Any]], Awaitable[Any]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """Register a handler for a queued job kind"""
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+@job_handler("process_message")
+async def run_process_message(ctx: JobContext, payload: Dict[str, Any]):
+    from core.usecases.message_usecase import ProcessMessageRequest
+    result = await ctx.message_usecase.process_message(ProcessMessageRequest(**payload))
+    if not result.success and not result.expired:
+        if result.sent:
+            # Failed during / after the Zalo send: a retry would reply twice - at most once
+            logger.error("Message job failed after the reply was sent, not retrying: %s", result.message,
+                         extra={"user_id": payload.get("user_id")})
+            return result
+        raise RuntimeError(result.message)
+    return result
+
+
+@job_handler("form_submitted")
+async def run_form_submitted(ctx: JobContext, payload: Dict[str, Any]):
+    from core.usecases.form_sync_usecase import FormSubmittedDTO
+    return await ctx.form_sync_usecase.run_sync(FormSubmittedDTO(**payload))
+
+
+@job_handler("status_changed")
+async def run_status_changed(ctx: JobContext, payload: Dict[str, Any]):
+    from core.usecases.status_change_usecase import StatusChangedDTO
+    return await ctx.status_change_usecase.handle(StatusChangedDTO(**payload))
+
+
+@job_handler("sheet_changed")
+async def run_sheet_changed(ctx: JobContext, payload: Dict[str, Any]):
+    from core.usecases.sheet_sync_usecase import SheetChangedDTO
+    return await ctx.sheet_sync_usecase.apply(SheetChangedDTO(**payload))